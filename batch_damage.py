@@ -0,0 +1,155 @@
+try:
+    import numpy as np
+except ImportError: # Optional: only the batch/analysis tools need numpy
+    np = None
+
+BATCH_CHUNK = 32768 # Rows per kernel pass
+
+
+class BatchDamageEngine:
+    """
+    Vectorized version of PokemonManager.calculate_damage.
+
+    The Pokedex and move table are copied once into struct-of-arrays NumPy
+    columns; calculate() then takes arrays of (attacker, defender, move, boost)
+    indices and returns an array of damages, using the same formula and
+    operation order as the scalar path so results match exactly.
+    """
+    def __init__(self, pokemon_manager):
+        if np is None:
+            raise ImportError("numpy is required for batch damage calculations (pip install numpy)")
+        self.poke = pokemon_manager
+        self.refresh()
+
+    def refresh(self):
+        """(Re)builds the columns. Call after the Pokedex or move table changes."""
+        poke = self.poke
+
+        # Species columns (index = position in species_names)
+        self.species_names = list(poke.pokedex)
+        self.species_index = {name: i for i, name in enumerate(self.species_names)}
+        stats = [poke.pokedex[name] for name in self.species_names]
+        self.attack = np.array([p.attack for p in stats], dtype=np.float64)
+        self.defense = np.array([p.defense for p in stats], dtype=np.float64)
+        self.sp_atk = np.array([p.sp_atk for p in stats], dtype=np.float64)
+        self.sp_def = np.array([p.sp_def for p in stats], dtype=np.float64)
+        self.hp = np.array([p.hp for p in stats], dtype=np.int64)
+
+        types = [poke.species_types[name] for name in self.species_names]
+        self.type1 = np.array([t1 for t1, t2 in types], dtype=np.int16)
+        self.type2 = np.array([-1 if t2 is None else t2 for t1, t2 in types], dtype=np.int16)
+        # defense_matrix[species, attacking type] = multiplier from the CSV
+        self.defense_matrix = np.array([poke.defense_vectors[name] for name in self.species_names], dtype=np.float64)
+
+        # Move columns (index = position in move_names)
+        self.move_names = list(poke.moves)
+        self.move_index = {name: i for i, name in enumerate(self.move_names)}
+        moves = [poke.moves[name] for name in self.move_names]
+        self.move_power = np.array([m["power"] for m in moves], dtype=np.float64)
+        self.move_physical = np.array([m["category"] == "Physical" for m in moves], dtype=bool)
+        self.move_type = np.array([m["type_id"] for m in moves], dtype=np.int16)
+
+        self.build_kernel_tables()
+
+    def build_kernel_tables(self):
+        """
+        Flattened (move, species) lookup tables for calculate().
+
+        Everything that only depends on the move and one of the two species is
+        resolved ahead of time (which stat the move uses, its boosted value, STAB,
+        effectiveness), so the per-row work is a few takes and multiplies.
+        Row index is move * n_species + species; the boosted half of the stat
+        tables starts at n_moves * n_species.
+        """
+        n_species = len(self.species_names)
+        physical = self.move_physical[:, None]
+        move_type = self.move_type.astype(np.intp)
+
+        a_stat = np.where(physical, self.attack[None, :], self.sp_atk[None, :])
+        d_stat = np.where(physical, self.defense[None, :], self.sp_def[None, :])
+        self._atk_table = np.concatenate([a_stat.ravel(), np.floor(a_stat * 1.5).ravel()])
+        self._def_table = np.concatenate([d_stat.ravel(), np.floor(d_stat * 1.5).ravel()])
+
+        same_type = (move_type[:, None] == self.type1[None, :]) | (move_type[:, None] == self.type2[None, :])
+        self._stab_table = np.where(same_type, 1.5, 1.0).ravel()
+        self._type_table = np.ascontiguousarray(self.defense_matrix[:, move_type].T).ravel()
+
+        self._power_factor = (2 * 50 / 5 + 2) * self.move_power # Level 50
+        self._n_species = n_species
+        self._boost_offset = len(self.move_names) * n_species
+
+    def species_ids(self, names):
+        """Pokemon names -> index array (case insensitive, like get_pokemon)."""
+        return np.array([self.species_index[self.poke.resolve_name(name)] for name in names], dtype=np.intp)
+
+    def move_ids(self, names):
+        return np.array([self.move_index[name] for name in names], dtype=np.intp)
+
+    def _pre_roll_chunk(self, attacker, defender, move, atk_boost, def_boost):
+        row = move * self._n_species
+        atk_row = row + attacker
+        def_row = row
+        def_row += defender
+
+        # Determine Stats (Physical vs Special), boosted 1.5x and truncated like int()
+        a_index = atk_row if atk_boost is None else atk_boost * self._boost_offset + atk_row
+        d_index = def_row if def_boost is None else def_boost * self._boost_offset + def_row
+        a_stat = self._atk_table.take(a_index)
+        a_stat /= self._def_table.take(d_index)
+
+        # Formula: ((2 * Level / 5 + 2) * Power * A / D) / 50 + 2
+        damage = self._power_factor.take(move)
+        damage *= a_stat
+        damage /= 50
+        damage += 2
+
+        # STAB and type effectiveness
+        damage *= self._stab_table.take(atk_row)
+        damage *= self._type_table.take(def_row)
+        return damage
+
+    def _arguments(self, attacker, defender, move, atk_boost, def_boost):
+        """Broadcasts the inputs to flat arrays; boosts that are all off become None (skipped)."""
+        arrays = np.broadcast_arrays(np.asarray(attacker, dtype=np.intp), np.asarray(defender, dtype=np.intp),
+                                     np.asarray(move, dtype=np.intp), np.asarray(atk_boost, dtype=np.intp),
+                                     np.asarray(def_boost, dtype=np.intp))
+        shape = arrays[0].shape
+        flat = [np.ascontiguousarray(a).ravel() for a in arrays]
+        for i in (3, 4):
+            if not flat[i].any():
+                flat[i] = None
+        return shape, flat
+
+    def pre_roll_damage(self, attacker, defender, move, atk_boost=False, def_boost=False):
+        """
+        Damage before the random factor: base formula x STAB x effectiveness.
+        All arguments are index arrays (or scalars), broadcast together.
+        """
+        shape, (attacker, defender, move, atk_boost, def_boost) = self._arguments(
+            attacker, defender, move, atk_boost, def_boost)
+        return self._pre_roll_chunk(attacker, defender, move, atk_boost, def_boost).reshape(shape)
+
+    def calculate(self, attacker, defender, move, atk_boost=False, def_boost=False, rolls=None, rng=None):
+        """
+        Batch calculate_damage. rolls are the 0.85-1.0 random factors (e.g. from
+        damage_roll); if omitted they are drawn uniformly from rng.
+        Returns an int64 damage array.
+        """
+        shape, flat = self._arguments(attacker, defender, move, atk_boost, def_boost)
+        size = flat[0].size
+        if rolls is None:
+            rng = rng if rng is not None else np.random.default_rng()
+            rolls = rng.uniform(0.85, 1.0, size=size)
+        else:
+            rolls = np.broadcast_to(np.asarray(rolls, dtype=np.float64), shape).ravel()
+
+        # Work in cache-sized chunks so the temporaries stay hot
+        out = np.empty(size, dtype=np.int64)
+        for start in range(0, size, BATCH_CHUNK):
+            stop = start + BATCH_CHUNK
+            chunk = [None if a is None else a[start:stop] for a in flat]
+            damage = self._pre_roll_chunk(*chunk)
+            damage *= rolls[start:stop]
+            np.floor(damage, out=damage)
+            out[start:stop] = damage
+        return out.reshape(shape)
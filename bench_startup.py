@@ -0,0 +1,40 @@
+import io
+import os
+import time
+import argparse
+import contextlib
+import statistics
+
+from pokemon_manager import PokemonManager
+from pokedex_cache import cache_path_for
+
+
+def time_load(csv_path, cold):
+    """Seconds to construct a PokemonManager, with or without the compiled cache."""
+    if cold and os.path.exists(cache_path_for(csv_path)):
+        os.remove(cache_path_for(csv_path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        PokemonManager(csv_path)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PokemonManager startup from the CSV (cold) and the compiled cache (warm)")
+    parser.add_argument('--csv', default='pokemon.csv', help='Pokemon CSV to load')
+    parser.add_argument('--runs', type=int, default=20, help='Loads per mode')
+    args = parser.parse_args()
+
+    results = {}
+    for mode, cold in (("cold (CSV parse + cache write)", True), ("warm (compiled cache)", False)):
+        time_load(args.csv, cold) # Warm-up, and leaves the cache in place for the warm runs
+        samples = [time_load(args.csv, cold) for _ in range(args.runs)]
+        results[mode] = statistics.median(samples)
+        print(f"{mode:32} median {results[mode] * 1000:8.2f} ms  min {min(samples) * 1000:8.2f} ms")
+
+    cold_time, warm_time = results.values()
+    print(f"Warm start is {cold_time / warm_time:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import gc
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import itertools
+import statistics
+import contextlib
+
+import constants
+from clock import VirtualClock
+from network_manager import NetworkManager
+from pokemon_manager import PokemonManager
+from game_engine import GameEngine
+from pokedex_cache import cache_path_for
+from loadtest import git_commit
+
+ROUND_TIME = 0.05            # Target seconds per timed round; calibration picks the iterations
+WARMUP_ROUNDS = 2            # Untimed rounds before measuring
+ROUNDS = 7                   # Timed rounds; the median is the result
+REGRESSION_THRESHOLD = 0.10  # Slower than the baseline by more than this fraction is a regression
+PENDING_ACKS = 10000         # pending_acks size for the check_resend benchmark
+RESULTS_FILE = "benchmarks.json"
+
+
+class BenchContext:
+    """
+    Shared fixtures: a PokemonManager, a NetworkManager on an ephemeral port
+    with a VirtualClock (so nothing is ever due for resend unless a benchmark
+    says so) and a loopback sink socket that ACKs are sent to and never read.
+    """
+    def __init__(self, pokemon_csv, moves_csv):
+        self.pokemon_csv = pokemon_csv
+        self.moves_csv = moves_csv
+        self.poke = PokemonManager(pokemon_csv, moves_csv)
+        self.clock = VirtualClock()
+        self.net = NetworkManager(port=0, clock=self.clock)
+        self.sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sink.bind(("127.0.0.1", 0))
+        self.sink_address = self.sink.getsockname()
+
+    def close(self):
+        self.net.close()
+        self.sink.close()
+
+
+# --- Benchmarks: each setup returns the zero-argument callable to time ---
+
+REPORT = {
+    constants.KEY_ATTACKER: "Pikachu",
+    constants.KEY_MOVE_USED: "Thunderbolt",
+    constants.KEY_DMG_DEALT: 57,
+    constants.KEY_HP_REMAINING: 23,
+    constants.KEY_STATUS_MSG: "Pikachu used Thunderbolt!",
+}
+
+
+def bench_construct_message(ctx):
+    return lambda: ctx.net.construct_message(constants.MSG_CALCULATION_REPORT, REPORT)
+
+
+def bench_parse_packet(ctx):
+    packet = ctx.net.construct_message(constants.MSG_CALCULATION_REPORT, REPORT)
+    return lambda: ctx.net.parse_packet(packet)
+
+
+def bench_send_ack(ctx):
+    return lambda: ctx.net.send_ack("42", ctx.sink_address)
+
+
+def bench_check_resend(ctx):
+    net = ctx.net
+    net.pending_acks.clear()
+    packet = net.construct_message(constants.MSG_CALCULATION_REPORT, REPORT)
+    for seq_num in range(PENDING_ACKS):
+        net.pending_acks[str(seq_num)] = {"packet": packet, "timestamp": ctx.clock.monotonic(), "retries": 0}
+    return net.check_resend
+
+
+def bench_get_pokemon(ctx):
+    return lambda: ctx.poke.get_pokemon("Pikachu")
+
+
+def bench_get_pokemon_folded(ctx):
+    return lambda: ctx.poke.get_pokemon("  pIKACHU ")
+
+
+def bench_get_type_effectiveness(ctx):
+    return lambda: ctx.poke.get_type_effectiveness("Electric", "Water", "Flying")
+
+
+def bench_calculate_damage(ctx):
+    return lambda: ctx.poke.calculate_damage("Pikachu", "Gyarados", "Thunderbolt", False, False, 0.93)
+
+
+def bench_pre_roll_uncached(ctx):
+    return lambda: ctx.poke.compute_pre_roll_damage("Pikachu", "Gyarados", "Thunderbolt", False, False)
+
+
+def bench_process_message_chat(ctx):
+    engine = GameEngine(ctx.poke, ctx.net)
+    message = {constants.KEY_MSG_TYPE: constants.MSG_CHAT_MESSAGE, constants.KEY_SENDER: "Bench",
+               constants.KEY_CONTENT_TYPE: constants.CONTENT_TYPE_TEXT, constants.KEY_MSG_TEXT: "hi"}
+    return lambda: engine.process_message(message)
+
+
+def bench_process_message_rejected(ctx):
+    engine = GameEngine(ctx.poke, ctx.net)
+    message = {constants.KEY_MSG_TYPE: constants.MSG_ATTACK_ANNOUNCE, constants.KEY_MOVE_NAME: "Tackle"}
+    return lambda: engine.process_message(message)
+
+
+def bench_load_csv_cold(ctx):
+    def load():
+        if os.path.exists(cache_path_for(ctx.pokemon_csv)):
+            os.remove(cache_path_for(ctx.pokemon_csv))
+        PokemonManager(ctx.pokemon_csv, ctx.moves_csv)
+    return load
+
+
+def bench_load_csv_warm(ctx):
+    return lambda: PokemonManager(ctx.pokemon_csv, ctx.moves_csv)
+
+
+# (name, setup), in run order
+BENCHMARKS = [
+    ("construct_message", bench_construct_message),
+    ("parse_packet", bench_parse_packet),
+    ("send_ack", bench_send_ack),
+    ("check_resend", bench_check_resend),
+    ("get_pokemon", bench_get_pokemon),
+    ("get_pokemon_folded", bench_get_pokemon_folded),
+    ("get_type_effectiveness", bench_get_type_effectiveness),
+    ("calculate_damage", bench_calculate_damage),
+    ("pre_roll_uncached", bench_pre_roll_uncached),
+    ("process_message_chat", bench_process_message_chat),
+    ("process_message_rejected", bench_process_message_rejected),
+    ("load_csv_cold", bench_load_csv_cold),
+    ("load_csv_warm", bench_load_csv_warm),
+]
+
+
+# --- Runner ---
+
+def time_round(func, number):
+    """Seconds for number calls of func, with the GC off like timeit."""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in itertools.repeat(None, number):
+            func()
+        return time.perf_counter() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def calibrate(func, round_time):
+    """Calls per round so that one round takes about round_time seconds."""
+    number = 1
+    while True:
+        elapsed = time_round(func, number)
+        if elapsed >= round_time / 10:
+            return max(1, int(number * round_time / elapsed))
+        number *= 10
+
+
+def run_benchmark(func, rounds=ROUNDS, warmup=WARMUP_ROUNDS, round_time=ROUND_TIME):
+    """Median/min/stdev nanoseconds per call over the timed rounds."""
+    number = calibrate(func, round_time)
+    for _ in range(warmup):
+        time_round(func, number)
+    per_call = [time_round(func, number) / number * 1e9 for _ in range(rounds)]
+    return {
+        "ns_per_op": statistics.median(per_call),
+        "min_ns": min(per_call),
+        "stdev_ns": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+def run_all(ctx, names=None, rounds=ROUNDS, warmup=WARMUP_ROUNDS, round_time=ROUND_TIME):
+    """Runs the selected benchmarks, printing a line per result as it goes."""
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names and not any(pattern in name for pattern in names):
+            continue
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = run_benchmark(setup(ctx), rounds, warmup, round_time)
+        results[name] = result
+        print(f"{name:28} {format_ns(result['ns_per_op']):>12}  "
+              f"(min {format_ns(result['min_ns'])}, +-{result['stdev_ns'] / result['ns_per_op']:.1%}, "
+              f"{result['rounds']} x {result['number']})")
+    return results
+
+
+def format_ns(ns):
+    for unit, scale in (("s", 1e9), ("ms", 1e6), ("us", 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.1f} ns"
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints current vs baseline for benchmarks in both and returns the names
+    that got slower by more than threshold.
+    """
+    regressions = []
+    print(f"\n{'benchmark':28} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            print(f"{name:28} {'-':>12} {format_ns(result['ns_per_op']):>12}      new")
+            continue
+        change = result["ns_per_op"] / before["ns_per_op"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        elif change < -threshold:
+            flag = "  faster"
+        print(f"{name:28} {format_ns(before['ns_per_op']):>12} {format_ns(result['ns_per_op']):>12} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the protocol and engine hot paths")
+    parser.add_argument('names', nargs='*', help='Only run benchmarks whose name contains one of these')
+    parser.add_argument('--rounds', type=int, default=ROUNDS, help='Timed rounds per benchmark')
+    parser.add_argument('--warmup', type=int, default=WARMUP_ROUNDS, help='Untimed rounds first')
+    parser.add_argument('--round-time', type=float, default=ROUND_TIME, help='Target seconds per round')
+    parser.add_argument('--out', default=RESULTS_FILE, help='JSON results file')
+    parser.add_argument('--baseline', default=None, help='Results file to compare against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help='Allowed slowdown vs the baseline (0.10 = 10%%)')
+    parser.add_argument('--list', action='store_true', help='List the benchmarks and exit')
+    parser.add_argument('--csv', default='pokemon.csv', help='Pokemon CSV')
+    parser.add_argument('--moves', default='moves.csv', help='Move CSV')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, _ in BENCHMARKS:
+            print(name)
+        return 0
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        ctx = BenchContext(args.csv, args.moves)
+    try:
+        results = run_all(ctx, args.names, args.rounds, args.warmup, args.round_time)
+    finally:
+        ctx.close()
+
+    report = {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+              "settings": {"rounds": args.rounds, "warmup": args.warmup, "round_time": args.round_time},
+              "results": results}
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import time
+import math
+import random
+
+import constants
+from recommender import MoveRecommender
+
+BOT_TIME_BUDGET = 0.005   # Seconds of search per decision
+BOT_MAX_DEPTH = 8         # Plies (one attack each)
+BOT_MOVE_CANDIDATES = 4   # Strongest moves per side considered by the search
+BOT_ROLL_SAMPLES = 3      # Equal-probability points of the 0.85-1.0 roll
+BOT_BOOSTS = (5, 5)       # (Sp. Atk, Sp. Def) boosts the bot allocates
+BOT_COUNTER_PICKS = 10    # Picks are drawn from this many counters when the opponent is known
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class ExpectimaxBot:
+    """
+    Depth-limited expectimax over the battle.
+
+    A search state is a plain tuple (my hp, opponent hp, my boosts, opponent
+    boosts, my turn), so cloning a state is free. Before searching, every
+    candidate (move, boost) of both sides is turned into its damage
+    distribution: floor(pre_roll * roll) at BOT_ROLL_SAMPLES roll points, equal
+    damages merged. Our turns maximize the expected value, the opponent's turns
+    minimize it, rolls are averaged. Iterative deepening keeps the best move of
+    the deepest finished search within the time budget.
+    """
+    def __init__(self, pokemon_manager, recommender=None, time_budget=BOT_TIME_BUDGET, max_depth=BOT_MAX_DEPTH,
+                 move_candidates=BOT_MOVE_CANDIDATES, roll_samples=BOT_ROLL_SAMPLES):
+        self.poke = pokemon_manager
+        self.recommender = recommender or MoveRecommender(pokemon_manager)
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.move_candidates = move_candidates
+        self.rolls = [0.85 + 0.15 * (i + 0.5) / roll_samples for i in range(roll_samples)]
+        self.last_depth = 0 # Depth of the last finished search, for diagnostics
+        self.nodes = 0
+        self.memo = {}      # (state, depth) -> value, per search iteration
+        self.deadline = 0.0
+        self.max_hp = (1, 1)
+
+    def actions(self, attacker, defender):
+        """[(move, boosted, [(damage, probability), ...])], distinct distributions only."""
+        moves = [entry["move"] for entry in self.recommender.rank_moves(attacker, defender, limit=self.move_candidates)]
+        actions = []
+        seen = set()
+        for boosted in (False, True): # Unboosted first: a boost that changes nothing is not spent
+            for move in moves:
+                pre_roll = self.poke.pre_roll_damage(attacker, defender, move, boosted, False)[0]
+                outcomes = {}
+                for roll in self.rolls:
+                    damage = math.floor(pre_roll * roll)
+                    outcomes[damage] = outcomes.get(damage, 0) + 1 / len(self.rolls)
+                distribution = tuple(sorted(outcomes.items()))
+                if (boosted, distribution) not in seen:
+                    seen.add((boosted, distribution))
+                    actions.append((move, boosted, distribution))
+        return actions
+
+    def choose(self, me, opponent, my_turn=True):
+        """
+        (move, use_boost) for Combatant me against Combatant opponent. Falls back
+        to the strongest move if no search depth finished in time.
+        """
+        my_actions = self.actions(me.name, opponent.name)
+        their_actions = self.actions(opponent.name, me.name)
+        root = (me.hp, opponent.hp, me.sp_atk_boosts, opponent.sp_atk_boosts, my_turn)
+        self.max_hp = (me.max_hp, opponent.max_hp)
+        self.deadline = time.perf_counter() + self.time_budget
+        self.nodes = 0
+
+        best = (my_actions[0][0], False)
+        self.last_depth = 0
+        for depth in range(1, self.max_depth + 1):
+            self.memo = {}
+            try:
+                choice = self.search_root(root, depth, my_actions, their_actions)
+            except SearchTimeout:
+                break
+            best = choice
+            self.last_depth = depth
+        return best
+
+    def search_root(self, state, depth, my_actions, their_actions):
+        my_hp, their_hp, my_boosts, their_boosts, _ = state
+        best, best_value = None, -math.inf
+        for move, boosted, distribution in my_actions:
+            if boosted and my_boosts <= 0:
+                continue
+            value = 0.0
+            for damage, probability in distribution:
+                child = (my_hp, their_hp - damage, my_boosts - boosted, their_boosts, False)
+                value += probability * self.value(child, depth - 1, my_actions, their_actions)
+            if value > best_value:
+                best, best_value = (move, boosted), value
+        return best
+
+    def value(self, state, depth, my_actions, their_actions):
+        my_hp, their_hp, my_boosts, their_boosts, my_turn = state
+        if their_hp <= 0:
+            return 1.0 + depth # Sooner wins score higher
+        if my_hp <= 0:
+            return -1.0 - depth
+        if depth == 0:
+            return my_hp / self.max_hp[0] - their_hp / self.max_hp[1]
+
+        key = (state, depth)
+        cached = self.memo.get(key)
+        if cached is not None:
+            return cached
+        self.nodes += 1
+        if self.nodes & 63 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        if my_turn:
+            best = -math.inf
+            for move, boosted, distribution in my_actions:
+                if boosted and my_boosts <= 0:
+                    continue
+                value = 0.0
+                for damage, probability in distribution:
+                    child = (my_hp, their_hp - damage, my_boosts - boosted, their_boosts, False)
+                    value += probability * self.value(child, depth - 1, my_actions, their_actions)
+                best = max(best, value)
+        else:
+            best = math.inf
+            for move, boosted, distribution in their_actions:
+                if boosted and their_boosts <= 0:
+                    continue
+                value = 0.0
+                for damage, probability in distribution:
+                    child = (my_hp - damage, their_hp, my_boosts, their_boosts - boosted, True)
+                    value += probability * self.value(child, depth - 1, my_actions, their_actions)
+                best = min(best, value)
+        self.memo[key] = best
+        return best
+
+
+class BotPlayer:
+    """
+    Drives a GameEngine without a human: picks a Pokemon and boosts, then
+    answers every turn with ExpectimaxBot. Clients call step() from their
+    network loop.
+    """
+    def __init__(self, pokemon_manager, pokemon=None, boosts=BOT_BOOSTS, seed=None, time_budget=BOT_TIME_BUDGET,
+                 recommender=None):
+        self.poke = pokemon_manager
+        self.pokemon = pokemon
+        self.boosts = boosts
+        self.rng = random.Random(seed)
+        # Bots in one process can share a recommender (and its counter-pick cache)
+        self.search = ExpectimaxBot(pokemon_manager, recommender, time_budget=time_budget)
+        self.last_turn = None
+        self.decision_times = [] # Seconds per move decision
+
+    def pokemon_error(self):
+        """Message for a configured Pokemon missing from the Pokedex, else None. Clients check it at startup."""
+        if not self.pokemon or self.poke.resolve_name(self.pokemon) is not None:
+            return None
+        suggestions = self.poke.suggest_pokemon(self.pokemon)
+        return f"Unknown Pokemon: {self.pokemon}" + (f". Did you mean: {', '.join(suggestions)}?" if suggestions else "")
+
+    def choose_pokemon(self, opponent=None, as_host=False):
+        """The configured Pokemon, else a counter to a known opponent, else any species."""
+        if self.pokemon:
+            return self.poke.resolve_name(self.pokemon)
+        if opponent is not None:
+            picks = self.search.recommender.counter_picks(opponent.name, BOT_COUNTER_PICKS, as_host)
+            if picks:
+                return self.rng.choice(picks)["pokemon"]
+        return self.rng.choice(list(self.poke.pokedex))
+
+    def step(self, engine):
+        """Makes our move if it is our turn and we haven't moved yet. Returns True if it did."""
+        if (engine.state != constants.STATE_WAITING_FOR_MOVE or not engine.is_my_turn
+                or not engine.my_pokemon or not engine.opponent_pokemon or engine.turn_number == self.last_turn):
+            return False
+        self.last_turn = engine.turn_number
+        start = time.perf_counter()
+        move, use_boost = self.choose_move(engine.my_pokemon, engine.opponent_pokemon)
+        self.decision_times.append(time.perf_counter() - start)
+        engine.select_move(move, use_boost)
+        return True
+
+    def choose_move(self, me, opponent):
+        move, use_boost = self.search.choose(me, opponent)
+        print(f"[BOT] {move}{' (boost)' if use_boost else ''} after depth {self.search.last_depth} search")
+        return move, use_boost
+
+
+class ScriptedPlayer(BotPlayer):
+    """
+    BotPlayer without the search: "best" always plays the strongest move
+    (boosted while boosts last), "random" a uniformly random learnable move.
+    Cheap and predictable, for load tests that measure the protocol.
+    """
+    def __init__(self, pokemon_manager, moves="best", pokemon=None, boosts=BOT_BOOSTS, seed=None, recommender=None):
+        super().__init__(pokemon_manager, pokemon, boosts, seed, recommender=recommender)
+        self.moves = moves
+
+    def choose_move(self, me, opponent):
+        use_boost = me.sp_atk_boosts > 0
+        if self.moves == "random":
+            return self.rng.choice(sorted(self.poke.learnset(me.name))), use_boost
+        return self.search.recommender.rank_moves(me.name, opponent.name, limit=1)[0]["move"], use_boost
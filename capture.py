@@ -0,0 +1,63 @@
+import struct
+import threading
+
+# Capture file layout:
+#   CAPTURE_MAGIC, then one record per datagram:
+#   [direction u8][timestamp f64][port u16][host_len u8][payload_len u32][host][payload]
+CAPTURE_MAGIC = b"PKCAP1\n"
+DIRECTION_IN = 0
+DIRECTION_OUT = 1
+
+_RECORD_HEADER = struct.Struct("<BdHBI")
+
+
+class CaptureWriter:
+    """
+    Appends every sent/received datagram to a compact binary log.
+    Safe to call from the listener thread and the main thread at the same time.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(CAPTURE_MAGIC)
+            self.file.flush()
+
+    def record(self, direction, timestamp, addr, data):
+        host = str(addr[0]).encode("utf-8")
+        header = _RECORD_HEADER.pack(direction, timestamp, int(addr[1]), len(host), len(data))
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(header + host + data)
+            # Flush every record: the listener is a daemon thread and gets no chance to clean up
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_capture(path):
+    """
+    Yields (direction, timestamp, addr, data) for every record in a capture file.
+    A truncated final record (e.g. the process was killed mid-write) is ignored.
+    """
+    with open(path, "rb") as f:
+        blob = f.read()
+
+    if not blob.startswith(CAPTURE_MAGIC):
+        raise ValueError(f"{path} is not a datagram capture")
+
+    offset = len(CAPTURE_MAGIC)
+    while offset + _RECORD_HEADER.size <= len(blob):
+        direction, timestamp, port, host_len, data_len = _RECORD_HEADER.unpack_from(blob, offset)
+        offset += _RECORD_HEADER.size
+        end = offset + host_len + data_len
+        if end > len(blob):
+            break
+        host = blob[offset:offset + host_len].decode("utf-8")
+        data = blob[offset + host_len:end]
+        offset = end
+        yield direction, timestamp, (host, port), data
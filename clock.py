@@ -0,0 +1,47 @@
+import time
+import threading
+
+class SystemClock:
+    """
+    Real time. This is the default clock used by the CLI and Web clients.
+    """
+    def time(self):
+        """Wall-clock time in seconds (for display/logging)."""
+        return time.time()
+
+    def monotonic(self):
+        """Monotonic seconds, used for timeouts and retransmit timers."""
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Manually driven clock for deterministic, faster-than-real-time runs.
+
+    sleep() does not block, it just moves virtual time forward, so a
+    loop that waits for a retransmit timeout finishes instantly and
+    always sees exactly the same timestamps.
+    """
+    def __init__(self, start=0.0):
+        self._now = float(start)
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self._now
+
+    def monotonic(self):
+        return self._now
+
+    def sleep(self, seconds):
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """Moves virtual time forward by the given number of seconds."""
+        if seconds < 0:
+            raise ValueError("Cannot move a clock backwards")
+        with self._lock:
+            self._now += seconds
+        return self._now
@@ -1,5 +1,6 @@
 # Network Config
-BUFFER_SIZE = 4096 
+MAX_DATAGRAM_BYTES = 65507 # Largest UDP payload over IPv4
+BUFFER_SIZE = MAX_DATAGRAM_BYTES # recvfrom() size, so any datagram a peer can send arrives whole
 DEFAULT_PORT = 12345
 BROADCAST_ADDR = "255.255.255.255"
 
@@ -7,6 +8,13 @@ BROADCAST_ADDR = "255.255.255.255"
 TIMEOUT_SECONDS = 0.5  # 500 milliseconds
 MAX_RETRIES = 3
 
+# Memory caps for long-running hosts; past a cap the oldest entry is evicted
+MAX_RECEIVED_HISTORY = 4096 # (addr, seq_num) pairs remembered for duplicate filtering
+MAX_PENDING_ACKS = 256      # Reliable messages waiting for an ACK; past it the oldest is given up on
+MAX_SPECTATORS = 32
+STICKER_HEADER_BYTES = 1024 # Room for the other fields of a sticker CHAT_MESSAGE (type, seq, sender...)
+MAX_STICKER_BYTES = BUFFER_SIZE - STICKER_HEADER_BYTES # A bigger sticker would not fit the peer's receive buffer
+
 # Message types
 MSG_HANDSHAKE_REQUEST  = "HANDSHAKE_REQUEST"
 MSG_HANDSHAKE_RESPONSE = "HANDSHAKE_RESPONSE"
@@ -20,12 +28,14 @@ MSG_RESOLUTION_REQUEST = "RESOLUTION_REQUEST"
 MSG_GAME_OVER          = "GAME_OVER"          
 MSG_CHAT_MESSAGE       = "CHAT_MESSAGE"       
 MSG_ACK                = "ACK"               
+MSG_CONNECTION_LOST    = "CONNECTION_LOST"  # Local only: queued by the reliability layer
 
 # Game states
 STATE_SETUP            = "SETUP"            # Initial handshake phase
 STATE_WAITING_FOR_MOVE = "WAITING_FOR_MOVE" # Waiting for player to pick a move
 STATE_PROCESSING_TURN  = "PROCESSING_TURN"  # Calculating damage/Comparing results
 STATE_GAME_OVER        = "GAME_OVER"        # Battle finished
+STATE_SPECTATING       = "SPECTATING"       # Watching someone else's battle
 
 # Communication Modes
 MODE_P2P = "P2P"
@@ -57,6 +67,10 @@ KEY_HP_REMAINING   = "defender_hp_remaining"
 KEY_STATUS_MSG     = "status_message"
 KEY_WINNER         = "winner"
 KEY_LOSER          = "loser"
+KEY_FAST_TURN      = "fast_turn"   # Handshake: offer/accept fast-turn mode
+KEY_USE_BOOST      = "use_boost"   # ATTACK_ANNOUNCE, normal and fast-turn: 1 if the attacker used a boost.
+                                   # Without it (older peers) the boost is inferred from the CALCULATION_REPORT
+KEY_STATE_HASH     = "state_hash"  # Fast-turn: hash of the battle state after the turn
 
 # Stat keys for Pokemon Data
 KEY_HP             = "hp"
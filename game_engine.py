@@ -1,7 +1,11 @@
 import constants
-import random
 import json
-from pokemon_manager import PokemonManager
+import hashlib
+import random
+from pokemon_manager import PokemonManager, damage_roll
+from species import Species, Combatant
+from transitions import TransitionTable, ANY_STATE
+from turn_trace import ATTACKER
 
 class GameEngine:
     def __init__(self, pokemon_manager, network_manager):
@@ -13,26 +17,32 @@ class GameEngine:
         self.state = constants.STATE_SETUP
         self.is_host = False
         self.seed = None
-        self.rng = random.Random()
         
         # 3. Player Data
-        self.my_pokemon = None
+        self.my_pokemon = None       # Combatant: shared Species + HP and boosts left
         self.opponent_pokemon = None
-        self.my_stat_boosts = {"sp_atk": 0, "sp_def": 0} # Available uses
-        self.opp_stat_boosts = {"sp_atk": 0, "sp_def": 0}
         
         # 4. Turn Management
         self.is_my_turn = False 
+        self.turn_number = 0 # Counter for damage_roll(), advanced by end_turn()
         self.turn_data = {} # Stores move, boosts for current turn
         self.pending_confirmation = False # Waiting for CALCULATION_CONFIRM
+        self.fast_turn = False # Negotiated in the handshake, see resolve_turn()
+        self.offer_fast_turn = False # Set by the client from --fast-turn
+
+        # 5. Client hooks
+        self.chat_listener = None # Optional callback(message) for UIs (e.g. stickers)
+        self.tracer = None # Optional TurnTracer (turn_trace.py), attached with tracer.attach(engine)
+        self.metrics = None # Optional ProtocolMetrics (metrics.py), attached with metrics.attach(engine)
+
+        # 6. Protocol state machine
+        self.transitions = self.build_transitions()
 
     def set_my_pokemon(self, name, sp_atk_boosts=0, sp_def_boosts=0):
         """Called when YOU pick a pokemon from the UI/Console."""
-        data = self.pokemon_manager.get_pokemon(name)
-        if data:
-            self.my_pokemon = data.copy()
-            self.my_pokemon[constants.KEY_MAX_HP] = self.my_pokemon[constants.KEY_HP]
-            self.my_stat_boosts = {"sp_atk": sp_atk_boosts, "sp_def": sp_def_boosts}
+        species = self.pokemon_manager.get_pokemon(name)
+        if species:
+            self.my_pokemon = Combatant(species, sp_atk_boosts, sp_def_boosts)
             print(f"You selected {name}!")
             return True
         else:
@@ -41,55 +51,54 @@ class GameEngine:
 
     def set_opponent_pokemon(self, name, stats=None, boosts=None, pokemon_data=None):
         """Called when we receive a BATTLE_SETUP message from the enemy."""
+        species = None
         
-        # 1. Try to use provided full data (RFC 4.4)
+        # 1. Try to use provided full data (RFC 4.4), validated field by field
         if pokemon_data:
             try:
                 if isinstance(pokemon_data, str):
-                    self.opponent_pokemon = json.loads(pokemon_data)
-                else:
-                    self.opponent_pokemon = pokemon_data
-                
-                # Ensure max hp is set
-                if constants.KEY_MAX_HP not in self.opponent_pokemon:
-                    self.opponent_pokemon[constants.KEY_MAX_HP] = self.opponent_pokemon[constants.KEY_HP]
+                    pokemon_data = json.loads(pokemon_data)
+                species = Species.from_dict(pokemon_data)
                 
-                print(f"Opponent selected {self.opponent_pokemon['name']} (Data received)")
-            except Exception as e:
+                # Damage is always verified against our own Pokedex, so a known
+                # species must carry the same stats as ours
+                local = self.pokemon_manager.get_pokemon(species.name)
+                if local and local != species:
+                    print(f"Opponent's data for {species.name} differs from our Pokedex. Using local stats.")
+                if local:
+                    species = local
+                print(f"Opponent selected {species.name} (Data received)")
+            except ValueError as e:
                 print(f"Error parsing opponent pokemon data: {e}")
-                self.opponent_pokemon = None
+                species = None
 
         # 2. Fallback to local lookup if no data or failed
-        if not self.opponent_pokemon:
-            data = self.pokemon_manager.get_pokemon(name)
-            if data:
-                self.opponent_pokemon = data.copy()
-                self.opponent_pokemon[constants.KEY_MAX_HP] = self.opponent_pokemon[constants.KEY_HP]
+        if not species:
+            species = self.pokemon_manager.get_pokemon(name)
+            if species:
                 print(f"Opponent selected {name} (Local lookup)")
         
-        if not self.opponent_pokemon:
+        if not species:
              return False
 
         # 3. Apply Boosts
+        sp_atk_boosts, sp_def_boosts = 0, 0
         if boosts:
             try:
                 # Try JSON format first (RFC 4.4)
                 if isinstance(boosts, str) and "{" in boosts:
                     boosts_dict = json.loads(boosts)
-                    self.opp_stat_boosts = {
-                        "sp_atk": boosts_dict.get("special_attack_uses", 0),
-                        "sp_def": boosts_dict.get("special_defense_uses", 0)
-                    }
+                    sp_atk_boosts = int(boosts_dict.get("special_attack_uses", 0))
+                    sp_def_boosts = int(boosts_dict.get("special_defense_uses", 0))
                 # Fallback to legacy "x,y" format
                 else:
                     parts = boosts.split(',')
-                    self.opp_stat_boosts = {
-                        "sp_atk": int(parts[0]),
-                        "sp_def": int(parts[1])
-                    }
+                    sp_atk_boosts = int(parts[0])
+                    sp_def_boosts = int(parts[1])
             except Exception as e:
                 print(f"Error parsing opponent boosts: {e}")
 
+        self.opponent_pokemon = Combatant(species, sp_atk_boosts, sp_def_boosts)
         return True
     
     def start_battle(self, is_host, seed=None):
@@ -99,9 +108,8 @@ class GameEngine:
         self.is_host = is_host
         if seed is not None:
             self.seed = int(seed)
-            # IMPORTANT: Set GLOBAL random seed because pokemon_manager uses random module directly
-            random.seed(self.seed)
             print(f"Battle Seed: {self.seed}")
+        self.turn_number = 0
         
         # RFC: Host goes first
         self.is_my_turn = is_host
@@ -113,6 +121,10 @@ class GameEngine:
             print("Waiting for opponent...")
         self.state = constants.STATE_WAITING_FOR_MOVE
 
+    def roll_for(self, attacker_name):
+        """Random factor for the current turn's attack. Same on both peers."""
+        return damage_roll(self.seed, self.turn_number, attacker_name)
+
     def select_move(self, move_name, use_boost=False):
         """
         Called when user types /attack [MoveName]
@@ -125,297 +137,375 @@ class GameEngine:
             print("It is not your turn!")
             return
 
-        # Validate move
-        move = self.pokemon_manager.get_move(move_name)
-        if not move:
-            print(f"Unknown move: {move_name}")
-            print(f"Available moves: {list(self.pokemon_manager.moves.keys())}")
+        # Validate move (learnset membership)
+        if not self.pokemon_manager.can_learn(self.my_pokemon.name, move_name):
+            if self.pokemon_manager.get_move(move_name):
+                print(f"{self.my_pokemon.name} can't use {move_name}.")
+            else:
+                print(f"Unknown move: {move_name}")
+            suggestions = self.pokemon_manager.suggest_moves(self.my_pokemon.name, move_name)
+            print(f"Did you mean: {', '.join(suggestions)}?")
             return
 
         self.turn_data = {
             "move_name": move_name,
-            "attacker": self.my_pokemon['name'],
-            "defender": self.opponent_pokemon['name'],
+            "attacker": self.my_pokemon.name,
+            "defender": self.opponent_pokemon.name,
             "use_boost": use_boost
         }
         
         print(f"You chose {move_name}. Waiting for opponent to acknowledge...")
+        if self.tracer:
+            self.tracer.begin(self.turn_number, ATTACKER, move_name, self.fast_turn)
+        if self.metrics:
+            self.metrics.turn_begin()
         
-        # Send Announce (Step 1)
+        # Send Announce (Step 1). The boost flag lets the defender's report
+        # include our boost instead of inferring it from our report afterwards.
         payload = {
-            constants.KEY_MOVE_NAME: move_name
+            constants.KEY_MOVE_NAME: move_name,
+            constants.KEY_USE_BOOST: 1 if use_boost and self.my_pokemon.sp_atk_boosts > 0 else 0
         }
+
+        # Fast-turn: resolve the turn now and announce the resulting state hash.
+        # The defender confirms if it gets the same state, otherwise it falls
+        # back to the full DEFENSE_ANNOUNCE / CALCULATION_REPORT exchange.
+        if self.fast_turn:
+            outcome = self.resolve_turn(move_name, attacker_is_me=True, use_boost=use_boost)
+            if outcome is not None:
+                self.turn_data["fast_outcome"] = outcome
+                payload[constants.KEY_USE_BOOST] = 1 if outcome["use_atk"] else 0
+                payload[constants.KEY_STATE_HASH] = outcome["state_hash"]
+                self.state = constants.STATE_PROCESSING_TURN
+            else:
+                print("Could not resolve the turn locally. Using full reports.")
         
         self.network_manager.send_reliable(constants.MSG_ATTACK_ANNOUNCE, payload)
 
+    def resolve_turn(self, move_name, attacker_is_me, use_boost):
+        """
+        Deterministically computes this turn's outcome (fast-turn mode) without
+        changing any state. Both peers get the same result from the shared seed.
+        """
+        if attacker_is_me:
+            attacker, defender = self.my_pokemon, self.opponent_pokemon
+        else:
+            attacker, defender = self.opponent_pokemon, self.my_pokemon
+
+        use_atk = bool(use_boost) and attacker.sp_atk_boosts > 0
+        result = self.pokemon_manager.calculate_damage(
+            attacker.name, defender.name, move_name,
+            use_atk_boost=use_atk,
+            use_def_boost=False,
+            random_factor=self.roll_for(attacker.name)
+        )
+        if result is None:
+            return None
+
+        damage = result['damage']
+        defender_hp = defender.hp - damage
+        atk_sp_atk = attacker.sp_atk_boosts - (1 if use_atk else 0)
+
+        # Canonical post-turn state, ordered attacker -> defender so both sides agree
+        state = (f"{self.turn_number}|{move_name}"
+                 f"|{attacker.name}:{attacker.hp}:{atk_sp_atk}:{attacker.sp_def_boosts}"
+                 f"|{defender.name}:{defender_hp}:{defender.sp_atk_boosts}:{defender.sp_def_boosts}")
+        state_hash = hashlib.blake2b(state.encode('utf-8'), digest_size=8).hexdigest()
+
+        return {
+            "damage": damage,
+            "use_atk": use_atk,
+            "defender_hp": defender_hp,
+            "state_hash": state_hash
+        }
+
+    def handle_fast_attack(self, message):
+        """
+        Defender side of a fast turn. Returns False if the state hash does not
+        match, in which case the caller runs the full turn handshake instead.
+        """
+        move_name = message.get(constants.KEY_MOVE_NAME)
+        use_boost = message.get(constants.KEY_USE_BOOST) == "1"
+        outcome = self.resolve_turn(move_name, attacker_is_me=False, use_boost=use_boost)
+
+        if outcome is None or outcome["state_hash"] != message.get(constants.KEY_STATE_HASH):
+            print("Fast-turn state hash mismatch. Falling back to full reports.")
+            if self.metrics:
+                self.metrics.fast_mismatches.inc()
+            return False
+
+        if outcome["use_atk"]:
+            self.opponent_pokemon.sp_atk_boosts -= 1
+            print("Opponent used Sp. Atk Boost.")
+        self.my_pokemon.hp = outcome["defender_hp"]
+        print(f"State hashes match! Damage: {outcome['damage']}")
+
+        self.network_manager.send_reliable(constants.MSG_CALCULATION_CONFIRM, {
+            constants.KEY_STATE_HASH: outcome["state_hash"]
+        })
+        if self.my_pokemon.hp <= 0:
+            self.send_game_over(self.opponent_pokemon.name, self.my_pokemon.name)
+        self.end_turn()
+        return True
+
+    def handle_fast_confirm(self, message):
+        """Attacker side of a fast turn: the defender agreed with our state hash."""
+        outcome = self.turn_data.get("fast_outcome")
+        if outcome is None or message.get(constants.KEY_STATE_HASH) != outcome["state_hash"]:
+            print("Fast-turn confirm does not match our state. Ignoring.")
+            return
+
+        if outcome["use_atk"]:
+            self.my_pokemon.sp_atk_boosts -= 1
+            print(f"Used Sp. Atk Boost! Remaining: {self.my_pokemon.sp_atk_boosts}")
+        self.opponent_pokemon.hp = outcome["defender_hp"]
+        print(f"Turn confirmed. Damage: {outcome['damage']}")
+        self.end_turn()
+
+    def build_transitions(self):
+        """
+        The protocol state machine: which message is handled in which state.
+        Anything not listed here is rejected by the table.
+        """
+        table = TransitionTable()
+        SETUP = constants.STATE_SETUP
+        WAITING = constants.STATE_WAITING_FOR_MOVE
+        PROCESSING = constants.STATE_PROCESSING_TURN
+        SPECTATING = constants.STATE_SPECTATING
+
+        # 1. Connection / setup phase
+        table.add(SETUP, constants.MSG_HANDSHAKE_REQUEST, self.handle_handshake_request)
+        table.add(SETUP, constants.MSG_HANDSHAKE_RESPONSE, self.handle_handshake_response)
+        table.add(SETUP, constants.MSG_BATTLE_SETUP, self.handle_battle_setup)
+        table.add(ANY_STATE, constants.MSG_SPECTATOR_REQUEST, self.handle_spectator_request)
+
+        # 2. Turn handshake
+        table.add(WAITING, constants.MSG_ATTACK_ANNOUNCE, self.handle_attack_announce)
+        table.add([WAITING, PROCESSING], constants.MSG_DEFENSE_ANNOUNCE, self.handle_defense_announce)
+        table.add([WAITING, PROCESSING], constants.MSG_CALCULATION_REPORT, self.handle_calculation_report)
+        table.add(PROCESSING, constants.MSG_CALCULATION_CONFIRM, self.handle_calculation_confirm)
+        table.add(PROCESSING, constants.MSG_RESOLUTION_REQUEST, self.handle_resolution_request)
+        table.add([WAITING, PROCESSING], constants.MSG_GAME_OVER, self.handle_game_over)
+
+        # 3. Spectators only watch
+        for msg_type in [constants.MSG_BATTLE_SETUP, constants.MSG_ATTACK_ANNOUNCE,
+                         constants.MSG_DEFENSE_ANNOUNCE, constants.MSG_CALCULATION_CONFIRM,
+                         constants.MSG_RESOLUTION_REQUEST]:
+            table.add(SPECTATING, msg_type, self.handle_spectated_message)
+        table.add(SPECTATING, constants.MSG_CALCULATION_REPORT, self.handle_calculation_report)
+        table.add(SPECTATING, constants.MSG_GAME_OVER, self.handle_game_over)
+
+        # 4. Always allowed
+        table.add(ANY_STATE, constants.MSG_CHAT_MESSAGE, self.handle_chat)
+        table.add(ANY_STATE, constants.MSG_CONNECTION_LOST, self.handle_connection_lost)
+        return table
+
     def process_message(self, message):
         """
         The Main Brain. Decides what to do with a network message.
+        Returns False if the message is not valid in the current state.
         """
         msg_type = message.get(constants.KEY_MSG_TYPE)
         
         print(f"[Engine] Processing {msg_type}...")
 
-        # 1. SETUP PHASE
-        if msg_type == constants.MSG_BATTLE_SETUP:
-            opp_name = message.get(constants.KEY_POKEMON_NAME)
-            boosts_str = message.get(constants.KEY_STAT_BOOSTS)
-            pokemon_data_str = message.get(constants.KEY_POKEMON_DATA)
-            
-            self.set_opponent_pokemon(opp_name, boosts=boosts_str, pokemon_data=pokemon_data_str)
-            
-            if self.my_pokemon and self.opponent_pokemon:
-                print("Battle Setup Complete.")
-
-        # 2. TURN HANDSHAKE
-        # Step 1: Receive Attack Announce (Defender side)
-        elif msg_type == constants.MSG_ATTACK_ANNOUNCE:
-            move_name = message.get(constants.KEY_MOVE_NAME)
-            print(f"Opponent announced attack: {move_name}")
-            
-            # SPECTATOR / ERROR CHECK
-            if not self.opponent_pokemon or not self.my_pokemon:
-                print("[Spectator/Info] Watching attack...")
-                return
+        if self.tracer:
+            self.tracer.received(msg_type, self.turn_number)
+            try:
+                return self.transitions.dispatch(self.state, message)
+            finally:
+                self.tracer.handled()
+        return self.transitions.dispatch(self.state, message)
 
-            # Store turn data
-            self.turn_data = {
-                "move_name": move_name,
-                "attacker": self.opponent_pokemon['name'],
-                "defender": self.my_pokemon['name']
-            }
-            
-            # Step 2: Send Defense Announce
-import constants
-import random
-import json
-from pokemon_manager import PokemonManager
+    def start_spectating(self):
+        """Called by the client when it joins a battle as a spectator."""
+        self.state = constants.STATE_SPECTATING
 
-class GameEngine:
-    def __init__(self, pokemon_manager, network_manager):
-        # 1. Connect to the Data Source.
-        self.pokemon_manager = pokemon_manager
-        self.network_manager = network_manager
-        
-        # 2. Initialize State
-        self.state = constants.STATE_SETUP
-        self.is_host = False
-        self.seed = None
-        self.rng = random.Random()
-        
-        # 3. Player Data
-        self.my_pokemon = None
-        self.opponent_pokemon = None
-        self.my_stat_boosts = {"sp_atk": 0, "sp_def": 0} # Available uses
-        self.opp_stat_boosts = {"sp_atk": 0, "sp_def": 0}
-        
-        # 4. Turn Management
-        self.is_my_turn = False 
-        self.turn_data = {} # Stores move, boosts for current turn
-        self.pending_confirmation = False # Waiting for CALCULATION_CONFIRM
+    # --- Connection handlers ---
 
-    def set_my_pokemon(self, name, sp_atk_boosts=0, sp_def_boosts=0):
-        """Called when YOU pick a pokemon from the UI/Console."""
-        data = self.pokemon_manager.get_pokemon(name)
-        if data:
-            self.my_pokemon = data.copy()
-            self.my_pokemon[constants.KEY_MAX_HP] = self.my_pokemon[constants.KEY_HP]
-            self.my_stat_boosts = {"sp_atk": sp_atk_boosts, "sp_def": sp_def_boosts}
-            print(f"You selected {name}!")
-            return True
+    def handle_handshake_request(self, message):
+        print(f"[NET] Received Handshake Request from {message.get('source_addr')}")
+        if not self.is_host:
+            return
+
+        self.network_manager.peer_address = message.get('source_addr')
+        self.seed = random.randint(1000, 9999)
+        # Fast-turn only if both sides asked for it
+        self.fast_turn = self.offer_fast_turn and message.get(constants.KEY_FAST_TURN) == "1"
+
+        response = {
+            constants.KEY_SEED: self.seed,
+            "status": "OK"
+        }
+        if self.fast_turn:
+            response[constants.KEY_FAST_TURN] = 1
+        self.network_manager.send_reliable(constants.MSG_HANDSHAKE_RESPONSE, response)
+        print(f"Connected! Seed: {self.seed}. Please pick your Pokemon.")
+
+    def handle_handshake_response(self, message):
+        self.seed = int(message.get(constants.KEY_SEED))
+        self.fast_turn = self.offer_fast_turn and message.get(constants.KEY_FAST_TURN) == "1"
+        print(f"[NET] Handshake Accepted! Seed: {self.seed}")
+        if self.fast_turn:
+            print("[NET] Fast-turn mode enabled.")
+
+    def handle_spectator_request(self, message):
+        if not self.is_host:
+            return
+        print(f"[NET] Spectator joined from {message.get('source_addr')}")
+        self.network_manager.add_spectator(message.get('source_addr'))
+        self.network_manager.send_reliable(constants.MSG_CHAT_MESSAGE, {
+            constants.KEY_SENDER: "HOST",
+            constants.KEY_CONTENT_TYPE: constants.CONTENT_TYPE_TEXT,
+            constants.KEY_MSG_TEXT: "Welcome Spectator!"
+        })
+
+    def handle_chat(self, message):
+        sender = message.get(constants.KEY_SENDER, "Unknown")
+        if message.get(constants.KEY_CONTENT_TYPE) == constants.CONTENT_TYPE_STICKER:
+            if len(message.get(constants.KEY_STICKER_DATA, "")) > constants.MAX_STICKER_BYTES:
+                # Neither shown nor relayed, so the host never holds copies of it
+                print(f"[{sender}]: [STICKER TOO LARGE, DROPPED]")
+                if self.metrics:
+                    self.metrics.evictions.inc()
+                return
+            print(f"[{sender}]: [STICKER RECEIVED]")
         else:
-            print(f"Error: Pokemon '{name}' not found.")
-            return False
+            print(f"[{sender}]: {message.get(constants.KEY_MSG_TEXT)}")
+
+        if self.chat_listener:
+            self.chat_listener(message)
+        if self.is_host:
+            self.relay_chat(message)
+
+    def relay_chat(self, message):
+        """Host relays chat between the opponent and spectators (best effort)."""
+        net = self.network_manager
+        source_addr = message.get('source_addr')
+        relay_data = {k: v for k, v in message.items() if k not in [
+            constants.KEY_MSG_TYPE, constants.KEY_SEQ_NUM, 'source_addr'
+        ]}
+
+        # 1. From Opponent -> all Spectators
+        # 2. From a Spectator -> Opponent + other Spectators
+        if source_addr == net.peer_address:
+            targets = list(net.spectators)
+        elif source_addr in net.spectators:
+            targets = [spec for spec in net.spectators if spec != source_addr]
+            if net.peer_address:
+                targets.append(net.peer_address)
+        else:
+            return
 
-    def set_opponent_pokemon(self, name, stats=None, boosts=None, pokemon_data=None):
-        """Called when we receive a BATTLE_SETUP message from the enemy."""
-        
-        # 1. Try to use provided full data (RFC 4.4)
-        if pokemon_data:
+        for target in targets:
             try:
-                if isinstance(pokemon_data, str):
-                    self.opponent_pokemon = json.loads(pokemon_data)
-                else:
-                    self.opponent_pokemon = pokemon_data
-                
-                # Ensure max hp is set
-                if constants.KEY_MAX_HP not in self.opponent_pokemon:
-                    self.opponent_pokemon[constants.KEY_MAX_HP] = self.opponent_pokemon[constants.KEY_HP]
-                
-                print(f"Opponent selected {self.opponent_pokemon['name']} (Data received)")
-            except Exception as e:
-                print(f"Error parsing opponent pokemon data: {e}")
-                self.opponent_pokemon = None
+                packet = net.construct_message(constants.MSG_CHAT_MESSAGE, relay_data)
+                net.send_packet(packet, target)
+            except OSError:
+                pass
 
-        # 2. Fallback to local lookup if no data or failed
-        if not self.opponent_pokemon:
-            data = self.pokemon_manager.get_pokemon(name)
-            if data:
-                self.opponent_pokemon = data.copy()
-                self.opponent_pokemon[constants.KEY_MAX_HP] = self.opponent_pokemon[constants.KEY_HP]
-                print(f"Opponent selected {name} (Local lookup)")
-        
-        if not self.opponent_pokemon:
-             return False
+    def handle_connection_lost(self, message):
+        print(f"Connection lost: {message.get('reason')}")
 
-        # 3. Apply Boosts
-        if boosts:
-            try:
-                # Try JSON format first (RFC 4.4)
-                if isinstance(boosts, str) and "{" in boosts:
-                    boosts_dict = json.loads(boosts)
-                    self.opp_stat_boosts = {
-                        "sp_atk": boosts_dict.get("special_attack_uses", 0),
-                        "sp_def": boosts_dict.get("special_defense_uses", 0)
-                    }
-                # Fallback to legacy "x,y" format
-                else:
-                    parts = boosts.split(',')
-                    self.opp_stat_boosts = {
-                        "sp_atk": int(parts[0]),
-                        "sp_def": int(parts[1])
-                    }
-            except Exception as e:
-                print(f"Error parsing opponent boosts: {e}")
+    # --- Battle handlers ---
 
-        return True
-    
-    def start_battle(self, is_host, seed=None):
-        """
-        Initializes battle state.
-        """
-        self.is_host = is_host
-        if seed is not None:
-            self.seed = int(seed)
-            # IMPORTANT: Set GLOBAL random seed because pokemon_manager uses random module directly
-            random.seed(self.seed)
-            print(f"Battle Seed: {self.seed}")
+    def handle_battle_setup(self, message):
+        opp_name = message.get(constants.KEY_POKEMON_NAME)
+        if not opp_name:
+            return # Broadcast game announcement, not a Pokemon pick
+        boosts_str = message.get(constants.KEY_STAT_BOOSTS)
+        pokemon_data_str = message.get(constants.KEY_POKEMON_DATA)
         
-        # RFC: Host goes first
-        self.is_my_turn = is_host
-            
-        print(f"Battle Started! My Turn: {self.is_my_turn}")
-        if self.is_my_turn:
-            print("Use /attack [MoveName] to attack!")
-        else:
-            print("Waiting for opponent...")
-        self.state = constants.STATE_WAITING_FOR_MOVE
+        self.set_opponent_pokemon(opp_name, boosts=boosts_str, pokemon_data=pokemon_data_str)
+        
+        if self.my_pokemon and self.opponent_pokemon:
+            print("Battle Setup Complete.")
 
-    def select_move(self, move_name, use_boost=False):
-        """
-        Called when user types /attack [MoveName]
-        """
-        if self.state != constants.STATE_WAITING_FOR_MOVE:
-            print("Cannot move right now.")
+    def handle_attack_announce(self, message):
+        """Step 1: Receive Attack Announce (Defender side)"""
+        move_name = message.get(constants.KEY_MOVE_NAME)
+        print(f"Opponent announced attack: {move_name}")
+        if self.metrics:
+            self.metrics.turn_begin()
+        
+        # ERROR CHECK
+        if not self.opponent_pokemon or not self.my_pokemon:
             return
 
-        if not self.is_my_turn:
-            print("It is not your turn!")
+        # A move the opponent's species cannot use forfeits the battle
+        if self.pokemon_manager.get_pokemon(self.opponent_pokemon.name) and \
+                not self.pokemon_manager.can_learn(self.opponent_pokemon.name, move_name):
+            print(f"Rejected attack: {self.opponent_pokemon.name} can't use {move_name}.")
+            self.send_game_over(self.my_pokemon.name, self.opponent_pokemon.name)
             return
 
-        # Validate move
-        move = self.pokemon_manager.get_move(move_name)
-        if not move:
-            print(f"Unknown move: {move_name}")
-            print(f"Available moves: {list(self.pokemon_manager.moves.keys())}")
-            return
+        # Fast-turn: one round trip if our state hash matches
+        if self.fast_turn and constants.KEY_STATE_HASH in message:
+            if self.handle_fast_attack(message):
+                return
 
+        # Store turn data. Peers that do not announce their boost leave it to
+        # be inferred from their report.
         self.turn_data = {
             "move_name": move_name,
-            "attacker": self.my_pokemon['name'],
-            "defender": self.opponent_pokemon['name'],
-            "use_boost": use_boost
+            "attacker": self.opponent_pokemon.name,
+            "defender": self.my_pokemon.name,
+            "use_boost": message.get(constants.KEY_USE_BOOST) == "1",
+            "boost_announced": constants.KEY_USE_BOOST in message
         }
         
-        print(f"You chose {move_name}. Waiting for opponent to acknowledge...")
-        
-        # Send Announce (Step 1)
-        payload = {
-            constants.KEY_MOVE_NAME: move_name
-        }
+        # Step 2: Send Defense Announce
+        self.network_manager.send_reliable(constants.MSG_DEFENSE_ANNOUNCE, {})
         
-        self.network_manager.send_reliable(constants.MSG_ATTACK_ANNOUNCE, payload)
+        # Transition to processing
+        self.state = constants.STATE_PROCESSING_TURN
+        self.calculate_and_report()
 
-    def process_message(self, message):
-        """
-        The Main Brain. Decides what to do with a network message.
-        """
-        msg_type = message.get(constants.KEY_MSG_TYPE)
-        
-        print(f"[Engine] Processing {msg_type}...")
+    def handle_defense_announce(self, message):
+        """Step 2 Response: Receive Defense Announce (Attacker side)"""
+        if not self.my_pokemon or not self.opponent_pokemon:
+            return
 
-        # 1. SETUP PHASE
-        if msg_type == constants.MSG_BATTLE_SETUP:
-            opp_name = message.get(constants.KEY_POKEMON_NAME)
-            boosts_str = message.get(constants.KEY_STAT_BOOSTS)
-            pokemon_data_str = message.get(constants.KEY_POKEMON_DATA)
-            
-            self.set_opponent_pokemon(opp_name, boosts=boosts_str, pokemon_data=pokemon_data_str)
-            
-            if self.my_pokemon and self.opponent_pokemon:
-                print("Battle Setup Complete.")
-
-        # 2. TURN HANDSHAKE
-        # Step 1: Receive Attack Announce (Defender side)
-        elif msg_type == constants.MSG_ATTACK_ANNOUNCE:
-            move_name = message.get(constants.KEY_MOVE_NAME)
-            print(f"Opponent announced attack: {move_name}")
-            
-            # SPECTATOR / ERROR CHECK
-            if not self.opponent_pokemon or not self.my_pokemon:
-                print("[Spectator/Info] Watching attack...")
-                return
+        # A fast turn the defender could not verify: run the full exchange
+        self.turn_data.pop("fast_outcome", None)
 
-            # Store turn data
-            self.turn_data = {
-                "move_name": move_name,
-                "attacker": self.opponent_pokemon['name'],
-                "defender": self.my_pokemon['name']
-            }
-            
-            # Step 2: Send Defense Announce
-            self.network_manager.send_reliable(constants.MSG_DEFENSE_ANNOUNCE, {})
-            
-            # Transition to processing
-            self.state = constants.STATE_PROCESSING_TURN
-            self.calculate_and_report()
-
-        # Step 2 Response: Receive Defense Announce (Attacker side)
-        elif msg_type == constants.MSG_DEFENSE_ANNOUNCE:
-            # SPECTATOR CHECK
-            if not self.my_pokemon or not self.opponent_pokemon:
-                return
+        print("Opponent is ready. Calculating damage...")
+        self.state = constants.STATE_PROCESSING_TURN
+        self.calculate_and_report()
 
-            print("Opponent is ready. Calculating damage...")
-            self.state = constants.STATE_PROCESSING_TURN
-            self.calculate_and_report()
-
-        # Step 3: Receive Calculation Report
-        elif msg_type == constants.MSG_CALCULATION_REPORT:
-            self.handle_calculation_report(message)
-
-        # Step 4: Receive Confirmation
-        elif msg_type == constants.MSG_CALCULATION_CONFIRM:
-            print("Turn confirmed.")
-            self.end_turn()
-
-        # Discrepancy Resolution
-        elif msg_type == constants.MSG_RESOLUTION_REQUEST:
-            print("Received Resolution Request.")
-            # RFC 4.9: If we receive this, it means the other party disagrees.
-            # Host/Attacker Authority: We re-assert our calculation.
-            # We simply re-send the last report.
-            if self.turn_data.get("last_report"):
-                print("Re-sending Calculation Report (Assertion).")
-                self.network_manager.send_reliable(constants.MSG_CALCULATION_REPORT, self.turn_data["last_report"])
-
-        # Game Over
-        elif msg_type == constants.MSG_GAME_OVER:
-            winner = message.get(constants.KEY_WINNER)
-            print(f"GAME OVER! Winner: {winner}")
-            self.state = constants.STATE_GAME_OVER
-
-        return None
+    def handle_calculation_confirm(self, message):
+        """Step 4: Receive Confirmation"""
+        if self.turn_data.get("fast_outcome"):
+            self.handle_fast_confirm(message)
+            return
+        print("Turn confirmed.")
+        self.end_turn()
+
+    def handle_resolution_request(self, message):
+        """Discrepancy Resolution"""
+        print("Received Resolution Request.")
+        # RFC 4.9: If we receive this, it means the other party disagrees.
+        # Host/Attacker Authority: We re-assert our calculation.
+        # We simply re-send the last report.
+        if self.turn_data.get("last_report"):
+            print("Re-sending Calculation Report (Assertion).")
+            self.network_manager.send_reliable(constants.MSG_CALCULATION_REPORT, self.turn_data["last_report"])
+
+    def handle_game_over(self, message):
+        winner = message.get(constants.KEY_WINNER)
+        print(f"GAME OVER! Winner: {winner}")
+        self.state = constants.STATE_GAME_OVER
+        if self.tracer:
+            self.tracer.end("game_over")
+        if self.metrics:
+            self.metrics.games.inc()
+
+    def handle_spectated_message(self, message):
+        msg_type = message.get(constants.KEY_MSG_TYPE)
+        if msg_type == constants.MSG_ATTACK_ANNOUNCE:
+            print(f"[Spectator] Attack announced: {message.get(constants.KEY_MOVE_NAME)}")
+        elif msg_type == constants.MSG_BATTLE_SETUP and message.get(constants.KEY_POKEMON_NAME):
+            print(f"[Spectator] {message.get(constants.KEY_POKEMON_NAME)} enters the battle!")
     
     def calculate_and_report(self):
         """
@@ -428,13 +518,17 @@ class GameEngine:
         
         # Determine Boosts (Local decision)
         use_atk = False
-        if attacker_name == self.my_pokemon['name']:
-            if use_boost and self.my_stat_boosts['sp_atk'] > 0:
+        if attacker_name == self.my_pokemon.name:
+            if use_boost and self.my_pokemon.sp_atk_boosts > 0:
                 use_atk = True
-                self.my_stat_boosts['sp_atk'] -= 1
-                print(f"Used Sp. Atk Boost! Remaining: {self.my_stat_boosts['sp_atk']}")
+                self.my_pokemon.sp_atk_boosts -= 1
+                print(f"Used Sp. Atk Boost! Remaining: {self.my_pokemon.sp_atk_boosts}")
             elif use_boost:
                 print("No Sp. Atk Boosts remaining!")
+        elif use_boost and self.opponent_pokemon.sp_atk_boosts > 0:
+            # Announced boost: spent once the attacker's report confirms it
+            use_atk = True
+        self.turn_data["used_boost"] = use_atk
         
         # Note: We cannot know if opponent uses Def boost in strict RFC 4.6 (Empty Payload).
         # We assume NO def boost for the report.
@@ -446,7 +540,8 @@ class GameEngine:
             defender_name, 
             move_name,
             use_atk_boost=use_atk,
-            use_def_boost=use_def
+            use_def_boost=use_def,
+            random_factor=self.roll_for(attacker_name)
         )
         damage = result['damage']
         
@@ -456,10 +551,10 @@ class GameEngine:
         # Send Report
         # We need to predict HP remaining.
         if self.is_my_turn:
-            current_hp = self.opponent_pokemon[constants.KEY_HP]
+            current_hp = self.opponent_pokemon.hp
             remaining = current_hp - damage
         else:
-            current_hp = self.my_pokemon[constants.KEY_HP]
+            current_hp = self.my_pokemon.hp
             remaining = current_hp - damage
             
         report = {
@@ -475,6 +570,11 @@ class GameEngine:
         
         self.network_manager.send_reliable(constants.MSG_CALCULATION_REPORT, report)
 
+        # A report that overtook the DEFENSE_ANNOUNCE can be checked now
+        early_report = self.turn_data.pop("early_report", None)
+        if early_report:
+            self.handle_calculation_report(early_report)
+
     def handle_calculation_report(self, message):
         """
         Compare local calculation with received report.
@@ -489,33 +589,66 @@ class GameEngine:
              return
 
         remote_damage = int(message.get(constants.KEY_DMG_DEALT))
-        
-        # Local Calculation for Verification
         move_name = message.get(constants.KEY_MOVE_USED)
         attacker_name = message.get(constants.KEY_ATTACKER)
-        defender_name = self.my_pokemon['name'] if attacker_name == self.opponent_pokemon['name'] else self.opponent_pokemon['name']
-        
-        # 1. Calculate Base Damage (No Boosts)
-        res_base = self.pokemon_manager.calculate_damage(attacker_name, defender_name, move_name, False, False)
-        dmg_base = res_base['damage']
-        
-        # 2. Calculate Boosted Damage (Attacker Boosted)
-        res_boost = self.pokemon_manager.calculate_damage(attacker_name, defender_name, move_name, True, False)
-        dmg_boost = res_boost['damage']
-        
+        defender_name = self.my_pokemon.name if attacker_name == self.opponent_pokemon.name else self.opponent_pokemon.name
+
+        local_damage = self.turn_data.get("local_damage")
+        if local_damage is None:
+            # The report overtook the DEFENSE_ANNOUNCE; check it once we have calculated ours
+            self.turn_data["early_report"] = message
+            return
+
         accepted_damage = None
+        our_damage = local_damage
         
-        if remote_damage == dmg_base:
-            accepted_damage = dmg_base
-        elif remote_damage == dmg_boost:
-            # Inference: Opponent used a boost!
-            if self.opp_stat_boosts['sp_atk'] > 0:
-                print("Inferred: Opponent used Sp. Atk Boost.")
-                self.opp_stat_boosts['sp_atk'] -= 1
-                accepted_damage = dmg_boost
+        if self.is_my_turn:
+            # Our own move: we know whether we boosted, so only our calculation counts
+            if remote_damage == local_damage:
+                accepted_damage = local_damage
+            elif self.turn_data.get("used_boost") and remote_damage == self.pokemon_manager.calculate_damage(
+                    attacker_name, defender_name, move_name, False, False, self.roll_for(attacker_name))['damage']:
+                # A defender that ignored the announced boost reports the unboosted damage.
+                # It infers the boost from our report, so our figure stands.
+                accepted_damage = local_damage
+        elif self.turn_data.get("boost_announced"):
+            # The attacker announced its boost, so our calculation already includes it
+            if remote_damage == local_damage:
+                accepted_damage = local_damage
+                if self.turn_data.get("used_boost"):
+                    print("Opponent used Sp. Atk Boost.")
+                    self.opponent_pokemon.sp_atk_boosts -= 1
+        else:
+            # Peer without the boost flag: infer the boost from the reported damage.
+            # Both candidates use the same counter-based roll the attacker used.
+            roll = self.roll_for(attacker_name)
+
+            # 1. Calculate Base Damage (No Boosts)
+            res_base = self.pokemon_manager.calculate_damage(attacker_name, defender_name, move_name, False, False, roll)
+            dmg_base = res_base['damage']
+            our_damage = dmg_base
+        
+            # Range Check: damage that no roll can produce is a discrepancy straight away
+            low = self.pokemon_manager.damage_range(attacker_name, defender_name, move_name, False, False)
+            high = self.pokemon_manager.damage_range(attacker_name, defender_name, move_name, True, False)
+            if low is not None and not low[0] <= remote_damage <= high[1]:
+                print(f"Reported damage {remote_damage} is outside the possible range.")
+            elif remote_damage == dmg_base:
+                accepted_damage = dmg_base
             else:
-                print("Opponent claims boost damage but has no boosts left!")
-                # Discrepancy will trigger below
+                # 2. Calculate Boosted Damage (Attacker Boosted), only when the base damage does not match
+                res_boost = self.pokemon_manager.calculate_damage(attacker_name, defender_name, move_name, True, False, roll)
+                dmg_boost = res_boost['damage']
+            
+                if remote_damage == dmg_boost:
+                    # Inference: Opponent used a boost!
+                    if self.opponent_pokemon.sp_atk_boosts > 0:
+                        print("Inferred: Opponent used Sp. Atk Boost.")
+                        self.opponent_pokemon.sp_atk_boosts -= 1
+                        accepted_damage = dmg_boost
+                    else:
+                        print("Opponent claims boost damage but has no boosts left!")
+                        # Discrepancy will trigger below
         
         # Discrepancy Check
         if accepted_damage is not None:
@@ -523,17 +656,17 @@ class GameEngine:
             
             # Apply damage
             if self.is_my_turn:
-                self.opponent_pokemon[constants.KEY_HP] -= accepted_damage
+                self.opponent_pokemon.hp -= accepted_damage
             else:
-                self.my_pokemon[constants.KEY_HP] -= accepted_damage
+                self.my_pokemon.hp -= accepted_damage
                 
             # Send Confirm
             self.network_manager.send_reliable(constants.MSG_CALCULATION_CONFIRM, {})
             
             # Check Game Over
-            if self.my_pokemon[constants.KEY_HP] <= 0:
-                self.send_game_over(self.opponent_pokemon['name'], self.my_pokemon['name'])
-            elif self.opponent_pokemon[constants.KEY_HP] <= 0:
+            if self.my_pokemon.hp <= 0:
+                self.send_game_over(self.opponent_pokemon.name, self.my_pokemon.name)
+            elif self.opponent_pokemon.hp <= 0:
                 # Wait for opponent to send Game Over or we can send it too
                 pass
                 
@@ -543,7 +676,9 @@ class GameEngine:
                 self.end_turn()
                 
         else:
-            print(f"DISCREPANCY! Local Base: {dmg_base}, Local Boost: {dmg_boost}, Remote: {remote_damage}")
+            print(f"DISCREPANCY! Local: {our_damage}, Remote: {remote_damage}")
+            if self.metrics:
+                self.metrics.discrepancies.inc()
             
             # If we already sent a resolution request for this turn, maybe we should just accept it?
             # But for now, strict RFC: Send Resolution Request.
@@ -554,9 +689,9 @@ class GameEngine:
                  print("Received disputed report again. Accepting Authority.")
                  # Apply remote damage
                  if self.is_my_turn:
-                    self.opponent_pokemon[constants.KEY_HP] -= remote_damage
+                    self.opponent_pokemon.hp -= remote_damage
                  else:
-                    self.my_pokemon[constants.KEY_HP] -= remote_damage
+                    self.my_pokemon.hp -= remote_damage
                  self.network_manager.send_reliable(constants.MSG_CALCULATION_CONFIRM, {})
                  self.end_turn()
                  return
@@ -568,13 +703,18 @@ class GameEngine:
             res_data = {
                 constants.KEY_ATTACKER: attacker_name,
                 constants.KEY_MOVE_USED: move_name,
-                constants.KEY_DMG_DEALT: dmg_base # We send OUR calc (Base)
+                constants.KEY_DMG_DEALT: our_damage # We send OUR calc
             }
             self.network_manager.send_reliable(constants.MSG_RESOLUTION_REQUEST, res_data)
 
     def end_turn(self):
+        if self.tracer:
+            self.tracer.end()
+        if self.metrics:
+            self.metrics.turn_end()
         self.pending_confirmation = False
         self.turn_data = {} # Clear turn data
+        self.turn_number += 1
         
         # Only toggle turn if we are actually playing
         if self.my_pokemon:
@@ -594,4 +734,8 @@ class GameEngine:
             constants.KEY_LOSER: loser
         })
         print(f"GAME OVER. {winner} wins!")
-        self.state = constants.STATE_GAME_OVER
\ No newline at end of file
+        self.state = constants.STATE_GAME_OVER
+        if self.tracer:
+            self.tracer.end("game_over")
+        if self.metrics:
+            self.metrics.games.inc()
\ No newline at end of file
@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import contextlib
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import constants
+from network_manager import NetworkManager
+from pokemon_manager import PokemonManager
+from game_engine import GameEngine
+from recommender import MoveRecommender
+from bot import BotPlayer, ScriptedPlayer, BOT_BOOSTS, BOT_TIME_BUDGET
+
+LOOPBACK = "127.0.0.1"
+BATTLE_TIMEOUT = 60    # Seconds before a battle counts as failed
+IDLE_SLEEP = 0.0005    # Driver sleep when no peer had anything to do
+PERCENTILES = (50, 95, 99)
+RESULTS_FILE = "loadtest.json"
+PLAYERS = ("bot", "best", "random")
+
+HOST, JOINER, SPECTATOR = "host", "joiner", "spectator"
+
+
+class MeteredNetworkManager(NetworkManager):
+    """
+    NetworkManager on an ephemeral loopback port that times every reliable
+    message until its first ACK (per message type) and counts retransmissions.
+    """
+    def __init__(self, clock=None):
+        super().__init__(port=0, clock=clock)
+        self.address = (LOOPBACK, self.sock.getsockname()[1])
+        self.sent_at = {}   # seq -> (message type, send time)
+        self.ack_times = {} # message type -> [seconds]
+        self.reliable_sends = 0
+        self.retransmits = 0
+
+    def reset_connection(self):
+        super().reset_connection()
+        self.sent_at.clear()
+        while self.receive_message() is not None: # Nothing from the last battle leaks into the next
+            pass
+
+    def send_reliable(self, message_type, data=None):
+        # Stamped before sending: on loopback the ACK can arrive before sendto() returns
+        self.sent_at[str(self.sequence_number + 1)] = (message_type, self.clock.monotonic())
+        self.reliable_sends += 1
+        super().send_reliable(message_type, data)
+
+    def handle_ack(self, message):
+        sent = self.sent_at.pop(message.get(constants.KEY_ACK_NUM), None)
+        if sent:
+            self.ack_times.setdefault(sent[0], []).append(self.clock.monotonic() - sent[1])
+        super().handle_ack(message)
+
+    def check_resend(self):
+        if not self.pending_acks:
+            return
+        retries = {seq_num: info["retries"] for seq_num, info in list(self.pending_acks.items())}
+        super().check_resend()
+        for seq_num, before in retries.items():
+            info = self.pending_acks.get(seq_num)
+            if info:
+                self.retransmits += info["retries"] - before
+
+
+class LoadPeer:
+    """
+    One participant of a load-test pair: a metered NetworkManager kept across
+    battles, a fresh GameEngine per battle and (except for spectators) a
+    player that picks and moves.
+    """
+    def __init__(self, pokemon_manager, role, player=None, fast_turn=False, clock=None):
+        self.poke = pokemon_manager
+        self.role = role
+        self.player = player
+        self.fast_turn = fast_turn
+        self.net = MeteredNetworkManager(clock)
+        self.clock = self.net.clock
+        self.engine = None
+        self.moves = 0           # Moves made this battle
+        self.connect_sent = None # When the handshake request went out (joiner)
+        self.move_sent = None    # (turn number, time) of our last move
+        self.turn_times = []     # Our move -> turn over, seconds
+        self.connect_times = []  # Handshake request -> seed, seconds
+
+    def new_battle(self):
+        self.net.reset_connection()
+        self.engine = GameEngine(self.poke, self.net)
+        self.engine.offer_fast_turn = self.fast_turn
+        self.engine.is_host = self.role == HOST
+        if self.role == SPECTATOR:
+            self.engine.start_spectating()
+        if self.player:
+            self.player.last_turn = None
+        self.moves = 0
+        self.move_sent = None
+
+    def connect(self, host_address):
+        """Joiner/spectator: sends the handshake (or spectator request) to the host."""
+        self.net.peer_address = host_address
+        if self.role == SPECTATOR:
+            self.net.send_reliable(constants.MSG_SPECTATOR_REQUEST, {constants.KEY_SENDER: "Spectator"})
+            return
+        payload = {constants.KEY_SENDER: "Joiner"}
+        if self.fast_turn:
+            payload[constants.KEY_FAST_TURN] = 1
+        self.connect_sent = self.clock.monotonic()
+        self.net.send_reliable(constants.MSG_HANDSHAKE_REQUEST, payload)
+
+    def pump(self):
+        """Handles every queued message, then acts if it can. Returns True if anything happened."""
+        busy = False
+        while True:
+            message = self.net.receive_message()
+            if message is None:
+                break
+            self.engine.process_message(message)
+            self.advance() # Start the battle before a following ATTACK_ANNOUNCE is dispatched
+            busy = True
+        self.net.check_resend()
+        return self.advance() or busy
+
+    def advance(self):
+        engine = self.engine
+        if self.role == SPECTATOR or engine.seed is None:
+            return False
+        now = self.clock.monotonic()
+        if self.connect_sent is not None:
+            self.connect_times.append(now - self.connect_sent)
+            self.connect_sent = None
+
+        if engine.my_pokemon is None:
+            self.send_battle_setup(self.player.choose_pokemon(engine.opponent_pokemon, engine.is_host))
+            return True
+        if engine.state == constants.STATE_SETUP:
+            if engine.opponent_pokemon is None:
+                return False
+            engine.start_battle(engine.is_host, engine.seed)
+
+        if self.move_sent and engine.turn_number != self.move_sent[0]:
+            self.turn_times.append(now - self.move_sent[1])
+            self.move_sent = None
+        turn = engine.turn_number
+        if self.player.step(engine):
+            self.moves += 1
+            self.move_sent = (turn, now)
+            return True
+        return False
+
+    def send_battle_setup(self, name):
+        """Same BATTLE_SETUP the CLI and web clients send (RFC 4.4)."""
+        sp_atk, sp_def = self.player.boosts
+        self.engine.set_my_pokemon(name, sp_atk, sp_def)
+        self.net.send_reliable(constants.MSG_BATTLE_SETUP, {
+            constants.KEY_POKEMON_NAME: name,
+            constants.KEY_STAT_BOOSTS: json.dumps({"special_attack_uses": sp_atk, "special_defense_uses": sp_def}),
+            constants.KEY_POKEMON_DATA: json.dumps(self.poke.get_pokemon(name).to_dict()),
+            constants.KEY_COMM_MODE: constants.MODE_P2P
+        })
+
+    def idle(self):
+        """Nothing left in flight, so the sockets can be reused for the next battle."""
+        return not self.net.pending_acks and self.net.incoming_messages.empty()
+
+    def close(self):
+        self.net.close()
+
+
+class LoadPair:
+    """
+    A host and a joiner (plus spectators) playing battles back to back over
+    loopback. A battle is over once both sides reached GAME_OVER and nothing
+    is left unacknowledged; it fails if that takes longer than timeout, or
+    if the two sides end up disagreeing on HP or boosts (a desync).
+    """
+    def __init__(self, pokemon_manager, players, spectators=0, battles=1, fast_turn=False, timeout=BATTLE_TIMEOUT):
+        self.host = LoadPeer(pokemon_manager, HOST, players[0], fast_turn)
+        self.joiner = LoadPeer(pokemon_manager, JOINER, players[1], fast_turn)
+        self.spectators = [LoadPeer(pokemon_manager, SPECTATOR) for _ in range(spectators)]
+        self.peers = [self.host, self.joiner] + self.spectators
+        self.clock = self.host.clock
+        self.remaining = battles
+        self.timeout = timeout
+        self.finished = 0
+        self.failed = 0
+        self.desynced = 0
+        self.turns = 0
+        self.spectators_joined = False
+        self.deadline = 0.0
+        self.done = False
+        self.next_battle()
+
+    def next_battle(self):
+        if self.remaining == 0:
+            self.done = True
+            return
+        self.remaining -= 1
+        for peer in self.peers:
+            peer.new_battle()
+        self.spectators_joined = False
+        self.deadline = self.clock.monotonic() + self.timeout
+        self.joiner.connect(self.host.net.address)
+
+    def pump(self):
+        busy = False
+        for peer in self.peers:
+            busy = peer.pump() or busy
+
+        # Spectators join once the host has its opponent, like a late viewer
+        if not self.spectators_joined and self.host.engine.seed is not None:
+            for spectator in self.spectators:
+                spectator.connect(self.host.net.address)
+            self.spectators_joined = True
+
+        over = (self.host.engine.state == constants.STATE_GAME_OVER
+                and self.joiner.engine.state == constants.STATE_GAME_OVER)
+        if over and self.host.idle() and self.joiner.idle():
+            host_view, joiner_view = battle_state(self.host.engine), battle_state(self.joiner.engine)
+            if host_view != (joiner_view[2:] + joiner_view[:2]):
+                print(f"Desync: host sees {host_view}, joiner sees {joiner_view}")
+                self.failed += 1
+                self.desynced += 1
+                self.next_battle()
+                return True
+            self.finished += 1
+            self.turns += self.host.moves + self.joiner.moves
+            self.next_battle()
+            return True
+        if self.clock.monotonic() > self.deadline:
+            self.failed += 1
+            self.next_battle()
+            return True
+        return busy
+
+    def close(self):
+        for peer in self.peers:
+            peer.close()
+
+
+def battle_state(engine):
+    """(our hp, our Sp. Atk boosts, their hp, their Sp. Atk boosts) as one side sees the battle."""
+    mine, theirs = engine.my_pokemon, engine.opponent_pokemon
+    return (mine.hp, mine.sp_atk_boosts, theirs.hp, theirs.sp_atk_boosts)
+
+
+def make_player(kind, pokemon_manager, recommender, seed, think_ms, boosts):
+    if kind == "bot":
+        return BotPlayer(pokemon_manager, None, boosts, seed, think_ms / 1000, recommender)
+    return ScriptedPlayer(pokemon_manager, kind, None, boosts, seed, recommender)
+
+
+def run_pairs(pokemon_manager, pairs, battles, spectators=0, players=("bot", "bot"), think_ms=BOT_TIME_BUDGET * 1000,
+              boosts=BOT_BOOSTS, fast_turn=False, seed=0, timeout=BATTLE_TIMEOUT, first_pair=0):
+    """
+    Plays battles on pairs concurrent host/joiner pairs from one driver loop
+    and returns the raw counters and latency samples (seconds).
+    """
+    random.seed(seed + first_pair) # Battle seeds drawn by the host engines
+    recommender = MoveRecommender(pokemon_manager)
+    load_pairs = []
+    for index in range(first_pair, first_pair + pairs):
+        pair_players = [make_player(kind, pokemon_manager, recommender, seed * 100003 + 2 * index + side, think_ms, boosts)
+                        for side, kind in enumerate(players)]
+        load_pairs.append(LoadPair(pokemon_manager, pair_players, spectators, battles, fast_turn, timeout))
+
+    start, cpu_start = time.perf_counter(), time.process_time()
+    active = list(load_pairs)
+    while active:
+        busy = False
+        for pair in active:
+            busy = pair.pump() or busy
+        active = [pair for pair in active if not pair.done]
+        if not busy:
+            time.sleep(IDLE_SLEEP)
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+
+    samples = {"turn": [], "connect": []}
+    stats = {"finished": 0, "failed": 0, "desynced": 0, "turns": 0, "reliable_sends": 0, "retransmits": 0,
+             "elapsed": elapsed, "cpu": cpu, "samples": samples}
+    for pair in load_pairs:
+        stats["finished"] += pair.finished
+        stats["failed"] += pair.failed
+        stats["desynced"] += pair.desynced
+        stats["turns"] += pair.turns
+        for peer in pair.peers:
+            stats["reliable_sends"] += peer.net.reliable_sends
+            stats["retransmits"] += peer.net.retransmits
+            samples["turn"].extend(peer.turn_times)
+            samples["connect"].extend(peer.connect_times)
+            for message_type, times in peer.net.ack_times.items():
+                samples.setdefault(f"ack:{message_type}", []).extend(times)
+        pair.close()
+    return stats
+
+
+def run_worker(pokemon_csv, moves_csv, *args):
+    """Process-pool entry point; the parent has already compiled the caches."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        poke = PokemonManager(pokemon_csv, moves_csv)
+        return run_pairs(poke, *args)
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, -(-q * len(ordered) // 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples):
+    """Count, mean and percentiles of latency samples, in milliseconds."""
+    ordered = sorted(samples)
+    summary = {"count": len(ordered), "mean": sum(ordered) / len(ordered) * 1000 if ordered else None}
+    for q in PERCENTILES:
+        value = percentile(ordered, q)
+        summary[f"p{q}"] = value * 1000 if value is not None else None
+    return summary
+
+
+def merge(results):
+    """Combines per-worker results. Workers run side by side, so the slowest one sets the wall time."""
+    merged = {"finished": 0, "failed": 0, "desynced": 0, "turns": 0, "reliable_sends": 0, "retransmits": 0,
+              "elapsed": 0.0, "cpu": 0.0, "samples": {}}
+    for result in results:
+        for key in ("finished", "failed", "desynced", "turns", "reliable_sends", "retransmits", "cpu"):
+            merged[key] += result[key]
+        merged["elapsed"] = max(merged["elapsed"], result["elapsed"])
+        for name, samples in result["samples"].items():
+            merged["samples"].setdefault(name, []).extend(samples)
+    return merged
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(stats, settings):
+    battles = stats["finished"]
+    elapsed = stats["elapsed"]
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": settings,
+        "battles": battles,
+        "failed": stats["failed"],
+        "desynced": stats["desynced"],
+        "turns": stats["turns"],
+        "elapsed_s": elapsed,
+        "battles_per_sec": battles / elapsed if elapsed else 0.0,
+        "turns_per_sec": stats["turns"] / elapsed if elapsed else 0.0,
+        "reliable_sends": stats["reliable_sends"],
+        "retransmits": stats["retransmits"],
+        "retransmit_rate": stats["retransmits"] / stats["reliable_sends"] if stats["reliable_sends"] else 0.0,
+        "cpu_s": stats["cpu"],
+        "cpu_ms_per_battle": stats["cpu"] / battles * 1000 if battles else None,
+        "latency_ms": {name: summarize(samples) for name, samples in sorted(stats["samples"].items())},
+    }
+
+
+def format_report(report):
+    lines = [
+        f"Battles: {report['battles']} finished, {report['failed']} failed ({report['desynced']} desynced) "
+        f"in {report['elapsed_s']:.2f} s",
+        f"Throughput: {report['battles_per_sec']:.1f} battles/s, {report['turns_per_sec']:.1f} turns/s",
+        f"Retransmits: {report['retransmits']} of {report['reliable_sends']} reliable sends ({report['retransmit_rate']:.2%})",
+    ]
+    if report["cpu_ms_per_battle"] is not None:
+        lines.append(f"CPU: {report['cpu_s']:.2f} s, {report['cpu_ms_per_battle']:.2f} ms/battle")
+    lines.append(f"{'latency (ms)':28} {'count':>7} " + " ".join(f"{f'p{q}':>8}" for q in PERCENTILES))
+    for name, summary in report["latency_ms"].items():
+        if summary["count"]:
+            lines.append(f"{name:28} {summary['count']:7} " + " ".join(f"{summary[f'p{q}']:8.3f}" for q in PERCENTILES))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Loopback load test of the battle protocol (NetworkManager + GameEngine)")
+    parser.add_argument('--pairs', type=int, default=8, help='Concurrent host/joiner pairs')
+    parser.add_argument('--battles', type=int, default=5, help='Battles per pair, back to back')
+    parser.add_argument('--spectators', type=int, default=0, help='Spectators per pair')
+    parser.add_argument('--players', default='bot', help='"bot", "best" or "random", or host,joiner e.g. "bot,random"')
+    parser.add_argument('--think-ms', type=float, default=BOT_TIME_BUDGET * 1000, help='Bot search time per move')
+    parser.add_argument('--boosts', type=str, default="%d,%d" % BOT_BOOSTS, help='Sp. Atk,Sp. Def boosts for every player')
+    parser.add_argument('--fast-turn', action='store_true', help='Play in fast-turn mode')
+    parser.add_argument('--workers', type=int, default=1, help='Processes, each driving its share of the pairs')
+    parser.add_argument('--timeout', type=float, default=BATTLE_TIMEOUT, help='Seconds before a battle counts as failed')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for picks, moves and battle seeds')
+    parser.add_argument('--out', default=RESULTS_FILE, help='JSON results file')
+    parser.add_argument('--csv', default='pokemon.csv', help='Pokemon CSV')
+    parser.add_argument('--moves', default='moves.csv', help='Move CSV')
+    args = parser.parse_args()
+
+    players = tuple(args.players.split(",")) if "," in args.players else (args.players, args.players)
+    if len(players) != 2 or any(kind not in PLAYERS for kind in players):
+        parser.error(f"--players must be one or two of {', '.join(PLAYERS)}")
+    boosts = tuple(int(b) for b in args.boosts.split(","))
+    workers = max(1, min(args.workers, args.pairs))
+    settings = {"pairs": args.pairs, "battles_per_pair": args.battles, "spectators": args.spectators,
+                "players": list(players), "think_ms": args.think_ms, "boosts": list(boosts),
+                "fast_turn": args.fast_turn, "workers": workers, "seed": args.seed}
+
+    # Load (and compile the caches) once up front, so workers only map them
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        poke = PokemonManager(args.csv, args.moves)
+    print(f"Load test: {args.pairs} pairs x {args.battles} battles, {args.spectators} spectators/pair, "
+          f"players {players[0]} vs {players[1]}{', fast-turn' if args.fast_turn else ''}, {workers} worker(s)")
+
+    run_args = (args.battles, args.spectators, players, args.think_ms, boosts, args.fast_turn, args.seed, args.timeout)
+    if workers == 1:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            stats = run_pairs(poke, args.pairs, *run_args)
+    else:
+        shares = [args.pairs // workers + (1 if w < args.pairs % workers else 0) for w in range(workers)]
+        firsts = [sum(shares[:w]) for w in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_worker, args.csv, args.moves, poke_pairs, *run_args, first)
+                       for poke_pairs, first in zip(shares, firsts)]
+            stats = merge([future.result() for future in futures])
+
+    report = build_report(stats, settings)
+    print(format_report(report))
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
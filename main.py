@@ -1,28 +1,53 @@
 import threading
-import time
+import os
 import sys
 import socket
-import random
 import base64
+import argparse
 
 # Import your modules
 import constants
 from network_manager import NetworkManager
 from pokemon_manager import PokemonManager
 from game_engine import GameEngine
+from clock import SystemClock
+from recommender import MoveRecommender, COUNTER_PICKS_CACHE_SIZE
+from bot import BotPlayer, BOT_BOOSTS, BOT_TIME_BUDGET
+from turn_trace import TurnTracer
+from profiler import SamplingProfiler, parse_seconds
+import memory
+
+# Bot mode: give up on a battle after this long; keep answering this long after it ends
+BOT_GAME_TIMEOUT = 300
+BOT_LINGER = 1.0
 
 class PokemonGameClient:
-    def __init__(self):
+    def __init__(self, clock=None, capture_path=None, fast_turn=False, port=None, trace_path=None):
+        self.clock = clock if clock is not None else SystemClock()
         print("=== POKEMON P2P BATTLE ===")
         
         # 1. Ask for Port (Crucial for running 2 instances on 1 computer)
-        port_input = input(f"Enter your port (default {constants.DEFAULT_PORT}): ")
-        self.my_port = int(port_input) if port_input else constants.DEFAULT_PORT
+        if port is None:
+            port_input = input(f"Enter your port (default {constants.DEFAULT_PORT}): ")
+            port = int(port_input) if port_input else constants.DEFAULT_PORT
+        self.my_port = port
         
         # 2. Initialize Managers
-        self.net = NetworkManager(port=self.my_port)
+        self.net = NetworkManager(port=self.my_port, clock=self.clock, capture_path=capture_path)
         self.poke = PokemonManager("pokemon.csv")
         self.engine = GameEngine(self.poke, self.net)
+        self.engine.offer_fast_turn = fast_turn # Offer/accept fast-turn mode in the handshake
+        self.recommender = MoveRecommender(self.poke)
+
+        # Per-turn timing spans, written to trace_path on exit (and on /trace FILE)
+        self.trace_path = trace_path
+        self.tracer = None
+        if trace_path:
+            self.tracer = TurnTracer(clock=self.clock)
+            self.tracer.attach(self.engine)
+
+        # On-demand sampling profiler (/profile N), off until asked
+        self.profiler = SamplingProfiler()
         
         # 3. State Flags
         self.running = True
@@ -56,14 +81,7 @@ class PokemonGameClient:
         choice = input("Select option: ")
         
         if choice == '1':
-            self.is_host = True
-            print(f"\n[HOST] Waiting for challenger...")
-            # Announce via Broadcast
-            self.net.send_broadcast(constants.MSG_BATTLE_SETUP, {
-                "communication_mode": "BROADCAST",
-                "status": "OPEN",
-                "host_name": self.player_name
-            })
+            self.host_game()
             
         elif choice == '2':
             self.is_host = False
@@ -72,14 +90,15 @@ class PokemonGameClient:
         elif choice == '3':
             self.is_host = False
             self.is_spectator = True
+            self.engine.start_spectating()
             self.join_game(is_spectator=True)
 
         elif choice == '4':
             print("Scanning for games...")
             # Listen for broadcast announcements
-            start_time = time.time()
+            start_time = self.clock.monotonic()
             found_games = []
-            while time.time() - start_time < 5: # Scan for 5 seconds
+            while self.clock.monotonic() - start_time < 5: # Scan for 5 seconds
                 msg = self.net.receive_message()
                 if msg and msg.get(constants.KEY_MSG_TYPE) == constants.MSG_BATTLE_SETUP:
                      if msg.get("communication_mode") == "BROADCAST":
@@ -87,7 +106,7 @@ class PokemonGameClient:
                          if addr not in [g['addr'] for g in found_games]:
                              found_games.append({'addr': addr, 'host': msg.get('host_name')})
                              print(f"Found game hosted by {msg.get('host_name')} at {addr}")
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
             
             if not found_games:
                 print("No games found. Try joining manually.")
@@ -106,20 +125,31 @@ class PokemonGameClient:
                     self.net.peer_address = (target_ip, target_port)
                     
                     print(f"Joining {target_ip}:{target_port}...")
-                    self.net.send_reliable(constants.MSG_HANDSHAKE_REQUEST, {
-                        constants.KEY_SENDER: self.player_name
-                    })
+                    self.net.send_reliable(constants.MSG_HANDSHAKE_REQUEST, self.handshake_payload())
                 except:
                     print("Invalid selection.")
 
-    def join_game(self, is_spectator):
+    def host_game(self):
+        self.is_host = True
+        self.engine.is_host = True
+        print(f"\n[HOST] Waiting for challenger...")
+        # Announce via Broadcast
+        self.net.send_broadcast(constants.MSG_BATTLE_SETUP, {
+            "communication_mode": "BROADCAST",
+            "status": "OPEN",
+            "host_name": self.player_name
+        })
+
+    def join_game(self, is_spectator, target_ip=None, target_port=None):
         # 1. Get Target IP
-        target_ip = input("Enter Host IP (use 127.0.0.1 for local): ")
-        if not target_ip: target_ip = "127.0.0.1"
+        if target_ip is None:
+            target_ip = input("Enter Host IP (use 127.0.0.1 for local): ")
+            if not target_ip: target_ip = "127.0.0.1"
 
         # 2. Get Target Port (Important if testing locally)
-        target_port_input = input(f"Enter Host Port (default {constants.DEFAULT_PORT}): ")
-        target_port = int(target_port_input) if target_port_input else constants.DEFAULT_PORT
+        if target_port is None:
+            target_port_input = input(f"Enter Host Port (default {constants.DEFAULT_PORT}): ")
+            target_port = int(target_port_input) if target_port_input else constants.DEFAULT_PORT
         
         # 3. Setup peer immediately
         self.net.set_peer(target_ip)
@@ -129,20 +159,25 @@ class PokemonGameClient:
         msg_type = constants.MSG_SPECTATOR_REQUEST if is_spectator else constants.MSG_HANDSHAKE_REQUEST
         print(f"\n[JOIN] Sending {msg_type} to {target_ip}:{target_port}...")
         
-        self.net.send_reliable(msg_type, {
-            constants.KEY_SENDER: self.player_name
-        })
+        if is_spectator:
+            self.net.send_reliable(msg_type, {constants.KEY_SENDER: self.player_name})
+        else:
+            self.net.send_reliable(msg_type, self.handshake_payload())
+
+    def handshake_payload(self):
+        payload = {constants.KEY_SENDER: self.player_name}
+        if self.engine.offer_fast_turn:
+            payload[constants.KEY_FAST_TURN] = 1
+        return payload
             
     def setup_game_data(self):
         """Phase 2: Pick Pokemon and exchange stats."""
-        import json # Import here to avoid messing with top of file for now
-        
         if self.is_spectator:
             print("[SPECTATOR] Waiting for battle to start...")
             # Spectator just waits for messages
             while self.running:
                 self.network_loop_step()
-                time.sleep(0.1)
+                self.clock.sleep(0.1)
             return
 
         # 1. Communication Mode Selection (RFC 4.4) - Moved to top for UX
@@ -162,13 +197,23 @@ class PokemonGameClient:
                 print("Invalid choice.")
 
         # 2. Pick Pokemon
+        if self.engine.opponent_pokemon:
+            self.show_counter_picks(self.engine.opponent_pokemon.name)
+        print("(Type /recommend [Opponent] for counter-picks)")
         while True:
             p_name = input("\nChoose your Pokemon (e.g. Bulbasaur): ").strip()
+            if p_name.startswith("/recommend"):
+                self.show_counter_picks(p_name.split(" ", 1)[1] if " " in p_name else None)
+                continue
             data = self.poke.get_pokemon(p_name)
             if data:
                 break
             else:
-                print("Invalid Pokemon name! Check pokemon.csv for exact spelling.")
+                suggestions = self.poke.suggest_pokemon(p_name)
+                if suggestions:
+                    print(f"Invalid Pokemon name! Did you mean: {', '.join(suggestions)}?")
+                else:
+                    print("Invalid Pokemon name! Check pokemon.csv for exact spelling.")
         
         # 3. Stat Boost Allocation
         print("\nAllocate 10 Stat Boosts (Sp. Atk and Sp. Def).")
@@ -182,6 +227,13 @@ class PokemonGameClient:
             except ValueError:
                 print("Invalid number.")
 
+        self.send_battle_setup(data, sp_atk, sp_def, comm_mode)
+        self.wait_for_opponent()
+
+    def send_battle_setup(self, data, sp_atk, sp_def, comm_mode):
+        """Sets our Pokemon and sends BATTLE_SETUP to the opponent."""
+        import json # Import here to avoid messing with top of file for now
+        p_name = data.name
         self.engine.set_my_pokemon(p_name, sp_atk, sp_def)
 
         # Send BATTLE_SETUP to opponent
@@ -196,16 +248,18 @@ class PokemonGameClient:
         setup_data = {
             constants.KEY_POKEMON_NAME: p_name,
             constants.KEY_STAT_BOOSTS: json.dumps(boosts_data),
-            constants.KEY_POKEMON_DATA: json.dumps(data),
+            constants.KEY_POKEMON_DATA: json.dumps(data.to_dict()),
             constants.KEY_COMM_MODE: comm_mode 
         }
         self.net.send_reliable(constants.MSG_BATTLE_SETUP, setup_data)
-        
+
+    def wait_for_opponent(self):
+        """Pumps the network until the opponent's BATTLE_SETUP arrives, then starts the battle."""
         print("Waiting for opponent to pick their Pokemon...")
         # We wait until the engine receives a BATTLE_SETUP message
         while self.engine.opponent_pokemon is None:
             self.network_loop_step()
-            time.sleep(0.1)
+            self.clock.sleep(0.1)
             
         # Once we have opponent data, start the game logic
         # Note: start_battle is called after Handshake Response (for seed) AND Setup
@@ -226,6 +280,12 @@ class PokemonGameClient:
         if not self.is_spectator:
             print("/attack [MoveName] -> Use a move")
             print("/attack [MoveName] boost -> Use a move with boost")
+            print("/moves [Type]      -> List your Pokemon's moves")
+            print("/recommend         -> Best moves against the opponent")
+            print("/recommend [Name]  -> Counter-picks against a Pokemon")
+        print("/trace [File]      -> Show turn timings (or write them as JSON)")
+        print("/profile [Seconds] -> Profile all threads, write to profiles/")
+        print("/memory [start|stop] -> Memory use (start/stop allocation tracing)")
         print("/chat [Message]    -> Send text chat")
         print("/sticker [Base64]  -> Send sticker")
         print("/quit              -> Exit game")
@@ -242,11 +302,33 @@ class PokemonGameClient:
                     break
                     
                 elif cmd.startswith("/attack ") and not self.is_spectator:
-                    parts = cmd.split(" ")
-                    move_name = parts[1]
-                    use_boost = "boost" in parts
+                    # Move names can contain spaces ("Ice Beam"); a trailing "boost" is the flag
+                    parts = cmd.split()[1:]
+                    use_boost = len(parts) > 1 and parts[-1].lower() == "boost"
+                    if use_boost:
+                        parts = parts[:-1]
+                    typed = " ".join(parts)
+                    move_name = self.poke.resolve_move(typed) or typed
                     self.engine.select_move(move_name, use_boost)
+
+                elif cmd.startswith("/moves") and not self.is_spectator:
+                    self.show_moves(cmd.split(" ", 1)[1] if " " in cmd else None)
+
+                elif cmd.startswith("/recommend") and not self.is_spectator:
+                    if " " in cmd.strip():
+                        self.show_counter_picks(cmd.split(" ", 1)[1])
+                    else:
+                        self.show_recommendations()
+                    
+                elif cmd.startswith("/trace"):
+                    self.show_trace(cmd.split(" ", 1)[1].strip() if " " in cmd.strip() else None)
                     
+                elif cmd.startswith("/profile"):
+                    self.start_profile(cmd.split(" ", 1)[1] if " " in cmd.strip() else 10)
+
+                elif cmd.startswith("/memory"):
+                    self.show_memory(cmd.split(" ", 1)[1].strip() if " " in cmd.strip() else None)
+
                 elif cmd.startswith("/chat "):
                     msg_text = cmd.split(" ", 1)[1]
                     self.net.send_reliable(constants.MSG_CHAT_MESSAGE, {
@@ -258,6 +340,9 @@ class PokemonGameClient:
                     
                 elif cmd.startswith("/sticker "):
                     sticker_data = cmd.split(" ", 1)[1]
+                    if len(sticker_data.encode('utf-8')) > constants.MAX_STICKER_BYTES:
+                        print(f"Sticker too large to send (at most {constants.MAX_STICKER_BYTES} bytes).")
+                        continue
                     self.net.send_reliable(constants.MSG_CHAT_MESSAGE, {
                         constants.KEY_SENDER: self.player_name,
                         constants.KEY_CONTENT_TYPE: constants.CONTENT_TYPE_STICKER,
@@ -276,99 +361,109 @@ class PokemonGameClient:
             except Exception as e:
                 print(f"Input Error: {e}")
 
+    def show_trace(self, path=None):
+        """Prints the recorded turn spans, or writes them to path as JSON."""
+        if self.tracer is None:
+            print("Tracing is off. Start with --trace FILE to record turn timings.")
+            return
+        if path:
+            count = self.tracer.dump(path)
+            print(f"Wrote {count} turn traces to {path}")
+            return
+        lines = self.tracer.summary()
+        if not lines:
+            print("No finished turns yet.")
+        for line in lines:
+            print(line)
+
+    def start_profile(self, seconds):
+        """Samples every thread for a while in the background; the battle keeps running."""
+        try:
+            seconds = parse_seconds(seconds)
+        except ValueError as e:
+            print(f"Invalid profile length: {e}")
+            return
+        if not self.profiler.start(seconds, self.finish_profile):
+            print("A profile is already running.")
+            return
+        print(f"Profiling all threads for {seconds:g} s...")
+
+    def finish_profile(self, profiler):
+        collapsed, stats, summary = profiler.write()
+        print(f"[PROFILE] {profiler.samples} samples written to {collapsed}, {stats} and {summary}")
+
+    def show_memory(self, action=None):
+        """Prints structure sizes and, while tracemalloc is on, the top allocation sites."""
+        if action == "start":
+            memory.start_tracing()
+        elif action == "stop":
+            memory.stop_tracing()
+        elif action:
+            print("Usage: /memory [start|stop]")
+            return
+        extra = {"counter_picks_cache": (self.recommender.counter_picks_cache, COUNTER_PICKS_CACHE_SIZE),
+                 "pre_roll_damage": (self.poke.pre_roll_damage, None)}
+        if self.tracer:
+            extra["trace_spans"] = (self.tracer.spans, self.tracer.spans.maxlen)
+        for line in memory.format_report(memory.memory_report(self.net, extra)):
+            print(line)
+
+    def save_trace(self):
+        if self.tracer:
+            self.tracer.dump(self.trace_path)
+
+    def show_moves(self, move_type=None):
+        """Prints the learnable moves of our Pokemon, strongest first (optionally one type)."""
+        if not self.engine.my_pokemon:
+            print("Pick a Pokemon first.")
+            return
+        learnable = self.poke.learnset(self.engine.my_pokemon.name)
+        for name in self.poke.find_moves(move_type=move_type.strip() if move_type else None):
+            if name in learnable:
+                move = self.poke.moves[name]
+                print(f"  {name:18} {move['type']:9} {move['category']:9} {move['power']}")
+
+    def show_recommendations(self):
+        """Prints our best moves against the current opponent, by expected damage."""
+        me, opponent = self.engine.my_pokemon, self.engine.opponent_pokemon
+        if not me or not opponent:
+            print("The battle hasn't started yet. Try /recommend [Opponent] for counter-picks.")
+            return
+        print(f"Best moves vs {opponent.name} ({opponent.hp}/{opponent.max_hp} HP):")
+        boosted = {}
+        if me.sp_atk_boosts > 0:
+            boosted = {entry["move"]: entry for entry in self.recommender.rank_moves(
+                me.name, opponent.name, opponent.hp, use_boost=True, limit=None)}
+        for rank, entry in enumerate(self.recommender.rank_moves(me.name, opponent.name, opponent.hp), 1):
+            line = (f"  {rank}. {entry['move']:18} {entry['type']:9} {entry['min']:>4}-{entry['max']:<4} "
+                    f"avg {entry['expected']:6.1f}  KO {entry['ko_chance'] * 100:3.0f}%")
+            if entry["move"] in boosted:
+                line += f"  (boost: KO {boosted[entry['move']]['ko_chance'] * 100:3.0f}%)"
+            print(line)
+
+    def show_counter_picks(self, opponent_name):
+        """Prints the Pokemon that should KO opponent_name before it KOs them."""
+        if not opponent_name:
+            print("Usage: /recommend [Opponent]")
+            return
+        opponent = self.poke.get_pokemon(opponent_name)
+        if not opponent:
+            suggestions = self.poke.suggest_pokemon(opponent_name)
+            print(f"Unknown Pokemon: {opponent_name.strip()}" + (f". Did you mean: {', '.join(suggestions)}?" if suggestions else ""))
+            return
+        print(f"Counter-picks vs {opponent.name}:")
+        for pick in self.recommender.counter_picks(opponent.name, as_host=self.is_host):
+            print(f"  {pick['pokemon']:14} {pick['move']:18} KOs in {pick['hits_to_ko']}, KO'd in {pick['hits_to_be_ko']}")
+
     def network_loop_step(self):
         """
         Runs one iteration of network processing.
+        Handshake, chat and battle messages are all dispatched by the engine's transition table.
         """
         # 1. Receive incoming
         msg = self.net.receive_message()
         if msg:
-            msg_type = msg.get(constants.KEY_MSG_TYPE)
-            
-            # --- HANDSHAKE HANDLING (Connection Phase) ---
-            if msg_type == constants.MSG_HANDSHAKE_REQUEST:
-                print(f"[NET] Received Handshake Request from {msg.get('source_addr')}")
-                if self.is_host:
-                    # Set peer
-                    self.net.peer_address = msg.get('source_addr')
-                    # Generate Seed
-                    seed = random.randint(1000, 9999)
-                    self.engine.seed = seed
-                    # Send Response
-                    self.net.send_reliable(constants.MSG_HANDSHAKE_RESPONSE, {
-                        constants.KEY_SEED: seed,
-                        "status": "OK"
-                    })
-                    print(f"Connected! Seed: {seed}. Please pick your Pokemon.")
-                    # Host waits for Setup Phase now.
-                    # self.engine.start_battle(True, seed) -> REMOVED
-
-            elif msg_type == constants.MSG_SPECTATOR_REQUEST:
-                print(f"[NET] Spectator joined from {msg.get('source_addr')}")
-                self.net.add_spectator(msg.get('source_addr'))
-                # Send ACK manually or rely on reliability layer if we want
-                # But we should probably send current state or at least a welcome
-                self.net.send_reliable(constants.MSG_CHAT_MESSAGE, {
-                    constants.KEY_SENDER: "HOST",
-                    constants.KEY_CONTENT_TYPE: constants.CONTENT_TYPE_TEXT,
-                    constants.KEY_MSG_TEXT: "Welcome Spectator!"
-                })
-
-            elif msg_type == constants.MSG_HANDSHAKE_RESPONSE:
-                seed = msg.get(constants.KEY_SEED)
-                print(f"[NET] Handshake Accepted! Seed: {seed}")
-                self.engine.seed = int(seed)
-                # Joiner waits for Setup Phase now.
-                # self.engine.start_battle(False, seed) -> REMOVED
-
-            # --- CHAT HANDLING ---
-            elif msg_type == constants.MSG_CHAT_MESSAGE:
-                sender = msg.get(constants.KEY_SENDER, "Unknown")
-                content_type = msg.get(constants.KEY_CONTENT_TYPE)
-                
-                if content_type == constants.CONTENT_TYPE_STICKER:
-                    print(f"\n[{sender}]: [STICKER RECEIVED]")
-                else:
-                    text = msg.get(constants.KEY_MSG_TEXT)
-                    print(f"\n[{sender}]: {text}")
-
-                # HOST RELAY LOGIC
-                if self.is_host:
-                    source_addr = msg.get('source_addr')
-                    
-                    # Prepare data for relay (remove internal/header keys)
-                    relay_data = {k: v for k, v in msg.items() if k not in [
-                        constants.KEY_MSG_TYPE, constants.KEY_SEQ_NUM, 'source_addr'
-                    ]}
-                    
-                    # 1. If from Opponent -> Relay to ALL Spectators
-                    if source_addr == self.net.peer_address:
-                        for spec in self.net.spectators:
-                            try:
-                                packet = self.net.construct_message(constants.MSG_CHAT_MESSAGE, relay_data)
-                                self.net.sock.sendto(packet, spec)
-                            except: pass
-                            
-                    # 2. If from Spectator -> Relay to Opponent + Other Spectators
-                    elif source_addr in self.net.spectators:
-                        # To Opponent
-                        if self.net.peer_address:
-                            try:
-                                packet = self.net.construct_message(constants.MSG_CHAT_MESSAGE, relay_data)
-                                self.net.sock.sendto(packet, self.net.peer_address)
-                            except: pass
-                        
-                        # To Other Spectators
-                        for spec in self.net.spectators:
-                            if spec != source_addr:
-                                try:
-                                    packet = self.net.construct_message(constants.MSG_CHAT_MESSAGE, relay_data)
-                                    self.net.sock.sendto(packet, spec)
-                                except: pass
-
-            # --- GAME ENGINE HANDLING ---
-            else:
-                self.engine.process_message(msg)
+            self.engine.process_message(msg)
 
         # 2. Resend any lost packets
         self.net.check_resend()
@@ -381,7 +476,7 @@ class PokemonGameClient:
         print("Waiting for connection...")
         while self.engine.seed is None:
              self.network_loop_step()
-             time.sleep(0.1)
+             self.clock.sleep(0.1)
         
         # Step 2: Pick Pokemon
         self.setup_game_data()
@@ -397,8 +492,102 @@ class PokemonGameClient:
             self.network_loop_step()
             
             # CPU rest to prevent 100% usage
-            time.sleep(0.01) 
+            self.clock.sleep(0.01) 
+        self.save_trace()
+
+class BotGameClient(PokemonGameClient):
+    """
+    Plays one battle without input(): hosts or joins, picks a Pokemon and
+    boosts, answers every turn with BotPlayer's search and returns at
+    GAME_OVER (or after timeout seconds). Used for load generation.
+    """
+    def __init__(self, role, port, peer=None, name="Bot", pokemon=None, boosts=BOT_BOOSTS, seed=None,
+                 time_budget=BOT_TIME_BUDGET, timeout=BOT_GAME_TIMEOUT, clock=None, capture_path=None, fast_turn=False,
+                 trace_path=None):
+        super().__init__(clock=clock, capture_path=capture_path, fast_turn=fast_turn, port=port, trace_path=trace_path)
+        self.role = role
+        self.peer = peer
+        self.player_name = name
+        self.timeout = timeout
+        self.bot = BotPlayer(self.poke, pokemon, boosts, seed, time_budget)
+
+    def setup_connection(self):
+        if self.role == "host":
+            self.host_game()
+        else:
+            self.join_game(is_spectator=False, target_ip=self.peer[0], target_port=self.peer[1])
+
+    def setup_game_data(self):
+        name = self.bot.choose_pokemon(self.engine.opponent_pokemon, self.is_host)
+        sp_atk, sp_def = self.bot.boosts
+        self.send_battle_setup(self.poke.get_pokemon(name), sp_atk, sp_def, constants.MODE_P2P)
+        self.wait_for_opponent()
+
+    def run(self):
+        """Returns True if the battle reached GAME_OVER."""
+        deadline = self.clock.monotonic() + self.timeout
+        self.setup_connection()
+        while self.engine.seed is None:
+            if self.clock.monotonic() > deadline:
+                print("[BOT] No opponent connected.")
+                return False
+            self.network_loop_step()
+            self.clock.sleep(0.01)
+
+        self.setup_game_data()
+        while self.engine.state != constants.STATE_GAME_OVER and self.clock.monotonic() < deadline:
+            self.network_loop_step()
+            if not self.bot.step(self.engine):
+                self.clock.sleep(0.001)
+
+        # Keep answering for a moment so the last reports/ACKs reach the peer
+        linger_until = self.clock.monotonic() + BOT_LINGER
+        while self.clock.monotonic() < linger_until:
+            self.network_loop_step()
+            self.clock.sleep(0.01)
+        self.net.close()
+        self.save_trace()
+        return self.engine.state == constants.STATE_GAME_OVER
+
 
 if __name__ == "__main__":
-    client = PokemonGameClient()
+    parser = argparse.ArgumentParser(description="Pokemon P2P Battle (CLI)")
+    parser.add_argument('--capture', type=str, default=None, help='Append every datagram to this capture file (see replay.py)')
+    parser.add_argument('--fast-turn', action='store_true', help='Offer fast-turn mode (state-hash lockstep, one round trip per turn)')
+    parser.add_argument('--trace', type=str, default=None, help='Record per-turn timing spans and write them to this JSON file on exit')
+    parser.add_argument('--bot', choices=['host', 'join'], help='Play one battle automatically instead of reading input')
+    parser.add_argument('--port', type=int, default=constants.DEFAULT_PORT, help='Local UDP port (bot mode)')
+    parser.add_argument('--peer', type=str, default=f"127.0.0.1:{constants.DEFAULT_PORT}", help='Host address to join, IP:PORT (bot mode)')
+    parser.add_argument('--name', type=str, default='Bot', help='Player name (bot mode)')
+    parser.add_argument('--pokemon', type=str, default=None, help='Pokemon to play (bot mode, default: a counter-pick or random)')
+    parser.add_argument('--boosts', type=str, default="%d,%d" % BOT_BOOSTS, help='Sp. Atk,Sp. Def boosts (bot mode)')
+    parser.add_argument('--think-ms', type=float, default=BOT_TIME_BUDGET * 1000, help='Search time per move (bot mode)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed for the bot\'s picks (bot mode)')
+    parser.add_argument('--timeout', type=float, default=BOT_GAME_TIMEOUT, help='Give up after this many seconds (bot mode)')
+    parser.add_argument('--quiet', action='store_true', help='Only print the result line (bot mode)')
+    args = parser.parse_args()
+
+    if args.bot:
+        if args.quiet:
+            sys.stdout = open(os.devnull, 'w')
+        ip, port = args.peer.rsplit(":", 1)
+        sp_atk, sp_def = (int(b) for b in args.boosts.split(","))
+        client = BotGameClient(args.bot, args.port, (ip, int(port)), args.name, args.pokemon, (sp_atk, sp_def),
+                               args.seed, args.think_ms / 1000, args.timeout,
+                               capture_path=args.capture, fast_turn=args.fast_turn, trace_path=args.trace)
+        error = client.bot.pokemon_error()
+        if error:
+            sys.stderr.write(f"[BOT] {error}\n") # Shown even with --quiet
+            client.net.close()
+            sys.exit(1)
+        finished = client.run()
+        me, opponent = client.engine.my_pokemon, client.engine.opponent_pokemon
+        times = client.bot.decision_times
+        sys.__stdout__.write(
+            f"[BOT] {'finished' if finished else 'timed out'}: "
+            f"{me.name if me else '?'} {me.hp if me else '?'} HP vs {opponent.name if opponent else '?'} {opponent.hp if opponent else '?'} HP, "
+            f"{len(times)} moves, {sum(times) / len(times) * 1000 if times else 0:.2f} ms/decision\n")
+        sys.exit(0 if finished else 1)
+
+    client = PokemonGameClient(capture_path=args.capture, fast_turn=args.fast_turn, trace_path=args.trace)
     client.run()
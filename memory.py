@@ -0,0 +1,140 @@
+import os
+import gc
+import sys
+import collections
+import tracemalloc
+
+import constants
+
+try:
+    import resource # Not available on Windows
+except ImportError:
+    resource = None
+
+MEMORY_TOP = 15   # Allocation sites listed from tracemalloc
+TRACE_FRAMES = 1  # Frames tracemalloc keeps per allocation; more is slower but groups better
+
+
+def deep_size(obj, seen=None):
+    """Approximate bytes held by obj: itself plus the containers, strings and bytes inside it."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        # list() copies in one step; another thread may be adding entries
+        for key, value in list(obj.items()):
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+        for item in list(obj):
+            size += deep_size(item, seen)
+    return size
+
+
+def structure_sizes(net, extra=None):
+    """
+    {name: {"items", "bytes", "cap"}} for the structures that grow with uptime:
+    the NetworkManager's and any extra {name: (obj, cap)} the client adds.
+    lru_cache functions report their entry count only.
+    """
+    structures = {}
+    if net is not None:
+        structures["received_history"] = (net.received_history, constants.MAX_RECEIVED_HISTORY)
+        structures["pending_acks"] = (net.pending_acks, constants.MAX_PENDING_ACKS)
+        structures["spectators"] = (net.spectators, constants.MAX_SPECTATORS)
+        structures["incoming_messages"] = (list(net.incoming_messages.queue), None)
+    structures.update(extra or {})
+
+    sizes = {}
+    for name, (obj, cap) in structures.items():
+        if hasattr(obj, "cache_info"):
+            info = obj.cache_info()
+            sizes[name] = {"items": info.currsize, "bytes": None, "cap": info.maxsize}
+        else:
+            sizes[name] = {"items": len(obj), "bytes": deep_size(obj), "cap": cap}
+    return sizes
+
+
+def process_memory():
+    """Current and peak resident set size in KB, where the platform tells us."""
+    rss_kb = None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss_kb = int(line.split()[1])
+    except OSError:
+        pass
+    peak_kb = None
+    if resource is not None:
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            peak_kb //= 1024 # Bytes on macOS
+    return {"rss_kb": rss_kb, "peak_rss_kb": peak_kb, "gc_objects": len(gc.get_objects())}
+
+
+def start_tracing(frames=TRACE_FRAMES):
+    """
+    Starts tracemalloc. Only allocations made from now on are attributed, and
+    every allocation pays for it, so it stays off until asked for. False if already on.
+    """
+    if tracemalloc.is_tracing():
+        return False
+    tracemalloc.start(frames)
+    return True
+
+
+def stop_tracing():
+    """Stops tracemalloc and frees its traces. False if it was not on."""
+    if not tracemalloc.is_tracing():
+        return False
+    tracemalloc.stop()
+    return True
+
+
+def top_allocators(limit=MEMORY_TOP):
+    """Live allocations grouped by source line, largest first. None when tracemalloc is off."""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+    top = []
+    for stat in snapshot.statistics("lineno")[:limit]:
+        frame = stat.traceback[0]
+        top.append({"where": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                    "size_kb": stat.size / 1024, "count": stat.count})
+    return top
+
+
+def memory_report(net, extra=None, top=MEMORY_TOP):
+    """Process memory, structure sizes and (when tracing) the top allocation sites."""
+    report = process_memory()
+    # Snapshot first, so the sizing below does not show up among the allocators
+    report["tracemalloc"] = {"tracing": tracemalloc.is_tracing()}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report["tracemalloc"].update({"traced_kb": current / 1024, "peak_kb": peak / 1024, "top": top_allocators(top)})
+    report["structures"] = structure_sizes(net, extra)
+    return report
+
+
+def format_report(report):
+    """The report as text lines, for the CLI."""
+    def kb(value):
+        return "?" if value is None else f"{value:,.0f} KB"
+    lines = [f"RSS {kb(report['rss_kb'])} (peak {kb(report['peak_rss_kb'])}), {report['gc_objects']:,} GC objects", "",
+             f"{'structure':24} {'items':>8} {'cap':>8} {'size':>12}"]
+    for name, size in report["structures"].items():
+        cap = "-" if size["cap"] is None else size["cap"]
+        bytes_ = "-" if size["bytes"] is None else kb(size["bytes"] / 1024)
+        lines.append(f"{name:24} {size['items']:>8} {cap:>8} {bytes_:>12}")
+    tracing = report["tracemalloc"]
+    if not tracing["tracing"]:
+        lines += ["", "tracemalloc is off (start it to see the top allocation sites)."]
+        return lines
+    lines += ["", f"tracemalloc: {kb(tracing['traced_kb'])} traced (peak {kb(tracing['peak_kb'])})",
+              f"{'size':>12} {'blocks':>8}  where"]
+    for stat in tracing["top"]:
+        lines.append(f"{kb(stat['size_kb']):>12} {stat['count']:>8}  {stat['where']}")
+    return lines
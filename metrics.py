@@ -0,0 +1,134 @@
+import bisect
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TURN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8" # Prometheus text exposition format
+
+
+class Counter:
+    """
+    Monotonic counter. inc() is a plain int add with no lock: under the GIL
+    a scrape may read a value one update old, and two threads racing on the
+    same counter can at worst lose an increment, which monitoring tolerates.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two adds, no lock."""
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1) # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def cumulative(self):
+        """[(le, count)] with Prometheus' cumulative bucket counts."""
+        rows = []
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), list(self.counts)):
+            total += count
+            rows.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return rows
+
+
+class MetricsRegistry:
+    """Named counters, histograms and read-at-scrape gauges, rendered in the Prometheus text format."""
+    def __init__(self):
+        self.metrics = [] # (name, help, type, Counter | Histogram | gauge function), in render order
+
+    def counter(self, name, help_text):
+        counter = Counter()
+        self.metrics.append((name, help_text, "counter", counter))
+        return counter
+
+    def histogram(self, name, help_text, bounds=LATENCY_BUCKETS):
+        histogram = Histogram(bounds)
+        self.metrics.append((name, help_text, "histogram", histogram))
+        return histogram
+
+    def gauge(self, name, help_text, read):
+        """read() is called on every scrape, so the hot path never touches the gauge."""
+        self.metrics.append((name, help_text, "gauge", read))
+
+    def render(self):
+        lines = []
+        for name, help_text, metric_type, metric in self.metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            if metric_type == "counter":
+                lines.append(f"{name} {metric.value}")
+            elif metric_type == "gauge":
+                lines.append(f"{name} {metric()}")
+            else:
+                for le, count in metric.cumulative():
+                    lines.append(f'{name}_bucket{{le="{le}"}} {count}')
+                lines.append(f"{name}_sum {metric.sum}")
+                lines.append(f"{name}_count {sum(metric.counts)}")
+        return "\n".join(lines) + "\n"
+
+
+class ProtocolMetrics(MetricsRegistry):
+    """
+    The protocol's metrics. Attach to an engine (and its NetworkManager) the
+    same way as a TurnTracer; both check `self.metrics` before each update,
+    so nothing is counted when no metrics object is attached.
+    """
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+        self.net = None
+        self.turn_start = None
+
+        self.datagrams_in = self.counter("pokeproto_datagrams_received_total", "UDP datagrams received")
+        self.datagrams_out = self.counter("pokeproto_datagrams_sent_total", "UDP datagrams sent (including ACKs and retransmits)")
+        self.bytes_in = self.counter("pokeproto_received_bytes_total", "Bytes received")
+        self.bytes_out = self.counter("pokeproto_sent_bytes_total", "Bytes sent")
+        self.acks_in = self.counter("pokeproto_acks_received_total", "ACKs received")
+        self.acks_out = self.counter("pokeproto_acks_sent_total", "ACKs sent")
+        self.duplicates = self.counter("pokeproto_duplicates_total", "Duplicate datagrams dropped")
+        self.malformed = self.counter("pokeproto_malformed_total", "Datagrams that could not be parsed")
+        self.retransmits = self.counter("pokeproto_retransmits_total", "Reliable messages resent after a timeout")
+        self.give_ups = self.counter("pokeproto_give_ups_total", "Reliable messages given up on (maximum retries or pending ACK limit)")
+        self.evictions = self.counter("pokeproto_evictions_total", "Entries dropped by the memory caps (spectators, stickers)")
+        self.ack_rtt = self.histogram("pokeproto_ack_rtt_seconds", "Reliable send to ACK, first transmissions only")
+        self.turns = self.counter("pokeproto_turns_total", "Turns completed")
+        self.turn_duration = self.histogram("pokeproto_turn_duration_seconds", "Move announced/received to turn end", TURN_BUCKETS)
+        self.discrepancies = self.counter("pokeproto_discrepancies_total", "Calculation reports that did not match ours")
+        self.fast_mismatches = self.counter("pokeproto_fast_turn_mismatches_total", "Fast-turn state hashes that did not match ours")
+        self.games = self.counter("pokeproto_games_total", "Battles that reached GAME_OVER")
+        self.gauge("pokeproto_pending_acks", "Reliable messages waiting for an ACK",
+                   lambda: len(self.net.pending_acks) if self.net else 0)
+        self.gauge("pokeproto_incoming_queue_depth", "Received messages not yet handled by the engine",
+                   lambda: self.net.incoming_messages.qsize() if self.net else 0)
+        self.gauge("pokeproto_spectators", "Spectators attached to this host",
+                   lambda: len(self.net.spectators) if self.net else 0)
+        self.gauge("pokeproto_received_history", "(address, sequence) pairs kept for duplicate filtering",
+                   lambda: len(self.net.received_history) if self.net else 0)
+
+    def attach(self, engine):
+        engine.metrics = self
+        engine.network_manager.metrics = self
+        self.net = engine.network_manager
+
+    def turn_begin(self):
+        self.turn_start = self.clock.monotonic()
+
+    def turn_end(self):
+        self.turns.inc()
+        if self.turn_start is not None:
+            self.turn_duration.observe(self.clock.monotonic() - self.turn_start)
+            self.turn_start = None
@@ -2,10 +2,15 @@ import constants
 import socket
 import threading
 import queue
-import time
+import collections
+from clock import SystemClock
+from capture import CaptureWriter, DIRECTION_IN, DIRECTION_OUT
 
 class NetworkManager:
-    def __init__(self, port = constants.DEFAULT_PORT):
+    def __init__(self, port = constants.DEFAULT_PORT, clock=None, capture_path=None):
+
+        # All timing goes through the clock so it can be swapped for a VirtualClock
+        self.clock = clock if clock is not None else SystemClock()
 
         # Creating UDP socket
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -23,10 +28,21 @@ class NetworkManager:
         
         self.incoming_messages = queue.Queue()
         self.pending_acks = {} # seq_num -> {packet, timestamp, retries}
-        self.received_history = set() # (addr, seq_num)
+        self.received_history = collections.OrderedDict() # (addr, seq_num) -> None, oldest first
 
         self.message_callback = None #store the function we cal when msg arrives
 
+        # Optional datagram capture (see capture.py / replay.py)
+        self.capture = CaptureWriter(capture_path) if capture_path else None
+
+        # Optional TurnTracer (see turn_trace.py); None keeps tracing off
+        self.tracer = None
+        # Optional ProtocolMetrics (see metrics.py); None counts nothing
+        self.metrics = None
+
+        # Set by close(); the listener thread then stops without reporting an error
+        self.closed = False
+
         # Start the listener thread immediately
         # daemon=True means this thread dies automatically when the main program closes
         self.listener_thread = threading.Thread(target=self.listen_for_messages, daemon=True)
@@ -39,6 +55,12 @@ class NetworkManager:
 
     def add_spectator(self, address):
         if address not in self.spectators:
+            # Spectators never say goodbye, so past the cap the oldest one is dropped
+            if len(self.spectators) >= constants.MAX_SPECTATORS:
+                evicted = self.spectators.pop(0)
+                print(f"Spectator limit reached, dropped {evicted}")
+                if self.metrics:
+                    self.metrics.evictions.inc()
             self.spectators.append(address)
             print(f"Added spectator: {address}")
 
@@ -51,6 +73,35 @@ class NetworkManager:
         self.spectators.clear()
         print("NetworkManager connection state reset.")
 
+    def send_packet(self, packet, addr):
+        """
+        Every outgoing datagram goes through here so it can be captured.
+        """
+        # Recorded before sending: on loopback the peer's answer can be captured
+        # by the listener thread before sendto() returns, and replay needs our
+        # datagram first
+        if self.capture:
+            self.capture.record(DIRECTION_OUT, self.clock.monotonic(), addr, packet)
+        self.sock.sendto(packet, addr)
+        if self.metrics:
+            self.metrics.datagrams_out.inc()
+            self.metrics.bytes_out.inc(len(packet))
+
+    def close(self):
+        """Closes the socket (stops the listener thread) and any open capture."""
+        self.closed = True
+        try:
+            # Wakes a recvfrom() blocked in the listener thread; close() alone does not on Linux
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass # Unconnected UDP sockets report ENOTCONN but are woken anyway
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        if self.capture:
+            self.capture.close()
+
     def construct_message(self, message_type, data=None):
         """
         Takes a message type and a dictionary of data, 
@@ -87,7 +138,7 @@ class NetworkManager:
         
         # Send
         try:
-            self.sock.sendto(packet, self.peer_address)
+            self.send_packet(packet, self.peer_address)
             print(f"Sent {message_type} to {self.peer_address}")
         except Exception as e:
             print(f"Error sending message: {e}")
@@ -98,7 +149,7 @@ class NetworkManager:
         """
         packet = self.construct_message(message_type, data)
         try:
-            self.sock.sendto(packet, (constants.BROADCAST_ADDR, constants.DEFAULT_PORT))
+            self.send_packet(packet, (constants.BROADCAST_ADDR, constants.DEFAULT_PORT))
             print(f"Sent Broadcast {message_type}")
         except Exception as e:
             print(f"Error sending broadcast: {e}")
@@ -134,64 +185,90 @@ class NetworkManager:
             try:
                 # Wait for a packet (Blocking call)
                 data, addr = self.sock.recvfrom(constants.BUFFER_SIZE)
+                if self.closed:
+                    break
                 
-                # Parse the packet
-                message = self.parse_packet(data)
-                if not message:
-                    continue # Skip malformed packets
-
-                # Ignore own broadcasts (basic check)
-                # Note: getting own IP is tricky, so we might receive our own broadcast.
-                # The game engine should handle ignoring own messages if sender_name matches.
-
-                # If we don't have a peer yet, and this is a valid message, set it (Host logic)
-                # BUT only if it's a handshake or we are in a mode that accepts new peers
-                # For now, we leave this logic here, but Main might override peer_address
-                if self.peer_address is None and message.get(constants.KEY_MSG_TYPE) == constants.MSG_HANDSHAKE_REQUEST:
-                    # We don't auto-set peer_address here anymore for security/logic reasons, 
-                    # but we pass it to callback so Main can decide.
-                    pass
-
-                # Handle ACK
-                if message.get(constants.KEY_MSG_TYPE) == constants.MSG_ACK:
-                    self.handle_ack(message)
-                    continue
-
-                # RELIABILITY: Send ACK immediately if the message has a sequence number
-                if constants.KEY_SEQ_NUM in message:
-                    seq_num = message[constants.KEY_SEQ_NUM]
-                    self.send_ack(seq_num, addr)
-                    
-                    # DUPLICATE CHECK
-                    if (addr, seq_num) in self.received_history:
-                        # print(f"Ignoring duplicate message {seq_num} from {addr}")
-                        continue
-                    
-                    # Mark as seen
-                    self.received_history.add((addr, seq_num))
-
-                # Add to queue for main thread to process
-                # We attach the address to the message so logic knows who sent it
-                message['source_addr'] = addr
-                self.incoming_messages.put(message)
+                if self.capture:
+                    self.capture.record(DIRECTION_IN, self.clock.monotonic(), addr, data)
+                if self.metrics:
+                    self.metrics.datagrams_in.inc()
+                    self.metrics.bytes_in.inc(len(data))
 
-                # Pass the message to the Main Game Loop (Legacy callback support)
-                if self.message_callback:
-                    self.message_callback(message, addr)
+                self.handle_datagram(data, addr)
 
             except OSError as e:
+                if self.closed:
+                    break
                 # Windows Error 10054: Remote host closed connection (Port Unreachable)
-                # We should IGNORE this and keep listening.
-                if e.winerror == 10054:
+                # We should IGNORE this and keep listening. Other platforms have no winerror.
+                if getattr(e, "winerror", None) == 10054:
                     continue 
                 else:
                     print(f"Socket error: {e}")
                     break
                     
             except Exception as e:
+                if self.closed:
+                    break
                 print(f"Listener error: {e}")
                 break
 
+    def handle_datagram(self, data, addr):
+        """
+        Runs one received datagram through the reliability layer
+        (ACK handling, duplicate filtering) and queues it for the game.
+        """
+        # Parse the packet
+        message = self.parse_packet(data)
+        if not message:
+            if self.metrics:
+                self.metrics.malformed.inc()
+            return # Skip malformed packets
+
+        # Ignore own broadcasts (basic check)
+        # Note: getting own IP is tricky, so we might receive our own broadcast.
+        # The game engine should handle ignoring own messages if sender_name matches.
+
+        # If we don't have a peer yet, and this is a valid message, set it (Host logic)
+        # BUT only if it's a handshake or we are in a mode that accepts new peers
+        # For now, we leave this logic here, but Main might override peer_address
+        if self.peer_address is None and message.get(constants.KEY_MSG_TYPE) == constants.MSG_HANDSHAKE_REQUEST:
+            # We don't auto-set peer_address here anymore for security/logic reasons, 
+            # but we pass it to callback so Main can decide.
+            pass
+
+        # Handle ACK
+        if message.get(constants.KEY_MSG_TYPE) == constants.MSG_ACK:
+            self.handle_ack(message)
+            return
+
+        # RELIABILITY: Send ACK immediately if the message has a sequence number
+        if constants.KEY_SEQ_NUM in message:
+            seq_num = message[constants.KEY_SEQ_NUM]
+            self.send_ack(seq_num, addr)
+
+            # DUPLICATE CHECK
+            if (addr, seq_num) in self.received_history:
+                # print(f"Ignoring duplicate message {seq_num} from {addr}")
+                if self.metrics:
+                    self.metrics.duplicates.inc()
+                return
+
+            # Mark as seen. Retransmits arrive within a few timeouts, so only
+            # the most recent MAX_RECEIVED_HISTORY pairs need remembering.
+            self.received_history[(addr, seq_num)] = None
+            if len(self.received_history) > constants.MAX_RECEIVED_HISTORY:
+                self.received_history.popitem(last=False)
+
+        # Add to queue for main thread to process
+        # We attach the address to the message so logic knows who sent it
+        message['source_addr'] = addr
+        self.incoming_messages.put(message)
+
+        # Pass the message to the Main Game Loop (Legacy callback support)
+        if self.message_callback:
+            self.message_callback(message, addr)
+
     def send_ack(self, seq_number, target_addr):
         """Helper to send an ACK for a specific sequence number."""
         ack_data = {
@@ -200,7 +277,9 @@ class NetworkManager:
         # We use construct_message manually here to avoid recursive ACKs
         # construct_message now handles skipping SEQ_NUM for ACKs
         packet = self.construct_message(constants.MSG_ACK, ack_data)
-        self.sock.sendto(packet, target_addr)
+        self.send_packet(packet, target_addr)
+        if self.metrics:
+            self.metrics.acks_out.inc()
 
     def start_listening(self, callback_function):
         """
@@ -228,31 +307,36 @@ class NetworkManager:
         # Construct packet
         packet = self.construct_message(message_type, data)
         
-        # Send immediately
-        if self.peer_address:
-            self.sock.sendto(packet, self.peer_address)
-            print(f"Sent reliable {message_type} to {self.peer_address}")
-        else:
+        if not self.peer_address:
             print("Error: No peer address set!")
             return
-            
-        # Also send to spectators (Best Effort)
-        for spec_addr in self.spectators:
-            try:
-                self.sock.sendto(packet, spec_addr)
-            except:
-                pass
 
-        # Store for retransmission
-        # We need to extract the sequence number we just generated
+        # Store for retransmission BEFORE sending: on a fast link (loopback)
+        # the ACK can arrive on the listener thread before sendto() returns,
+        # and an ACK for an unknown seq would leave the packet to be resent.
         # construct_message increments self.sequence_number, so current value is the one used.
         seq_num = str(self.sequence_number)
         
         self.pending_acks[seq_num] = {
             "packet": packet,
-            "timestamp": time.time(),
+            "timestamp": self.clock.monotonic(),
             "retries": 0
         }
+        if len(self.pending_acks) > constants.MAX_PENDING_ACKS:
+            self.give_up_oldest()
+
+        # Send immediately
+        self.send_packet(packet, self.peer_address)
+        print(f"Sent reliable {message_type} to {self.peer_address}")
+        if self.tracer:
+            self.tracer.sent(message_type)
+            
+        # Also send to spectators (Best Effort)
+        for spec_addr in self.spectators:
+            try:
+                self.send_packet(packet, spec_addr)
+            except:
+                pass
 
     def handle_ack(self, message):
         """
@@ -260,15 +344,40 @@ class NetworkManager:
         Removes the corresponding message from pending_acks.
         """
         ack_num = message.get(constants.KEY_ACK_NUM)
-        if ack_num in self.pending_acks:
-            # print(f"ACK received for {ack_num}")
-            del self.pending_acks[ack_num]
+        # pop(): check_resend may drop the same entry on the main thread
+        info = self.pending_acks.pop(ack_num, None)
+        if self.metrics:
+            self.metrics.acks_in.inc()
+            # Karn's rule: a retransmitted message's RTT is ambiguous
+            if info is not None and info["retries"] == 0:
+                self.metrics.ack_rtt.observe(self.clock.monotonic() - info["timestamp"])
+
+    def give_up_oldest(self):
+        """
+        Gives up on the oldest unacknowledged messages past MAX_PENDING_ACKS,
+        like check_resend does after MAX_RETRIES. An entry normally lives a few
+        timeouts, so this only happens when the peer has stopped answering.
+        """
+        # list() copies in one step; the listener thread may pop ACKed entries meanwhile
+        for seq_num in list(self.pending_acks)[:len(self.pending_acks) - constants.MAX_PENDING_ACKS]:
+            if self.pending_acks.pop(seq_num, None) is not None:
+                print(f"Pending ACK limit reached for packet {seq_num}. Giving up.")
+                self.connection_lost("Pending ACK limit reached")
+
+    def connection_lost(self, reason):
+        """Counts a give-up and tells the game the peer is gone."""
+        if self.metrics:
+            self.metrics.give_ups.inc()
+        self.incoming_messages.put({
+            constants.KEY_MSG_TYPE: constants.MSG_CONNECTION_LOST,
+            "reason": reason
+        })
 
     def check_resend(self):
         """
         Called periodically to resend lost packets.
         """
-        current_time = time.time()
+        current_time = self.clock.monotonic()
         to_remove = []
 
         # Create a list of items to iterate over to avoid "dictionary changed size" error
@@ -277,17 +386,17 @@ class NetworkManager:
                 if info["retries"] < constants.MAX_RETRIES:
                     # Resend
                     print(f"Resending packet {seq_num}...")
-                    self.sock.sendto(info["packet"], self.peer_address)
+                    self.send_packet(info["packet"], self.peer_address)
                     info["timestamp"] = current_time
                     info["retries"] += 1
+                    if self.tracer:
+                        self.tracer.retransmit()
+                    if self.metrics:
+                        self.metrics.retransmits.inc()
                 else:
                     print(f"Max retries reached for packet {seq_num}. Giving up.")
                     to_remove.append(seq_num)
-                    # Notify connection lost
-                    self.incoming_messages.put({
-                        constants.KEY_MSG_TYPE: "CONNECTION_LOST",
-                        "reason": "Max retries reached"
-                    })
+                    self.connection_lost("Max retries reached")
         
         for seq_num in to_remove:
             if seq_num in self.pending_acks:
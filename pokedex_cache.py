@@ -0,0 +1,375 @@
+import os
+import mmap
+import struct
+import zlib
+import hashlib
+from collections.abc import Mapping, Sequence
+
+from species import Species
+
+# Compiled Pokedex file, written next to the CSV on first load and shared
+# read-only (mmap) by every process that loads the same CSV:
+#   header:  [magic 8s][version u16][record count u32][csv size u64][csv mtime_ns u64][csv hash 16s][slot count u32]
+#   records: [name 32s][type1 12s][type2 12s][hp, attack, defense, sp_atk, sp_def, speed u16 x6]
+#            [generation u8][is_legendary u8][base_total u16][against_* f32 x18]
+#   hash index:   slot count x u32, record number + 1 (0 = empty), keyed by crc32 of the casefolded name,
+#                 linear probing
+#   sorted index: record count x u32, record numbers ordered by casefolded name
+# Strings are UTF-8, NUL padded; an empty type2 means none. against_* follow AGAINST_COLUMNS.
+#
+# The move table gets the same treatment in a smaller file (slot count 0, no indexes):
+#   records: [name 24s][type 12s][category u8, 0 = Physical / 1 = Special][power u16][universal u8]
+POKEDEX_CACHE_MAGIC = b"PKDEX\x00\x00\x01"
+POKEDEX_CACHE_VERSION = 3
+POKEDEX_CACHE_SUFFIX = ".pkdex"
+MOVES_CACHE_MAGIC = b"PKMOV\x00\x00\x01"
+MOVES_CACHE_SUFFIX = ".pkmv"
+MOVE_CATEGORIES = ("Physical", "Special")
+AGAINST_COUNT = 18
+
+_HEADER = struct.Struct("<8sHIQQ16sI")
+_RECORD = struct.Struct("<32s12s12s6HBBH%df" % AGAINST_COUNT)
+_STATS = struct.Struct("<32s12s12s6H") # Record up to the stats
+_NAME = struct.Struct("<32s")
+_TYPES = struct.Struct("<12s12s")
+_PROFILE = struct.Struct("<BBH")
+_PROFILE_OFFSET = _STATS.size
+_AGAINST = struct.Struct("<%df" % AGAINST_COUNT)
+_AGAINST_OFFSET = _PROFILE_OFFSET + _PROFILE.size
+_MOVE = struct.Struct("<24s12sBHB")
+_SLOT = struct.Struct("<I")
+_FLOAT = struct.Struct("<f")
+
+
+def cache_path_for(csv_path, suffix=POKEDEX_CACHE_SUFFIX):
+    return csv_path + suffix
+
+
+def csv_fingerprint(csv_path):
+    """(size, mtime_ns) of the CSV, the cheap validity check."""
+    st = os.stat(csv_path)
+    return st.st_size, st.st_mtime_ns
+
+
+def csv_hash(csv_path):
+    with open(csv_path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+
+def is_current(csv_path, size, mtime_ns, cached_size, cached_mtime_ns, cached_hash):
+    """True if a cache built from (cached_size, cached_mtime_ns, cached_hash) still matches the CSV."""
+    if (cached_size, cached_mtime_ns) == (size, mtime_ns):
+        return True
+    return cached_size == size and csv_hash(csv_path) == cached_hash
+
+
+def write_atomically(path, chunks):
+    """Write then rename: processes that already opened/mapped the old file keep it, new ones get this one."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+def name_hash(folded_name):
+    return zlib.crc32(folded_name.encode('utf-8'))
+
+
+def _decode(field):
+    return field.rstrip(b"\x00").decode('utf-8')
+
+
+class MappedPokedex(Mapping):
+    """
+    Read-only pokedex backed by an mmap of the compiled file.
+
+    Behaves like the {name: Species} pokedex, but nothing is parsed up front:
+    lookups go through the on-file hash index and each record is unpacked when
+    it is accessed, so every process loading the file shares one physical copy.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (self.magic, self.version, self.count, self.csv_size, self.csv_mtime_ns,
+         self.csv_hash, self.slot_count) = _HEADER.unpack_from(self.buffer)
+        self.records_offset = _HEADER.size
+        self.slots_offset = self.records_offset + self.count * _RECORD.size
+        self.sorted_offset = self.slots_offset + self.slot_count * _SLOT.size
+        self.positions = {} # name -> record number, memo of exact lookups
+        self.species_loaded = {} # name -> Species, so each record is unpacked once per process
+
+        # Views used by PokemonManager in place of its per-process dict/list
+        self.name_index = FoldedNameIndex(self)
+        self.sorted_names = SortedNames(self)
+
+    def is_valid(self):
+        expected = self.sorted_offset + self.count * _SLOT.size
+        return (self.magic == POKEDEX_CACHE_MAGIC and self.version == POKEDEX_CACHE_VERSION
+                and len(self.buffer) == expected and self.slot_count & (self.slot_count - 1) == 0)
+
+    def close(self):
+        self.buffer.close()
+
+    # --- Record access ---
+    def record_offset(self, position):
+        return self.records_offset + position * _RECORD.size
+
+    def name_at(self, position):
+        return _decode(_NAME.unpack_from(self.buffer, self.record_offset(position))[0])
+
+    def types_at(self, position):
+        """(type1, type2 or None) strings."""
+        type1, type2 = _TYPES.unpack_from(self.buffer, self.record_offset(position) + 32)
+        return _decode(type1), _decode(type2) or None
+
+    def against_at(self, position):
+        return _AGAINST.unpack_from(self.buffer, self.record_offset(position) + _AGAINST_OFFSET)
+
+    def profile_at(self, position):
+        """(generation, is_legendary, base_total)"""
+        generation, legendary, base_total = _PROFILE.unpack_from(self.buffer, self.record_offset(position) + _PROFILE_OFFSET)
+        return generation, bool(legendary), base_total
+
+    def record_at(self, position):
+        """
+        (name, type1, type2 or None, hp, attack, defense, sp_atk, sp_def, speed,
+         generation, is_legendary, base_total, against tuple)
+        """
+        fields = _RECORD.unpack_from(self.buffer, self.record_offset(position))
+        return ((_decode(fields[0]), _decode(fields[1]), _decode(fields[2]) or None) + fields[3:9]
+                + (fields[9], bool(fields[10]), fields[11], fields[12:]))
+
+    def records(self):
+        for position in range(self.count):
+            yield self.record_at(position)
+
+    def sorted_position(self, rank):
+        return _SLOT.unpack_from(self.buffer, self.sorted_offset + rank * _SLOT.size)[0]
+
+    # --- Hash index ---
+    def find(self, name, casefolded=False):
+        """Record number for name (exact, or any case if casefolded=True), or None."""
+        folded = name.casefold()
+        mask = self.slot_count - 1
+        slot = name_hash(folded) & mask
+        while True:
+            entry = _SLOT.unpack_from(self.buffer, self.slots_offset + slot * _SLOT.size)[0]
+            if entry == 0:
+                return None
+            stored = self.name_at(entry - 1)
+            if stored == name or (casefolded and stored.casefold() == folded):
+                return entry - 1
+            slot = (slot + 1) & mask
+
+    def position(self, name):
+        position = self.positions.get(name)
+        if position is None:
+            position = self.find(name) if isinstance(name, str) else None
+            if position is None:
+                raise KeyError(name)
+            self.positions[name] = position
+        return position
+
+    # --- Mapping interface ---
+    def __getitem__(self, name):
+        species = self.species_loaded.get(name)
+        if species is None:
+            name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed = _STATS.unpack_from(
+                self.buffer, self.record_offset(self.position(name)))
+            species = Species(_decode(name), _decode(type1), _decode(type2) or None,
+                              hp, attack, defense, sp_atk, sp_def, speed)
+            self.species_loaded[species.name] = species
+        return species
+
+    def __contains__(self, name):
+        try:
+            self.position(name)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self.name_at(position)
+
+    def __len__(self):
+        return self.count
+
+
+class RecordView(Mapping):
+    """name -> getter(record number), e.g. the type or against_* fields of a species."""
+    def __init__(self, pokedex, getter):
+        self.pokedex = pokedex
+        self.getter = getter
+
+    def __getitem__(self, name):
+        return self.getter(self.pokedex.position(name))
+
+    def items(self):
+        # Walk the records in order instead of looking every name up again
+        for position in range(self.pokedex.count):
+            yield self.pokedex.name_at(position), self.getter(position)
+
+    def values(self):
+        for position in range(self.pokedex.count):
+            yield self.getter(position)
+
+    def __iter__(self):
+        return iter(self.pokedex)
+
+    def __len__(self):
+        return len(self.pokedex)
+
+
+class FoldedNameIndex(Mapping):
+    """casefolded name -> pokedex key, answered by the on-file hash index."""
+    def __init__(self, pokedex):
+        self.pokedex = pokedex
+        self.keys_found = {} # memo of successful lookups
+
+    def __getitem__(self, folded):
+        key = self.keys_found.get(folded)
+        if key is None:
+            position = self.pokedex.find(folded, casefolded=True) if isinstance(folded, str) else None
+            if position is None:
+                raise KeyError(folded)
+            key = self.keys_found[folded] = self.pokedex.name_at(position)
+        return key
+
+    def __iter__(self):
+        for name in self.pokedex:
+            yield name.casefold()
+
+    def __len__(self):
+        return len(self.pokedex)
+
+
+class SortedNames(Sequence):
+    """Casefolded names in sorted order (for bisect), read from the sorted index."""
+    def __init__(self, pokedex):
+        self.pokedex = pokedex
+
+    def __getitem__(self, rank):
+        if isinstance(rank, slice):
+            return [self[i] for i in range(*rank.indices(len(self)))]
+        if rank < 0:
+            rank += len(self)
+        if not 0 <= rank < len(self):
+            raise IndexError(rank)
+        return self.pokedex.name_at(self.pokedex.sorted_position(rank)).casefold()
+
+    def __len__(self):
+        return self.pokedex.count
+
+
+def open_pokedex_cache(csv_path):
+    """
+    MappedPokedex for csv_path, or None if the compiled file is missing, from
+    another version or stale. A cache whose CSV only changed mtime (same bytes)
+    is still used.
+    """
+    try:
+        size, mtime_ns = csv_fingerprint(csv_path)
+        pokedex = MappedPokedex(cache_path_for(csv_path))
+    except (OSError, ValueError, struct.error):
+        return None
+
+    if not pokedex.is_valid() or not is_current(csv_path, size, mtime_ns,
+                                                 pokedex.csv_size, pokedex.csv_mtime_ns, pokedex.csv_hash):
+        pokedex.close()
+        return None
+    return pokedex
+
+
+def write_pokedex_cache(csv_path, records):
+    """
+    Compiles records (see MappedPokedex.record_at) and their name indexes into
+    the cache file. Returns False without writing if a record does not fit the
+    fixed-width layout.
+    """
+    packed = []
+    folded_names = []
+    for name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed, generation, legendary, base_total, against in records:
+        strings = [name.encode('utf-8'), type1.encode('utf-8'), (type2 or "").encode('utf-8')]
+        if len(strings[0]) > 32 or len(strings[1]) > 12 or len(strings[2]) > 12 or len(against) != AGAINST_COUNT:
+            return False
+        if not all(0 <= stat <= 0xFFFF for stat in (hp, attack, defense, sp_atk, sp_def, speed, base_total)):
+            return False
+        if not 0 <= generation <= 0xFF:
+            return False
+        if any(_FLOAT.unpack(_FLOAT.pack(value))[0] != value for value in against):
+            return False # Multiplier not exact in float32
+        packed.append(_RECORD.pack(*strings, hp, attack, defense, sp_atk, sp_def, speed,
+                                   generation, int(bool(legendary)), base_total, *against))
+        folded_names.append(name.casefold())
+
+    # Hash index: at most half full, so probe chains stay short
+    slot_count = 1
+    while slot_count < 2 * len(packed):
+        slot_count *= 2
+    slots = [0] * slot_count
+    for position, folded in enumerate(folded_names):
+        slot = name_hash(folded) & (slot_count - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = position + 1
+    sorted_positions = sorted(range(len(folded_names)), key=folded_names.__getitem__)
+
+    try:
+        size, mtime_ns = csv_fingerprint(csv_path)
+        header = _HEADER.pack(POKEDEX_CACHE_MAGIC, POKEDEX_CACHE_VERSION, len(packed), size, mtime_ns,
+                              csv_hash(csv_path), slot_count)
+        write_atomically(cache_path_for(csv_path), [
+            header,
+            b"".join(packed),
+            struct.pack("<%dI" % slot_count, *slots),
+            struct.pack("<%dI" % len(sorted_positions), *sorted_positions)
+        ])
+    except OSError as e:
+        print(f"Could not write Pokedex cache: {e}")
+        return False
+    return True
+
+
+def load_moves_cache(csv_path):
+    """
+    Move records (name, type, category, power, universal) from the compiled
+    move file, or None if it is missing or stale.
+    """
+    try:
+        size, mtime_ns = csv_fingerprint(csv_path)
+        with open(cache_path_for(csv_path, MOVES_CACHE_SUFFIX), 'rb') as f:
+            data = f.read()
+        magic, version, count, cached_size, cached_mtime_ns, cached_hash, _ = _HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    if magic != MOVES_CACHE_MAGIC or version != POKEDEX_CACHE_VERSION or len(data) != _HEADER.size + count * _MOVE.size:
+        return None
+    if not is_current(csv_path, size, mtime_ns, cached_size, cached_mtime_ns, cached_hash):
+        return None
+
+    records = []
+    for name, move_type, category, power, universal in _MOVE.iter_unpack(memoryview(data)[_HEADER.size:]):
+        records.append((_decode(name), _decode(move_type), MOVE_CATEGORIES[category], power, bool(universal)))
+    return records
+
+
+def write_moves_cache(csv_path, records):
+    """Compiles move records; returns False without writing if one does not fit."""
+    packed = []
+    for name, move_type, category, power, universal in records:
+        name_bytes, type_bytes = name.encode('utf-8'), move_type.encode('utf-8')
+        if len(name_bytes) > 24 or len(type_bytes) > 12 or category not in MOVE_CATEGORIES or not 0 <= power <= 0xFFFF:
+            return False
+        packed.append(_MOVE.pack(name_bytes, type_bytes, MOVE_CATEGORIES.index(category), power, int(bool(universal))))
+
+    try:
+        size, mtime_ns = csv_fingerprint(csv_path)
+        header = _HEADER.pack(MOVES_CACHE_MAGIC, POKEDEX_CACHE_VERSION, len(packed), size, mtime_ns,
+                              csv_hash(csv_path), 0)
+        write_atomically(cache_path_for(csv_path, MOVES_CACHE_SUFFIX), [header, b"".join(packed)])
+    except OSError as e:
+        print(f"Could not write move cache: {e}")
+        return False
+    return True
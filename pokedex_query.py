@@ -0,0 +1,124 @@
+import bisect
+
+# Numeric columns that can be range-filtered and sorted on
+QUERY_COLUMNS = ("hp", "attack", "defense", "sp_atk", "sp_def", "speed", "base_total", "generation")
+# Sort orders besides the columns: pokedex number (CSV order) and name
+QUERY_SORTS = ("number", "name") + QUERY_COLUMNS
+
+
+class ColumnIndex:
+    """
+    One column, sorted. Species are numbered by pokedex position and sets of
+    them are Python ints used as bitmaps (bit p = position p), so a value range
+    is two bisects plus an XOR of the precomputed prefix bitmaps.
+    """
+    def __init__(self, values):
+        self.order = sorted(range(len(values)), key=lambda position: (values[position], position))
+        self.sorted_values = [values[position] for position in self.order]
+        # prefix[i] = bitmap of the first i positions in sorted order
+        self.prefix = [0]
+        bits = 0
+        for position in self.order:
+            bits |= 1 << position
+            self.prefix.append(bits)
+
+    def range_bits(self, low=None, high=None):
+        """Bitmap of the species with low <= value <= high (either bound may be None)."""
+        start = 0 if low is None else bisect.bisect_left(self.sorted_values, low)
+        end = len(self.sorted_values) if high is None else bisect.bisect_right(self.sorted_values, high)
+        if start >= end:
+            return 0
+        return self.prefix[end] ^ self.prefix[start]
+
+    def prefix_bits(self, prefix):
+        """Bitmap of the (string) values starting with prefix."""
+        start = bisect.bisect_left(self.sorted_values, prefix)
+        end = bisect.bisect_left(self.sorted_values, prefix + "\U0010ffff")
+        return self.prefix[end] ^ self.prefix[start]
+
+
+class PokedexQueryIndex:
+    """
+    Filter/sort index over the whole pokedex, built once from
+    (name, type ids, stats dict) rows in pokedex order.
+
+    Categorical filters (type, generation, legendary) are precomputed bitmaps;
+    numeric ranges and name prefixes come from the sorted ColumnIndex of that
+    column. A query ANDs the bitmaps together, counts the bits for the total
+    and walks the requested sort order only as far as the page it returns.
+    """
+    def __init__(self, rows):
+        self.names = []
+        self.type_bits = {}       # type id -> species having that type
+        self.generation_bits = {} # generation -> species
+        self.legendary_bits = 0
+        columns = {column: [] for column in QUERY_COLUMNS}
+
+        for position, (name, types, stats) in enumerate(rows):
+            bit = 1 << position
+            self.names.append(name)
+            for type_id in set(types):
+                if type_id is not None:
+                    self.type_bits[type_id] = self.type_bits.get(type_id, 0) | bit
+            self.generation_bits[stats["generation"]] = self.generation_bits.get(stats["generation"], 0) | bit
+            if stats["is_legendary"]:
+                self.legendary_bits |= bit
+            for column in QUERY_COLUMNS:
+                columns[column].append(stats[column])
+
+        self.all_bits = (1 << len(self.names)) - 1
+        self.columns = {column: ColumnIndex(values) for column, values in columns.items()}
+        self.columns["name"] = ColumnIndex([name.casefold() for name in self.names])
+
+    def __len__(self):
+        return len(self.names)
+
+    def select(self, type_ids=(), generations=(), legendary=None, ranges=None, name_prefix=None):
+        """
+        Bitmap of the species matching every filter: all of type_ids, any of
+        generations, legendary True/False/None (either), ranges as
+        {column: (low, high)} and a case-insensitive name prefix.
+        """
+        bits = self.all_bits
+        for type_id in type_ids:
+            bits &= self.type_bits.get(type_id, 0)
+        if generations:
+            allowed = 0
+            for generation in generations:
+                allowed |= self.generation_bits.get(generation, 0)
+            bits &= allowed
+        if legendary is not None:
+            bits &= self.legendary_bits if legendary else ~self.legendary_bits
+        for column, (low, high) in (ranges or {}).items():
+            if column not in QUERY_COLUMNS:
+                raise ValueError(f"Unknown column: {column}")
+            bits &= self.columns[column].range_bits(low, high)
+        if name_prefix:
+            bits &= self.columns["name"].prefix_bits(name_prefix.strip().casefold())
+        return bits
+
+    def page(self, bits, sort="number", descending=False, offset=0, limit=None):
+        """Names of the species in bits, in sort order, skipping offset and stopping after limit."""
+        if sort == "number":
+            order = range(len(self.names))
+        elif sort in self.columns:
+            order = self.columns[sort].order
+        else:
+            raise ValueError(f"Unknown sort order: {sort}")
+        if descending:
+            order = reversed(order)
+
+        names = []
+        if limit is not None and limit <= 0:
+            return names
+        skipped = 0
+        for position in order:
+            if not bits >> position & 1:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            names.append(self.names[position])
+            if limit is not None and len(names) >= limit:
+                break
+        return names
@@ -2,175 +2,222 @@ import csv
 import random
 import math
 import os
+import hashlib
+import bisect
+import difflib
+import functools
+
+from pokedex_cache import open_pokedex_cache, write_pokedex_cache, load_moves_cache, write_moves_cache, RecordView
+from species import Species
+from pokedex_query import PokedexQueryIndex
+
+# Type ids follow the order of the CSV's against_* columns
+TYPE_NAMES = ["bug", "dark", "dragon", "electric", "fairy", "fighting", "fire", "flying", "ghost",
+              "grass", "ground", "ice", "normal", "poison", "psychic", "rock", "steel", "water"]
+TYPE_IDS = {name: i for i, name in enumerate(TYPE_NAMES)}
+AGAINST_COLUMNS = ["against_" + ("fight" if name == "fighting" else name) for name in TYPE_NAMES]
+
+# Move power bands (lower bound, name), for browsing/filtering the move table
+POWER_BANDS = [(0, "weak"), (60, "medium"), (90, "strong"), (120, "very strong")]
+
+# Entries kept by PokemonManager.pre_roll_damage (one per attacker/defender/move/boost tuple)
+PRE_ROLL_CACHE_SIZE = 4096
+
+# Strongest Normal move every species can use; stronger ones (Giga Impact,
+# Hyper Beam...) stay with Normal-type species
+SHARED_NORMAL_MAX_POWER = 90
+
+def type_id(type_name):
+    """Interns a type name ("Fire", "fire") to its small integer id. None if unknown/empty."""
+    if not type_name:
+        return None
+    return TYPE_IDS.get(type_name.strip().casefold())
+
+def power_band(power):
+    """Name of the POWER_BANDS entry a move's power falls in."""
+    band = POWER_BANDS[0][1]
+    for lower, name in POWER_BANDS:
+        if power >= lower:
+            band = name
+    return band
+
+def species_type_ids(type1, type2):
+    """(type1 id, type2 id or None). Some rows repeat type1 as type2; only count a real second type."""
+    t1 = type_id(type1)
+    t2 = type_id(type2)
+    return (t1, t2 if t2 != t1 else None)
+
+def damage_roll(seed, turn, attacker):
+    """
+    Random factor (0.85 to 1.0) for one attack, derived from (seed, turn, attacker).
+
+    Counter-based: nothing is drawn from a shared generator, so the same inputs
+    always give the same roll. Both peers, verification, replays and concurrent
+    battles can compute any turn's roll without keeping or locking RNG state.
+    """
+    key = f"{seed}:{turn}:{attacker}".encode('utf-8')
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    fraction = int.from_bytes(digest, 'big') / 2**64
+    return 0.85 + 0.15 * fraction
 
 class PokemonManager:
-    def __init__(self, pokemon_csv='pokemon.csv'):
+    def __init__(self, pokemon_csv='pokemon.csv', moves_csv='moves.csv'):
+        self.csv_path = pokemon_csv
         self.pokedex = {}
         self.moves = {} 
+
+        # Move indexes, rebuilt by build_move_indexes() whenever the moves load
+        self.moves_by_type = {}       # type id -> move names, strongest first
+        self.moves_by_category = {}   # "Physical"/"Special" -> move names, strongest first
+        self.moves_by_power_band = {} # POWER_BANDS name -> move names, strongest first
+        self.move_name_index = {}     # casefolded move name -> move table key
+        self.universal_moves = frozenset() # Learnable by every species
+        self.learnsets = {}           # (type1 id, type2 id) -> frozenset of move names, built on demand
+
+        # Name indexes, rebuilt by build_name_index() whenever the pokedex loads
+        self.name_index = {}   # casefolded name -> pokedex key
+        self.sorted_names = [] # casefolded names, sorted (prefix search with bisect)
+
+        # Type data from the CSV's against_* columns
+        self.species_types = {}   # pokedex key -> (type1 id, type2 id or None)
+        self.defense_vectors = {} # pokedex key -> 18 multipliers, indexed by attacking type id
+        self.type_matrix = [[1.0] * len(TYPE_NAMES) for _ in TYPE_NAMES] # [attacking id][defending id]
+
+        # Columns the battle doesn't use, for query()
+        self.profiles = {}       # pokedex key -> (generation, is_legendary, base_total)
+        self.query_index = None  # PokedexQueryIndex, built on the first query()
+
+        # Deterministic part of calculate_damage, memoized per instance.
+        # cache_info() gives hits/misses; cleared whenever the pokedex or moves reload.
+        self.pre_roll_damage = functools.lru_cache(maxsize=PRE_ROLL_CACHE_SIZE)(self.compute_pre_roll_damage)
         
         # Load Pokemon Stats
         self.load_pokemon_data(pokemon_csv)
         
-        # Initialize moves
-        self.initialize_default_moves()
-        
-        # Simple Type Effectiveness Chart (Attacker -> Defender)
-        self.type_chart = {
-            "Fire": {"Grass": 2.0, "Water": 0.5, "Fire": 0.5, "Ice": 2.0, "Bug": 2.0, "Steel": 2.0},
-            "Water": {"Fire": 2.0, "Grass": 0.5, "Water": 0.5, "Ground": 2.0, "Rock": 2.0},
-            "Grass": {"Water": 2.0, "Fire": 0.5, "Grass": 0.5, "Ground": 2.0, "Rock": 2.0, "Flying": 0.5, "Bug": 0.5},
-            "Electric": {"Water": 2.0, "Grass": 0.5, "Ground": 0.0, "Flying": 2.0},
-            "Normal": {"Rock": 0.5, "Ghost": 0.0, "Steel": 0.5},
-            "Ice": {"Grass": 2.0, "Ground": 2.0, "Flying": 2.0, "Dragon": 2.0, "Fire": 0.5, "Water": 0.5, "Ice": 0.5},
-            "Fighting": {"Normal": 2.0, "Ice": 2.0, "Rock": 2.0, "Dark": 2.0, "Steel": 2.0, "Poison": 0.5, "Flying": 0.5, "Psychic": 0.5, "Bug": 0.5},
-            "Poison": {"Grass": 2.0, "Poison": 0.5, "Ground": 0.5, "Rock": 0.5, "Ghost": 0.5, "Steel": 0.0},
-            "Ground": {"Fire": 2.0, "Electric": 2.0, "Poison": 2.0, "Rock": 2.0, "Steel": 2.0, "Grass": 0.5, "Bug": 0.5, "Flying": 0.0},
-            "Flying": {"Grass": 2.0, "Fighting": 2.0, "Bug": 2.0, "Electric": 0.5, "Rock": 0.5, "Steel": 0.5},
-            "Psychic": {"Fighting": 2.0, "Poison": 2.0, "Psychic": 0.5, "Steel": 0.5, "Dark": 0.0},
-            "Bug": {"Grass": 2.0, "Psychic": 2.0, "Dark": 2.0, "Fire": 0.5, "Fighting": 0.5, "Poison": 0.5, "Flying": 0.5, "Ghost": 0.5, "Steel": 0.5, "Fairy": 0.5},
-            "Rock": {"Fire": 2.0, "Ice": 2.0, "Flying": 2.0, "Bug": 2.0, "Fighting": 0.5, "Ground": 0.5, "Steel": 0.5},
-            "Ghost": {"Psychic": 2.0, "Ghost": 2.0, "Dark": 0.5, "Normal": 0.0},
-            "Dragon": {"Dragon": 2.0, "Steel": 0.5, "Fairy": 0.0},
-            "Steel": {"Ice": 2.0, "Rock": 2.0, "Fairy": 2.0, "Fire": 0.5, "Water": 0.5, "Electric": 0.5, "Steel": 0.5},
-            "Dark": {"Psychic": 2.0, "Ghost": 2.0, "Fighting": 0.5, "Dark": 0.5, "Fairy": 0.5},
-            "Fairy": {"Fighting": 2.0, "Dragon": 2.0, "Dark": 2.0, "Fire": 0.5, "Poison": 0.5, "Steel": 0.5}
-        }
+        # Load Moves
+        self.load_move_data(moves_csv)
 
     def load_pokemon_data(self, csv_path):
-        """Loads Pokemon stats from the provided CSV file."""
+        """
+        Loads Pokemon stats from the provided CSV file.
+        Normally the pokedex is the compiled file next to the CSV, memory-mapped
+        and shared with other processes (see pokedex_cache.py); it is rebuilt when
+        the CSV changes. Falls back to in-memory dicts if it cannot be written.
+        """
         try:
-            with open(csv_path, mode='r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # [cite_start]Mapping the actual columns from your file [cite: 34]
-                    name = row['name'].strip()
-                    
-                    # Handle Type 2 being empty
-                    type2 = row.get('type2', '').strip()
-                    if not type2:
-                        type2 = None
-
-                    self.pokedex[name] = {
-                        "name": name,
-                        "type1": row['type1'].strip(),
-                        "type2": type2,
-                        "hp": int(row['hp']),
-                        "attack": int(row['attack']),
-                        "defense": int(row['defense']),
-                        # Note: CSV uses 'sp_attack' not 'Sp. Atk'
-                        "sp_atk": int(row['sp_attack']),
-                        "sp_def": int(row['sp_defense']),
-                        "speed": int(row['speed'])
-                    }
+            pokedex = open_pokedex_cache(csv_path)
+            if pokedex is None:
+                records = self.read_pokemon_csv(csv_path)
+                if write_pokedex_cache(csv_path, records):
+                    pokedex = open_pokedex_cache(csv_path)
+
+            if pokedex is not None:
+                self.use_mapped_pokedex(pokedex)
+            else:
+                self.pokedex, self.species_types, self.defense_vectors, self.profiles = {}, {}, {}, {}
+                for record in records:
+                    self.add_species(*record)
+                self.build_name_index()
+            self.build_type_matrix()
+            self.query_index = None
+            self.pre_roll_damage.cache_clear()
             print(f"PokemonManager: Loaded {len(self.pokedex)} Pokemon.")
         except FileNotFoundError:
             print(f"ERROR: Could not find {csv_path}!")
         except Exception as e:
             print(f"ERROR loading Pokemon CSV: {e}")
 
-    def initialize_default_moves(self):
-        """Hardcoded moves."""
-        self.moves = {
-            "Thunderbolt": {"type": "Electric", "power": 90, "category": "Special"},
-            "Flamethrower": {"type": "Fire", "power": 90, "category": "Special"},
-            "Surf": {"type": "Water", "power": 90, "category": "Special"},
-            "Earthquake": {"type": "Ground", "power": 100, "category": "Physical"},
-            "Slash": {"type": "Normal", "power": 70, "category": "Physical"},
-            "Tackle": {"type": "Normal", "power": 40, "category": "Physical"},
-            "Ice Beam": {"type": "Ice", "power": 90, "category": "Special"},
-            "Psychic": {"type": "Psychic", "power": 90, "category": "Special"}
-        }
+    def read_pokemon_csv(self, csv_path):
+        """Parses the CSV into species records (the columns the game uses)."""
+        records = []
+        with open(csv_path, mode='r', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                # [cite_start]Mapping the actual columns from your file [cite: 34]
+                name = row['name'].strip()
+                
+                # Handle Type 2 being empty
+                type2 = row.get('type2', '').strip()
+                if not type2:
+                    type2 = None
 
-    def get_pokemon(self, name):
-        """Returns the stats dictionary for a specific Pokemon."""
-        # Case insensitive lookup
-        for key in self.pokedex:
-            if key.lower() == name.lower():
-                return self.pokedex[key]
-        return None
+                records.append((
+                    name,
+                    row['type1'].strip(),
+                    type2,
+                    int(row['hp']),
+                    int(row['attack']),
+                    int(row['defense']),
+                    # Note: CSV uses 'sp_attack' not 'Sp. Atk'
+                    int(row['sp_attack']),
+                    int(row['sp_defense']),
+                    int(row['speed']),
+                    int(row['generation']),
+                    row['is_legendary'].strip() == '1',
+                    int(row['base_total']),
+                    tuple(float(row[col]) for col in AGAINST_COLUMNS)
+                ))
+        return records
 
-    def get_move(self, move_name):
-        return self.moves.get(move_name)
+    def use_mapped_pokedex(self, pokedex):
+        """Serves the pokedex, name indexes and type data straight from a MappedPokedex."""
+        self.pokedex = pokedex
+        self.name_index = pokedex.name_index
+        self.sorted_names = pokedex.sorted_names
+        self.species_types = RecordView(pokedex, lambda position: species_type_ids(*pokedex.types_at(position)))
+        self.defense_vectors = RecordView(pokedex, pokedex.against_at)
+        self.profiles = RecordView(pokedex, pokedex.profile_at)
 
-    def get_type_effectiveness(self, move_type, defender_type1, defender_type2=None):
-        """Calculates type multiplier."""
-        multiplier = 1.0
-        
-        # Check against Type 1
-        if move_type in self.type_chart:
-            if defender_type1 in self.type_chart[move_type]:
-                multiplier *= self.type_chart[move_type][defender_type1]
-        
-        # Check against Type 2 (if it exists)
-import csv
-import random
-import math
-import os
+    def add_species(self, name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed,
+                    generation, is_legendary, base_total, against):
+        self.species_types[name] = species_type_ids(type1, type2)
+        self.defense_vectors[name] = tuple(against)
+        self.profiles[name] = (generation, is_legendary, base_total)
 
-class PokemonManager:
-    def __init__(self, pokemon_csv='pokemon.csv'):
-        self.pokedex = {}
-        self.moves = {} 
-        
-        # Load Pokemon Stats
-        self.load_pokemon_data(pokemon_csv)
-        
-        # Initialize moves
-        self.initialize_default_moves()
-        
-        # Simple Type Effectiveness Chart (Attacker -> Defender)
-        self.type_chart = {
-            "Fire": {"Grass": 2.0, "Water": 0.5, "Fire": 0.5, "Ice": 2.0, "Bug": 2.0, "Steel": 2.0},
-            "Water": {"Fire": 2.0, "Grass": 0.5, "Water": 0.5, "Ground": 2.0, "Rock": 2.0},
-            "Grass": {"Water": 2.0, "Fire": 0.5, "Grass": 0.5, "Ground": 2.0, "Rock": 2.0, "Flying": 0.5, "Bug": 0.5},
-            "Electric": {"Water": 2.0, "Grass": 0.5, "Ground": 0.0, "Flying": 2.0},
-            "Normal": {"Rock": 0.5, "Ghost": 0.0, "Steel": 0.5},
-            "Ice": {"Grass": 2.0, "Ground": 2.0, "Flying": 2.0, "Dragon": 2.0, "Fire": 0.5, "Water": 0.5, "Ice": 0.5},
-            "Fighting": {"Normal": 2.0, "Ice": 2.0, "Rock": 2.0, "Dark": 2.0, "Steel": 2.0, "Poison": 0.5, "Flying": 0.5, "Psychic": 0.5, "Bug": 0.5},
-            "Poison": {"Grass": 2.0, "Poison": 0.5, "Ground": 0.5, "Rock": 0.5, "Ghost": 0.5, "Steel": 0.0},
-            "Ground": {"Fire": 2.0, "Electric": 2.0, "Poison": 2.0, "Rock": 2.0, "Steel": 2.0, "Grass": 0.5, "Bug": 0.5, "Flying": 0.0},
-            "Flying": {"Grass": 2.0, "Fighting": 2.0, "Bug": 2.0, "Electric": 0.5, "Rock": 0.5, "Steel": 0.5},
-            "Psychic": {"Fighting": 2.0, "Poison": 2.0, "Psychic": 0.5, "Steel": 0.5, "Dark": 0.0},
-            "Bug": {"Grass": 2.0, "Psychic": 2.0, "Dark": 2.0, "Fire": 0.5, "Fighting": 0.5, "Poison": 0.5, "Flying": 0.5, "Ghost": 0.5, "Steel": 0.5, "Fairy": 0.5},
-            "Rock": {"Fire": 2.0, "Ice": 2.0, "Flying": 2.0, "Bug": 2.0, "Fighting": 0.5, "Ground": 0.5, "Steel": 0.5},
-            "Ghost": {"Psychic": 2.0, "Ghost": 2.0, "Dark": 0.5, "Normal": 0.0},
-            "Dragon": {"Dragon": 2.0, "Steel": 0.5, "Fairy": 0.0},
-            "Steel": {"Ice": 2.0, "Rock": 2.0, "Fairy": 2.0, "Fire": 0.5, "Water": 0.5, "Electric": 0.5, "Steel": 0.5},
-            "Dark": {"Psychic": 2.0, "Ghost": 2.0, "Fighting": 0.5, "Dark": 0.5, "Fairy": 0.5},
-            "Fairy": {"Fighting": 2.0, "Dragon": 2.0, "Dark": 2.0, "Fire": 0.5, "Poison": 0.5, "Steel": 0.5}
-        }
+        self.pokedex[name] = Species(name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed)
 
-    def load_pokemon_data(self, csv_path):
-        """Loads Pokemon stats from the provided CSV file."""
+    def load_move_data(self, csv_path):
+        """
+        Loads the move table from a CSV (name,type,category,power,universal),
+        through the compiled cache like the pokedex. Falls back to the
+        built-in moves if the file is missing.
+        """
         try:
-            with open(csv_path, mode='r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # [cite_start]Mapping the actual columns from your file [cite: 34]
-                    name = row['name'].strip()
-                    
-                    # Handle Type 2 being empty
-                    type2 = row.get('type2', '').strip()
-                    if not type2:
-                        type2 = None
-
-                    self.pokedex[name] = {
-                        "name": name,
-                        "type1": row['type1'].strip(),
-                        "type2": type2,
-                        "hp": int(row['hp']),
-                        "attack": int(row['attack']),
-                        "defense": int(row['defense']),
-                        # Note: CSV uses 'sp_attack' not 'Sp. Atk'
-                        "sp_atk": int(row['sp_attack']),
-                        "sp_def": int(row['sp_defense']),
-                        "speed": int(row['speed'])
-                    }
-            print(f"PokemonManager: Loaded {len(self.pokedex)} Pokemon.")
+            records = load_moves_cache(csv_path)
+            if records is None:
+                records = self.read_moves_csv(csv_path)
+                write_moves_cache(csv_path, records)
         except FileNotFoundError:
-            print(f"ERROR: Could not find {csv_path}!")
+            print(f"Could not find {csv_path}, using the default moves.")
+            self.initialize_default_moves()
+            return
         except Exception as e:
-            print(f"ERROR loading Pokemon CSV: {e}")
+            print(f"ERROR loading move CSV: {e}")
+            self.initialize_default_moves()
+            return
+
+        self.moves = {}
+        universal = []
+        for name, move_type, category, power, is_universal in records:
+            self.moves[name] = {"type": move_type, "power": power, "category": category}
+            if is_universal:
+                universal.append(name)
+        self.universal_moves = frozenset(universal)
+        self.moves_loaded()
+        print(f"PokemonManager: Loaded {len(self.moves)} moves.")
+
+    def read_moves_csv(self, csv_path):
+        records = []
+        with open(csv_path, mode='r', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                records.append((
+                    row['name'].strip(),
+                    row['type'].strip(),
+                    row['category'].strip(),
+                    int(row['power']),
+                    row.get('universal', '').strip() == '1'
+                ))
+        return records
 
     def initialize_default_moves(self):
         """Hardcoded moves."""
@@ -184,59 +231,232 @@ class PokemonManager:
             "Ice Beam": {"type": "Ice", "power": 90, "category": "Special"},
             "Psychic": {"type": "Psychic", "power": 90, "category": "Special"}
         }
+        self.universal_moves = frozenset(self.moves)
+        self.moves_loaded()
+
+    def moves_loaded(self):
+        for move in self.moves.values():
+            move["type_id"] = type_id(move["type"])
+        self.build_move_indexes()
+        self.pre_roll_damage.cache_clear()
+
+    def build_move_indexes(self):
+        """Type, category and power band indexes, plus a case-folded name index."""
+        self.moves_by_type = {}
+        self.moves_by_category = {}
+        self.moves_by_power_band = {}
+        self.move_name_index = {}
+        strongest_first = sorted(self.moves, key=lambda name: (-self.moves[name]["power"], name))
+        for name in strongest_first:
+            move = self.moves[name]
+            self.moves_by_type.setdefault(move["type_id"], []).append(name)
+            self.moves_by_category.setdefault(move["category"], []).append(name)
+            self.moves_by_power_band.setdefault(power_band(move["power"]), []).append(name)
+            self.move_name_index[name.casefold()] = name
+        self.learnsets = {}
+
+    def data_hash(self):
+        """
+        Hash of the CSV bytes and the move table. Anything derived from the
+        loaded data (e.g. precomputed damage tables) is keyed by it.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            with open(self.csv_path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            pass
+        for name in sorted(self.moves):
+            move = self.moves[name]
+            digest.update(f"|{name}:{move['type']}:{move['power']}:{move['category']}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def build_name_index(self):
+        """Case-folded name -> key dict, plus a sorted name list for prefix search."""
+        self.name_index = {name.casefold(): name for name in self.pokedex}
+        self.sorted_names = sorted(self.name_index)
+
+    def build_type_matrix(self):
+        """
+        18x18 effectiveness matrix. A single-typed species' against_* vector is
+        exactly that type's defensive column, so every column comes from the dataset.
+        """
+        # Both mappings are filled in pokedex order, so they can be walked together
+        for (t1, t2), vector in zip(self.species_types.values(), self.defense_vectors.values()):
+            if t2 is None and t1 is not None:
+                for attacking in range(len(TYPE_NAMES)):
+                    self.type_matrix[attacking][t1] = vector[attacking]
+
+    def resolve_name(self, name):
+        """Pokedex key for a name in any case/spacing, or None."""
+        if not name:
+            return None
+        return self.name_index.get(name.strip().casefold())
 
     def get_pokemon(self, name):
-        """Returns the stats dictionary for a specific Pokemon."""
+        """Returns the (shared, read-only) Species record for a specific Pokemon."""
         # Case insensitive lookup
-        for key in self.pokedex:
-            if key.lower() == name.lower():
-                return self.pokedex[key]
-        return None
+        key = self.resolve_name(name)
+        if key is None:
+            return None
+        return self.pokedex[key]
+
+    def search_pokemon(self, prefix, limit=10):
+        """Pokemon names starting with prefix (case insensitive), in alphabetical order."""
+        prefix = prefix.strip().casefold()
+        start = bisect.bisect_left(self.sorted_names, prefix)
+        results = []
+        for rank in range(start, len(self.sorted_names)):
+            folded = self.sorted_names[rank]
+            if not folded.startswith(prefix) or len(results) >= limit:
+                break
+            results.append(self.name_index[folded])
+        return results
+
+    def suggest_pokemon(self, name, limit=5):
+        """
+        Autocomplete/typo help: prefix matches first, otherwise the closest
+        spellings (e.g. "Pikachoo" -> "Pikachu").
+        """
+        results = self.search_pokemon(name, limit)
+        if results:
+            return results
+        close = difflib.get_close_matches(name.strip().casefold(), self.sorted_names, n=limit, cutoff=0.6)
+        return [self.name_index[folded] for folded in close]
+
+    def build_query_index(self):
+        rows = []
+        for species, types, (generation, is_legendary, base_total) in zip(
+                self.pokedex.values(), self.species_types.values(), self.profiles.values()):
+            stats = {field: getattr(species, field) for field in ("hp", "attack", "defense", "sp_atk", "sp_def", "speed")}
+            stats.update(generation=generation, is_legendary=is_legendary, base_total=base_total)
+            rows.append((species.name, types, stats))
+        self.query_index = PokedexQueryIndex(rows)
+
+    def query(self, types=(), generations=(), legendary=None, ranges=None, name_prefix=None,
+              sort="number", descending=False, offset=0, limit=None):
+        """
+        Filtered, sorted page of Pokemon names. Returns (total matches, names).
+
+        types: type names the species must all have, e.g. ["Fire", "Flying"]
+        generations: any of these generations
+        legendary: True (only), False (exclude) or None (either)
+        ranges: {column: (low, high)} over QUERY_COLUMNS, bounds inclusive or None
+        sort: "number" (pokedex order), "name" or a column
+        Raises ValueError for an unknown type, column or sort order.
+        """
+        if self.query_index is None:
+            self.build_query_index()
+        type_ids = []
+        for type_name in types:
+            if type_id(type_name) is None:
+                raise ValueError(f"Unknown type: {type_name}")
+            type_ids.append(type_id(type_name))
+
+        bits = self.query_index.select(type_ids, generations, legendary, ranges, name_prefix)
+        return bits.bit_count(), self.query_index.page(bits, sort, descending, offset, limit)
 
     def get_move(self, move_name):
         return self.moves.get(move_name)
 
+    def resolve_move(self, move_name):
+        """Move table key for a name typed in any case, or None."""
+        if not move_name:
+            return None
+        return self.move_name_index.get(move_name.strip().casefold())
+
+    def find_moves(self, move_type=None, category=None, band=None):
+        """Move names matching every given filter (type name, category, power band), strongest first."""
+        selected = None
+        if move_type is not None:
+            selected = self.moves_by_type.get(type_id(move_type), [])
+        for index, key in ((self.moves_by_category, category), (self.moves_by_power_band, band)):
+            if key is None:
+                continue
+            names = index.get(key, [])
+            if selected is None:
+                selected = names
+            else:
+                allowed = set(names)
+                selected = [name for name in selected if name in allowed]
+        if selected is None:
+            selected = sorted(self.moves, key=lambda name: (-self.moves[name]["power"], name))
+        return list(selected)
+
+    def learnset(self, species_name):
+        """
+        Moves a species can use. There is no per-species learnset data, so this
+        is a type-derived approximation: moves of its own types, Normal moves up
+        to SHARED_NORMAL_MAX_POWER, and the universal moves.
+        Species with the same types share one frozenset.
+        """
+        types = self.species_types[species_name]
+        moves = self.learnsets.get(types)
+        if moves is None:
+            names = set(self.universal_moves)
+            for move_type in set(types):
+                if move_type is not None:
+                    names.update(self.moves_by_type.get(move_type, []))
+            names.update(name for name in self.moves_by_type.get(TYPE_IDS["normal"], [])
+                         if self.moves[name]["power"] <= SHARED_NORMAL_MAX_POWER)
+            moves = self.learnsets[types] = frozenset(names)
+        return moves
+
+    def can_learn(self, species_name, move_name):
+        """O(1) move validation."""
+        return move_name in self.learnset(species_name)
+
+    def suggest_moves(self, species_name, move_name, limit=5):
+        """Closest learnable spellings of move_name, else the species' strongest moves."""
+        learnable = self.learnset(species_name)
+        folded = {name.casefold(): name for name in learnable}
+        close = difflib.get_close_matches((move_name or "").strip().casefold(), list(folded), n=limit, cutoff=0.6)
+        if close:
+            return [folded[name] for name in close]
+        return sorted(learnable, key=lambda name: (-self.moves[name]["power"], name))[:limit]
+
     def get_type_effectiveness(self, move_type, defender_type1, defender_type2=None):
         """Calculates type multiplier."""
-        multiplier = 1.0
+        attacking = type_id(move_type)
+        if attacking is None:
+            return 1.0
+        row = self.type_matrix[attacking]
         
         # Check against Type 1
-        if move_type in self.type_chart:
-            if defender_type1 in self.type_chart[move_type]:
-                multiplier *= self.type_chart[move_type][defender_type1]
+        t1 = type_id(defender_type1)
+        multiplier = row[t1] if t1 is not None else 1.0
         
         # Check against Type 2 (if it exists)
-        if defender_type2 and move_type in self.type_chart:
-             if defender_type2 in self.type_chart[move_type]:
-                multiplier *= self.type_chart[move_type][defender_type2]
+        t2 = type_id(defender_type2)
+        if t2 is not None and t2 != t1:
+            multiplier *= row[t2]
                 
         return multiplier
 
-    def calculate_damage(self, attacker_name, defender_name, move_name, use_atk_boost=False, use_def_boost=False):
-        attacker = self.get_pokemon(attacker_name)
-        defender = self.get_pokemon(defender_name)
-        move = self.get_move(move_name)
+    def get_species_effectiveness(self, move_type_id, defender_name):
+        """Multiplier of a move type against a species, straight from its against_* vector."""
+        return self.defense_vectors[defender_name][move_type_id]
 
-        if not attacker:
-            print(f"Error: Pokemon {attacker_name} not found.")
-            return None
-        if not defender:
-            print(f"Error: Pokemon {defender_name} not found.")
-            return None
-        if not move:
-            print(f"Error: Move {move_name} not found.")
-            return None
+    def compute_pre_roll_damage(self, attacker_key, defender_key, move_name, use_atk_boost, use_def_boost):
+        """
+        Everything in calculate_damage except the random factor, for pokedex keys.
+        Returns (pre_roll_damage, attack_stat_used, defense_stat_used, type_effectiveness).
+        Use the memoized self.pre_roll_damage instead of calling this directly.
+        """
+        attacker = self.pokedex[attacker_key]
+        defender = self.pokedex[defender_key]
+        move = self.moves[move_name]
 
         # Determine Stats (Physical vs Special)
         level = 50 # Standard level
         power = move['power']
         
         if move['category'] == "Physical":
-            a_stat = attacker['attack']
-            d_stat = defender['defense']
+            a_stat = attacker.attack
+            d_stat = defender.defense
         else:
-            a_stat = attacker['sp_atk']
-            d_stat = defender['sp_def']
+            a_stat = attacker.sp_atk
+            d_stat = defender.sp_def
 
         # Apply Boosts (1.5x multiplier for simplicity)
         if use_atk_boost:
@@ -250,15 +470,50 @@ class PokemonManager:
 
         # Modifiers
         # STAB (Same Type Attack Bonus, same type = 50% increase, not same = no increase)
-        stab = 1.5 if move['type'] in [attacker['type1'], attacker['type2']] else 1.0
+        move_type = move['type_id']
+        stab = 1.5 if move_type in self.species_types[attacker_key] else 1.0
         
         # Type Effectiveness
-        type_mult = self.get_type_effectiveness(move['type'], defender['type1'], defender['type2'])
+        type_mult = self.get_species_effectiveness(move_type, defender_key)
+
+        return base_damage * stab * type_mult, a_stat, d_stat, type_mult
+
+    def damage_range(self, attacker_name, defender_name, move_name, use_atk_boost=False, use_def_boost=False):
+        """(min, max) damage over the 0.85-1.0 roll, or None for unknown names."""
+        attacker = self.resolve_name(attacker_name)
+        defender = self.resolve_name(defender_name)
+        if attacker is None or defender is None or move_name not in self.moves:
+            return None
+        pre_roll = self.pre_roll_damage(attacker, defender, move_name, bool(use_atk_boost), bool(use_def_boost))[0]
+        return math.floor(pre_roll * 0.85), math.floor(pre_roll)
+
+    def calculate_damage(self, attacker_name, defender_name, move_name, use_atk_boost=False, use_def_boost=False, random_factor=None):
+        """
+        Damage for one attack. Battles pass random_factor from damage_roll();
+        without it a fresh (non-reproducible) roll is drawn.
+        """
+        attacker = self.resolve_name(attacker_name)
+        defender = self.resolve_name(defender_name)
+        move = self.get_move(move_name)
+
+        if not attacker:
+            print(f"Error: Pokemon {attacker_name} not found.")
+            return None
+        if not defender:
+            print(f"Error: Pokemon {defender_name} not found.")
+            return None
+        if not move:
+            print(f"Error: Move {move_name} not found.")
+            return None
+
+        pre_roll, a_stat, d_stat, type_mult = self.pre_roll_damage(
+            attacker, defender, move_name, bool(use_atk_boost), bool(use_def_boost))
         
         # Random Factor (0.85 to 1.0)
-        random_factor = random.uniform(0.85, 1.0)
+        if random_factor is None:
+            random_factor = random.uniform(0.85, 1.0)
 
-        final_damage = math.floor(base_damage * stab * type_mult * random_factor)
+        final_damage = math.floor(pre_roll * random_factor)
 
         return {
             "damage": int(final_damage),
@@ -0,0 +1,164 @@
+import os
+import sys
+import time
+import marshal
+import threading
+import collections
+
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+PROFILE_MAX_SECONDS = 300 # Longest profile a client will start
+PROFILE_DIR = "profiles"
+SUMMARY_TOP = 30          # Functions listed in the summary
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a live process.
+
+    A background thread wakes every `interval` seconds and records the stack
+    of every other thread via sys._current_frames(), so it sees the socket
+    listener, the game loop and the web handlers without restarting them or
+    installing a per-thread profile hook (cProfile only profiles the thread
+    that enables it). Each sample costs one stack walk per thread; nothing
+    runs between samples.
+
+    Results are collapsed stacks (one "thread;outer;...;leaf count" line per
+    distinct stack, the input of flamegraph.pl / speedscope), a pstats file
+    built from the samples (a function's time is its samples x interval, its
+    "calls" the samples it appears in) and a text summary.
+    """
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter() # (thread name, (code, ...) outermost first) -> samples
+        self.samples = 0
+        self.started = None
+        self.duration = 0.0
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds, on_done=None):
+        """Samples for `seconds` in the background, then calls on_done(self). False if already running."""
+        if self.running():
+            return False
+        self.stacks.clear()
+        self.samples = 0
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, args=(seconds, on_done), name="profiler", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self, seconds, on_done=None):
+        me = threading.get_ident()
+        self.started = time.monotonic()
+        deadline = self.started + seconds
+        while not self.stop_event.is_set() and time.monotonic() < deadline:
+            self.sample(me)
+            self.stop_event.wait(self.interval)
+        self.duration = time.monotonic() - self.started
+        if on_done:
+            on_done(self)
+
+    def sample(self, skip_ident=None):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip_ident:
+                continue
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code) # Formatted only when writing, to keep samples cheap
+                frame = frame.f_back
+            codes.reverse()
+            self.stacks[(names.get(ident, f"thread-{ident}"), tuple(codes))] += 1
+        self.samples += 1
+
+    @staticmethod
+    def label(code):
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def collapsed(self):
+        """Collapsed-stack lines, most frequent first."""
+        return [f"{';'.join([thread] + [self.label(code) for code in codes])} {count}"
+                for (thread, codes), count in self.stacks.most_common()]
+
+    def pstats_dict(self):
+        """
+        {(file, line, name): (calls, calls, self time, cumulative time, callers)}
+        as pstats.Stats loads it, with calls = samples containing the function.
+        """
+        own = collections.Counter()
+        cumulative = collections.Counter()
+        callers = collections.defaultdict(collections.Counter)
+        for (_, codes), count in self.stacks.items():
+            if not codes:
+                continue
+            own[codes[-1]] += count
+            for code in set(codes): # Recursion counts once per sample
+                cumulative[code] += count
+            for caller, callee in set(zip(codes, codes[1:])):
+                callers[callee][caller] += count
+
+        def key(code):
+            return (code.co_filename, code.co_firstlineno, code.co_name)
+        period = self.sample_period()
+        stats = {}
+        for code, samples in cumulative.items():
+            stats[key(code)] = (samples, samples, own[code] * period, samples * period,
+                                {key(caller): (n, n, 0.0, n * period) for caller, n in callers[code].items()})
+        return stats
+
+    def sample_period(self):
+        """Measured seconds per sample; longer than interval when busy threads hold the GIL."""
+        return self.duration / self.samples if self.samples else self.interval
+
+    def summary(self, top=SUMMARY_TOP):
+        """Per-thread sample counts, then the functions with the most self and cumulative samples."""
+        threads = collections.Counter()
+        own = collections.Counter()
+        cumulative = collections.Counter()
+        for (thread, codes), count in self.stacks.items():
+            threads[thread] += count
+            if codes:
+                own[self.label(codes[-1])] += count
+            for label in {self.label(code) for code in codes}: # Recursion counts once per sample
+                cumulative[label] += count
+
+        lines = [f"{self.samples} samples over {self.duration:.2f} s (every {self.sample_period() * 1000:.1f} ms, "
+                 f"{self.interval * 1000:.1f} ms requested)", "",
+                 f"{'samples':>8}  thread"]
+        for name, count in threads.most_common():
+            lines.append(f"{count:8}  {name}")
+        total = sum(threads.values()) or 1
+        lines += ["", f"{'self':>8} {'self%':>6} {'cumul':>8} {'cumul%':>6}  function"]
+        for label, count in own.most_common(top):
+            lines.append(f"{count:8} {count / total:6.1%} {cumulative[label]:8} {cumulative[label] / total:6.1%}  {label}")
+        lines += ["", f"{'cumul':>8} {'cumul%':>6}  function (by cumulative)"]
+        for label, count in cumulative.most_common(top):
+            lines.append(f"{count:8} {count / total:6.1%}  {label}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, out_dir=PROFILE_DIR, prefix="profile"):
+        """Writes <prefix>-<time>.collapsed, .pstats and .txt under out_dir. Returns the three paths."""
+        os.makedirs(out_dir, exist_ok=True)
+        base = os.path.join(out_dir, f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}")
+        with open(base + ".collapsed", "w") as f:
+            f.write("\n".join(self.collapsed()) + "\n")
+        with open(base + ".pstats", "wb") as f:
+            marshal.dump(self.pstats_dict(), f)
+        with open(base + ".txt", "w") as f:
+            f.write(self.summary())
+        return base + ".collapsed", base + ".pstats", base + ".txt"
+
+
+def parse_seconds(seconds):
+    """Profile length a client accepts: positive, at most PROFILE_MAX_SECONDS."""
+    seconds = float(seconds)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise ValueError(f"Profile length must be between 0 and {PROFILE_MAX_SECONDS} seconds")
+    return seconds
+
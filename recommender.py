@@ -0,0 +1,177 @@
+import math
+import heapq
+import itertools
+import collections
+
+# Roll range of damage_roll()
+ROLL_MIN = 0.85
+ROLL_MAX = 1.0
+LEVEL_FACTOR = 2 * 50 / 5 + 2 # (2 * Level / 5 + 2) at the standard level 50
+NO_KO = 999 # hits_to_ko() when a move does no damage
+COUNTER_PICKS_CACHE_SIZE = 64 # Opponent rankings kept (each ranks the whole Pokedex)
+
+
+def expected_floor(pre_roll):
+    """Mean of floor(pre_roll * roll) over the uniform 0.85-1.0 roll, exactly."""
+    low, high = pre_roll * ROLL_MIN, pre_roll * ROLL_MAX
+    if high <= low:
+        return math.floor(low)
+
+    def integral(x):
+        # Integral of floor(t) from 0 to x
+        whole = math.floor(x)
+        return whole * (whole - 1) / 2 + whole * (x - whole)
+    return (integral(high) - integral(low)) / (high - low)
+
+
+def ko_chance(pre_roll, hp):
+    """Probability that one hit of pre_roll damage takes hp to 0 or less."""
+    if hp <= 0:
+        return 1.0
+    if pre_roll <= 0:
+        return 0.0
+    # floor(pre_roll * roll) >= hp  <=>  roll >= hp / pre_roll (hp is an integer)
+    return min(max((ROLL_MAX - hp / pre_roll) / (ROLL_MAX - ROLL_MIN), 0.0), 1.0)
+
+
+class MoveRecommender:
+    """
+    Best-move and counter-pick suggestions.
+
+    For every learnset (shared per type combination, see PokemonManager.learnset)
+    the moves are grouped by (type, category) once, strongest first. Within a
+    group only the power changes, and damage rises with power, so ranking a
+    matchup merges the groups' already sorted lists and the best move is one
+    of the group heads. Effectiveness comes from the defender's against_*
+    vector and STAB from the attacker's type ids, so nothing is recomputed per
+    move beyond a multiply.
+    """
+    def __init__(self, pokemon_manager):
+        self.poke = pokemon_manager
+        self.refresh()
+
+    def refresh(self):
+        """Drops the tables; call after the Pokedex or move table changes."""
+        self.groups = {}         # species type ids -> [(type id, physical, [(power, name), ...])]
+        self.counter_picks_cache = collections.OrderedDict() # (opponent, as_host) -> full ranking, least recent first
+
+    def move_groups(self, species_name):
+        types = self.poke.species_types[species_name]
+        groups = self.groups.get(types)
+        if groups is None:
+            grouped = {}
+            for name in self.poke.learnset(species_name):
+                move = self.poke.moves[name]
+                key = (move["type_id"], move["category"] == "Physical")
+                grouped.setdefault(key, []).append((move["power"], name))
+            groups = self.groups[types] = [
+                (move_type, physical, sorted(moves, key=lambda entry: (-entry[0], entry[1])))
+                for (move_type, physical), moves in grouped.items()]
+        return groups
+
+    def group_factors(self, attacker_name, defender_name, use_boost=False):
+        """
+        Per group: (moves, stat ratio, STAB, effectiveness), using
+        the same stats, boost truncation and modifiers as compute_pre_roll_damage.
+        """
+        attacker = self.poke.pokedex[attacker_name]
+        defender = self.poke.pokedex[defender_name]
+        attacker_types = self.poke.species_types[attacker_name]
+        against = self.poke.defense_vectors[defender_name]
+        factors = []
+        for move_type, physical, moves in self.move_groups(attacker_name):
+            a_stat = attacker.attack if physical else attacker.sp_atk
+            d_stat = defender.defense if physical else defender.sp_def
+            if use_boost:
+                a_stat = int(a_stat * 1.5)
+            stab = 1.5 if move_type in attacker_types else 1.0
+            factors.append((moves, a_stat / d_stat, stab, against[move_type]))
+        return factors
+
+    @staticmethod
+    def pre_roll(power, ratio, stab, effectiveness):
+        return ((LEVEL_FACTOR * power * ratio) / 50 + 2) * stab * effectiveness
+
+    def best_pre_roll(self, attacker_name, defender_name, use_boost=False):
+        """(pre-roll damage, move) of the attacker's strongest move against the defender."""
+        best = (-1.0, None)
+        for moves, ratio, stab, effectiveness in self.group_factors(attacker_name, defender_name, use_boost):
+            power, name = moves[0]
+            damage = self.pre_roll(power, ratio, stab, effectiveness)
+            if damage > best[0] or (damage == best[0] and name < best[1]):
+                best = (damage, name)
+        return best
+
+    def rank_moves(self, attacker_name, defender_name, defender_hp=None, use_boost=False, limit=5):
+        """
+        The attacker's moves by expected damage against the defender, best first
+        (limit=None for all). Each entry is a dict with the move's type, category
+        and power, min/max/expected damage and, given defender_hp, the chance
+        that one hit knocks the defender out. Unknown names give [].
+        """
+        attacker = self.poke.resolve_name(attacker_name)
+        defender = self.poke.resolve_name(defender_name)
+        if attacker is None or defender is None:
+            return []
+        hp = self.poke.pokedex[defender].hp if defender_hp is None else defender_hp
+
+        def scored(moves, ratio, stab, effectiveness):
+            for power, name in moves:
+                yield -self.pre_roll(power, ratio, stab, effectiveness), name
+
+        ranked = heapq.merge(*(scored(*factors) for factors in self.group_factors(attacker, defender, use_boost)))
+        results = []
+        for negative_damage, name in itertools.islice(ranked, limit):
+            pre_roll = -negative_damage
+            move = self.poke.moves[name]
+            results.append({
+                "move": name,
+                "type": move["type"],
+                "category": move["category"],
+                "power": move["power"],
+                "min": math.floor(pre_roll * ROLL_MIN),
+                "max": math.floor(pre_roll * ROLL_MAX),
+                "expected": expected_floor(pre_roll),
+                "ko_chance": ko_chance(pre_roll, hp),
+            })
+        return results
+
+    def counter_picks(self, opponent_name, limit=5, as_host=False):
+        """
+        Species that beat the opponent fastest, each a dict with our best move,
+        our/their expected hits to KO and the margin. The host attacks first,
+        so as_host wins ties on hits. Rankings are memoized per opponent
+        (the COUNTER_PICKS_CACHE_SIZE most recently asked).
+        """
+        opponent = self.poke.resolve_name(opponent_name)
+        if opponent is None:
+            return []
+        key = (opponent, as_host)
+        ranking = self.counter_picks_cache.get(key)
+        if ranking is None:
+            ranking = self.counter_picks_cache[key] = self.rank_counters(opponent, as_host)
+            if len(self.counter_picks_cache) > COUNTER_PICKS_CACHE_SIZE:
+                self.counter_picks_cache.popitem(last=False)
+        else:
+            self.counter_picks_cache.move_to_end(key)
+        return ranking[:limit]
+
+    def rank_counters(self, opponent, as_host):
+        opponent_hp = self.poke.pokedex[opponent].hp
+        ranking = []
+        for candidate in self.poke.pokedex:
+            ours, move = self.best_pre_roll(candidate, opponent)
+            theirs, _ = self.best_pre_roll(opponent, candidate)
+            our_hits = self.hits_to_ko(ours, opponent_hp)
+            their_hits = self.hits_to_ko(theirs, self.poke.pokedex[candidate].hp)
+            margin = their_hits - our_hits + (1 if as_host else 0) # > 0: we KO first
+            ranking.append((-margin, our_hits, -ours / opponent_hp, candidate, move, their_hits))
+        ranking.sort()
+        return [{"pokemon": candidate, "move": move, "hits_to_ko": our_hits, "hits_to_be_ko": their_hits,
+                 "margin": -negative_margin}
+                for negative_margin, our_hits, _, candidate, move, their_hits in ranking]
+
+    @staticmethod
+    def hits_to_ko(pre_roll, hp):
+        expected = expected_floor(pre_roll)
+        return min(math.ceil(hp / expected), NO_KO) if expected > 0 else NO_KO
@@ -0,0 +1,235 @@
+import sys
+import io
+import json
+import argparse
+import contextlib
+import time
+import queue
+import collections
+
+import constants
+from network_manager import NetworkManager
+from pokemon_manager import PokemonManager
+from game_engine import GameEngine
+from clock import VirtualClock
+from capture import read_capture, DIRECTION_OUT
+
+# Turn messages only the engine sends: a captured one the replay never sends is a divergence too
+TURN_MESSAGES = (constants.MSG_ATTACK_ANNOUNCE, constants.MSG_DEFENSE_ANNOUNCE, constants.MSG_CALCULATION_REPORT,
+                 constants.MSG_CALCULATION_CONFIRM, constants.MSG_RESOLUTION_REQUEST, constants.MSG_GAME_OVER)
+# Fields that legitimately differ between the recording and the replay
+IGNORED_FIELDS = (constants.KEY_SEQ_NUM, constants.KEY_SEED)
+
+
+class ReplayNetworkManager(NetworkManager):
+    """
+    NetworkManager without a socket. Received datagrams are pushed in by the
+    replay loop and anything the engine sends is kept in `sent` until the
+    replayer checks it against the capture.
+    """
+    def __init__(self, clock):
+        self.clock = clock
+        self.sequence_number = 0
+        self.peer_address = None
+        self.spectators = []
+        self.incoming_messages = queue.Queue()
+        self.pending_acks = {}
+        self.received_history = collections.OrderedDict()
+        self.message_callback = None
+        self.capture = None
+        self.tracer = None
+        self.metrics = None
+        self.packets_sent = 0
+        self.sent = []
+
+    def send_packet(self, packet, addr):
+        self.packets_sent += 1
+        self.sent.append(packet)
+
+    def close(self):
+        pass
+
+
+class CaptureReplayer:
+    """
+    Feeds a datagram capture back through parse_packet and GameEngine.process_message.
+
+    Received datagrams go through the normal reliability layer (ACKs, duplicate
+    filtering) before reaching the engine. Our own sent datagrams are used to
+    re-create the local decisions (Pokemon choice, seed, moves) the player made,
+    and every message the engine sends during the replay is diffed against the
+    next captured sent message of the same type. The first difference is
+    reported as the replay's divergence.
+    """
+    def __init__(self, records, pokemon_manager):
+        self.records = records
+        self.poke = pokemon_manager
+
+    def run(self):
+        clock = VirtualClock()
+        net = ReplayNetworkManager(clock)
+        engine = GameEngine(self.poke, net)
+        # Accept whatever the capture negotiated; our own sent response overrides it for hosts
+        engine.offer_fast_turn = True
+        stats = {"datagrams": 0, "processed": 0, "compared": 0, "divergence": None}
+        self.sent_history = set()
+        self.replayed_history = set()
+        self.expected = self.captured_sends(net)
+
+        for index, (direction, timestamp, addr, data) in enumerate(self.records):
+            stats["datagrams"] += 1
+            if timestamp > clock.monotonic():
+                clock.advance(timestamp - clock.monotonic())
+
+            if direction == DIRECTION_OUT:
+                self.apply_local_action(engine, net, addr, data)
+                self.check_sent(net, index, stats)
+                continue
+
+            net.handle_datagram(data, addr)
+            while True:
+                msg = net.receive_message()
+                if msg is None:
+                    break
+                stats["processed"] += 1
+                engine.process_message(msg)
+                self.check_start(engine)
+            self.check_sent(net, index, stats)
+
+        if stats["divergence"] is None:
+            for msg_type in TURN_MESSAGES:
+                if self.expected[msg_type]:
+                    stats["divergence"] = {"datagram": None, "message_type": msg_type,
+                                           "differences": [("(message)", "sent", "never sent")]}
+                    break
+        stats["packets_sent"] = net.packets_sent
+        return engine, stats
+
+    def captured_sends(self, net):
+        """Our captured sent messages per type, oldest first, without ACKs and retransmissions."""
+        expected = collections.defaultdict(collections.deque)
+        seen = set()
+        for direction, _, _, data in self.records:
+            if direction != DIRECTION_OUT:
+                continue
+            msg = net.parse_packet(data)
+            if not msg or msg.get(constants.KEY_MSG_TYPE) == constants.MSG_ACK:
+                continue
+            seq_num = msg.get(constants.KEY_SEQ_NUM)
+            if seq_num in seen: # Retransmission, or the same packet to a spectator
+                continue
+            seen.add(seq_num)
+            expected[msg.get(constants.KEY_MSG_TYPE)].append(msg)
+        return expected
+
+    def check_sent(self, net, index, stats):
+        """Diffs what the engine just sent against the capture; keeps the first divergence."""
+        for packet in net.sent:
+            msg = net.parse_packet(packet)
+            msg_type = msg.get(constants.KEY_MSG_TYPE)
+            seq_num = msg.get(constants.KEY_SEQ_NUM)
+            if msg_type == constants.MSG_ACK or seq_num in self.replayed_history:
+                continue
+            self.replayed_history.add(seq_num)
+            stats["compared"] += 1
+            captured = self.expected[msg_type].popleft() if self.expected[msg_type] else None
+            differences = diff_messages(captured, msg)
+            if differences and stats["divergence"] is None:
+                stats["divergence"] = {"datagram": index, "message_type": msg_type, "differences": differences}
+        net.sent.clear()
+
+    def apply_local_action(self, engine, net, addr, data):
+        """Re-creates the local player's decision from one of our sent datagrams."""
+        msg = net.parse_packet(data)
+        if not msg:
+            return
+        # Retransmissions of our own packets are not new decisions
+        seq_num = msg.get(constants.KEY_SEQ_NUM)
+        if seq_num is not None:
+            if seq_num in self.sent_history:
+                return
+            self.sent_history.add(seq_num)
+        msg_type = msg.get(constants.KEY_MSG_TYPE)
+
+        if msg_type == constants.MSG_HANDSHAKE_REQUEST:
+            net.peer_address = addr
+            engine.is_host = False
+        elif msg_type == constants.MSG_SPECTATOR_REQUEST:
+            net.peer_address = addr
+            engine.start_spectating()
+        elif msg_type == constants.MSG_HANDSHAKE_RESPONSE:
+            net.peer_address = addr
+            engine.is_host = True
+            engine.seed = int(msg.get(constants.KEY_SEED))
+            engine.fast_turn = msg.get(constants.KEY_FAST_TURN) == "1"
+        elif msg_type == constants.MSG_BATTLE_SETUP and constants.KEY_POKEMON_NAME in msg:
+            atk, dfn = 0, 0
+            try:
+                boosts = json.loads(msg.get(constants.KEY_STAT_BOOSTS))
+                atk = int(boosts.get("special_attack_uses", 0))
+                dfn = int(boosts.get("special_defense_uses", 0))
+            except (TypeError, ValueError):
+                pass
+            engine.set_my_pokemon(msg[constants.KEY_POKEMON_NAME], atk, dfn)
+            self.check_start(engine)
+        elif msg_type == constants.MSG_ATTACK_ANNOUNCE:
+            engine.select_move(msg.get(constants.KEY_MOVE_NAME), msg.get(constants.KEY_USE_BOOST) == "1")
+
+    def check_start(self, engine):
+        if engine.my_pokemon and engine.opponent_pokemon and engine.seed is not None:
+            if engine.state == constants.STATE_SETUP:
+                engine.start_battle(engine.is_host, engine.seed)
+
+
+def diff_messages(captured, replayed):
+    """[(field, captured value, replayed value)] that differ; None for a message the capture does not have."""
+    if captured is None:
+        return [("(message)", "not sent", "sent")]
+    fields = (set(captured) | set(replayed)) - set(IGNORED_FIELDS)
+    return [(field, captured.get(field), replayed.get(field)) for field in sorted(fields)
+            if captured.get(field) != replayed.get(field)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a datagram capture through the game engine")
+    parser.add_argument('capture', help='Capture file written with --capture')
+    parser.add_argument('--csv', default='pokemon.csv', help='Pokemon CSV to load')
+    parser.add_argument('--repeat', type=int, default=1, help='Replay the capture N times (throughput benchmark)')
+    parser.add_argument('--verbose', action='store_true', help='Show engine output while replaying')
+    args = parser.parse_args()
+
+    records = list(read_capture(args.capture))
+    poke = PokemonManager(args.csv)
+    replayer = CaptureReplayer(records, poke)
+
+    sink = sys.stdout if args.verbose else io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        for _ in range(args.repeat):
+            engine, stats = replayer.run()
+            if not args.verbose:
+                sink.seek(0)
+                sink.truncate()
+    elapsed = time.perf_counter() - start
+
+    print(f"Replayed {stats['datagrams']} datagrams x{args.repeat} in {elapsed:.3f}s "
+          f"({stats['datagrams'] * args.repeat / elapsed:.0f} datagrams/s)")
+    print(f"Messages processed per run: {stats['processed']}, engine packets sent: {stats['packets_sent']}")
+    print(f"Final state: {engine.state}")
+    if engine.my_pokemon and engine.opponent_pokemon:
+        print(f"  {engine.my_pokemon.name}: {engine.my_pokemon.hp} HP | "
+              f"{engine.opponent_pokemon.name}: {engine.opponent_pokemon.hp} HP")
+
+    divergence = stats["divergence"]
+    if divergence is None:
+        print(f"Sent messages match the capture ({stats['compared']} compared)")
+        return 0
+    where = f"datagram #{divergence['datagram']}" if divergence["datagram"] is not None else "end of capture"
+    print(f"DIVERGED at {where}: {divergence['message_type']}")
+    for field, captured, replayed in divergence["differences"]:
+        print(f"  {field}: captured {captured!r}, replayed {replayed!r}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
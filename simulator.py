@@ -0,0 +1,275 @@
+import sys
+import time
+import argparse
+
+try:
+    import numpy as np
+except ImportError: # Optional: only the batch/analysis tools need numpy
+    np = None
+
+from pokemon_manager import PokemonManager
+from species import Combatant
+
+SIM_CHUNK = 1 << 20 # Battles per vectorized pass (bounds memory for multi-million runs)
+MAX_TURNS = 200     # Battles still running after this many attacks count as draws
+
+# Winner codes in simulate_battles() results
+HOST, JOINER, DRAW = 0, 1, -1
+
+
+class MovePolicy:
+    """
+    How one side picks its move each turn: "best" (always the highest expected
+    damage move it can learn), "random" (uniform over its learnset) or a list
+    of move names (uniform over those). use_boosts spends Sp. Atk boosts on the
+    first attacks, like a player who always ticks the boost box.
+    """
+    def __init__(self, moves="best", use_boosts=True):
+        self.moves = moves
+        self.use_boosts = use_boosts
+
+    def __repr__(self):
+        return f"MovePolicy({self.moves!r}, use_boosts={self.use_boosts})"
+
+
+def simulate_battles(host_damage, joiner_damage, host_hp, joiner_hp, host_boosts, joiner_boosts, rng, max_turns=MAX_TURNS):
+    """
+    Runs a batch of battles with GameEngine's turn rules: the host attacks
+    first, turns alternate, an attacker with boosts left spends one for 1.5x
+    Sp. Atk, damage is floor(pre_roll * roll) with the 0.85-1.0 roll, and a
+    side is KO'd at 0 HP or less. Defense boosts are never applied (the engine
+    reports without them either).
+
+    host_damage/joiner_damage: (battles, moves, 2) pre-roll damage of each
+    candidate move, unboosted and boosted; one is picked uniformly per turn.
+    hp and boosts: (battles,) arrays, modified in place.
+    Returns (winner codes, turns) arrays.
+    """
+    battles = len(host_hp)
+    winner = np.full(battles, DRAW, dtype=np.int8)
+    turns = np.full(battles, max_turns, dtype=np.int32)
+    sides = ((host_damage, host_boosts, joiner_hp, HOST), (joiner_damage, joiner_boosts, host_hp, JOINER))
+
+    active = np.arange(battles)
+    for turn in range(max_turns):
+        if not len(active):
+            break
+        damage_table, boosts, defender_hp, side = sides[turn % 2]
+        count = len(active)
+
+        move_count = damage_table.shape[1]
+        move = rng.integers(move_count, size=count) if move_count > 1 else np.zeros(count, dtype=np.intp)
+        boosted = boosts[active] > 0
+        boosts[active] -= boosted
+
+        roll = 0.85 + 0.15 * rng.random(count)
+        damage = np.floor(damage_table[active, move, boosted.astype(np.intp)] * roll).astype(np.int64)
+        defender_hp[active] -= damage
+
+        knocked_out = defender_hp[active] <= 0
+        finished = active[knocked_out]
+        winner[finished] = side
+        turns[finished] = turn + 1
+        active = active[~knocked_out]
+    return winner, turns
+
+
+class BattleSimulator:
+    """
+    Headless Monte Carlo battles for balance tuning. Everything happens in
+    memory: no network, no GameEngine instance, no input. Each matchup's
+    pre-roll damages come from PokemonManager.pre_roll_damage (the same
+    formula the engine uses) and the battles themselves run vectorized over
+    NumPy, SIM_CHUNK at a time.
+    """
+    def __init__(self, pokemon_manager, seed=None):
+        if np is None:
+            raise ImportError("numpy is required for the battle simulator (pip install numpy)")
+        self.poke = pokemon_manager
+        self.seed = seed
+
+    def expected_damage(self, attacker, defender, move_name):
+        """Mean damage over the roll, unboosted (what "best" maximizes)."""
+        pre_roll = self.poke.pre_roll_damage(attacker, defender, move_name, False, False)[0]
+        return pre_roll * 0.925
+
+    def resolve_moves(self, attacker, defender, policy):
+        """Move names the policy picks from, for attacker facing defender."""
+        if policy.moves == "best":
+            learnable = sorted(self.poke.learnset(attacker))
+            return [max(learnable, key=lambda move: self.expected_damage(attacker, defender, move))]
+        if policy.moves == "random":
+            return sorted(self.poke.learnset(attacker))
+
+        moves = []
+        for name in policy.moves:
+            move = self.poke.resolve_move(name)
+            if move is None:
+                raise ValueError(f"Unknown move: {name}")
+            moves.append(move)
+        return moves
+
+    def damage_table(self, attacker, defender, moves):
+        """(moves, 2) array of pre-roll damage, unboosted and boosted."""
+        return np.array([[self.poke.pre_roll_damage(attacker, defender, move, boost, False)[0]
+                          for boost in (False, True)] for move in moves], dtype=np.float64)
+
+    def simulate(self, host, joiner, battles=100000, host_policy=None, joiner_policy=None,
+                 max_turns=MAX_TURNS, seed=None):
+        """
+        Plays battles between two Combatants (HP and Sp. Atk boosts are the
+        starting values; the Combatants themselves are not modified).
+        Returns a dict of win counts/rates, turn statistics and the moves used.
+        """
+        if battles < 1:
+            raise ValueError("Battles must be at least 1")
+        host_policy = host_policy or MovePolicy()
+        joiner_policy = joiner_policy or MovePolicy()
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+
+        host_moves = self.resolve_moves(host.name, joiner.name, host_policy)
+        joiner_moves = self.resolve_moves(joiner.name, host.name, joiner_policy)
+        host_table = self.damage_table(host.name, joiner.name, host_moves)
+        joiner_table = self.damage_table(joiner.name, host.name, joiner_moves)
+
+        winners, turns = [], []
+        for start in range(0, battles, SIM_CHUNK):
+            count = min(SIM_CHUNK, battles - start)
+            host_boosts = host.sp_atk_boosts if host_policy.use_boosts else 0
+            joiner_boosts = joiner.sp_atk_boosts if joiner_policy.use_boosts else 0
+            winner, turn = simulate_battles(
+                np.broadcast_to(host_table, (count,) + host_table.shape),
+                np.broadcast_to(joiner_table, (count,) + joiner_table.shape),
+                np.full(count, host.hp, dtype=np.int64), np.full(count, joiner.hp, dtype=np.int64),
+                np.full(count, host_boosts, dtype=np.int64), np.full(count, joiner_boosts, dtype=np.int64),
+                rng, max_turns)
+            winners.append(winner)
+            turns.append(turn)
+        return self.summarize(np.concatenate(winners), np.concatenate(turns), host_moves, joiner_moves)
+
+    def summarize(self, winner, turns, host_moves, joiner_moves):
+        battles = len(winner)
+        host_wins = int(np.count_nonzero(winner == HOST))
+        joiner_wins = int(np.count_nonzero(winner == JOINER))
+        rate = host_wins / battles if battles else 0.0
+        finished = turns[winner != DRAW]
+
+        def attacks_to_ko(side):
+            # The host makes the odd-numbered attacks, the joiner the even ones
+            won = turns[winner == side]
+            return float(np.mean((won + 1) // 2)) if len(won) else None
+
+        return {
+            "battles": battles,
+            "host_wins": host_wins,
+            "joiner_wins": joiner_wins,
+            "draws": battles - host_wins - joiner_wins,
+            "host_win_rate": rate,
+            "host_win_stderr": (rate * (1 - rate) / battles) ** 0.5 if battles else 0.0,
+            "mean_turns": float(np.mean(finished)) if len(finished) else None,
+            "turns_p50": int(np.percentile(finished, 50)) if len(finished) else None,
+            "turns_p90": int(np.percentile(finished, 90)) if len(finished) else None,
+            "host_attacks_to_ko": attacks_to_ko(HOST),
+            "joiner_attacks_to_ko": attacks_to_ko(JOINER),
+            "host_moves": host_moves,
+            "joiner_moves": joiner_moves,
+        }
+
+    def boost_value(self, host, joiner, side="host", battles=100000, host_policy=None, joiner_policy=None,
+                    max_turns=MAX_TURNS):
+        """
+        Change in the host's win rate when side ("host" or "joiner") spends its
+        boosts versus never using them. Both runs use the same seed (common
+        random numbers), so the difference is not swamped by sampling noise.
+        Returns (with boosts result, without boosts result, delta).
+        """
+        seed = self.seed if self.seed is not None else int(np.random.default_rng().integers(2**63))
+        results = []
+        for use_boosts in (True, False):
+            policies = {"host": host_policy or MovePolicy(), "joiner": joiner_policy or MovePolicy()}
+            policies[side] = MovePolicy(policies[side].moves, use_boosts)
+            results.append(self.simulate(host, joiner, battles, policies["host"], policies["joiner"], max_turns, seed))
+        return results[0], results[1], results[0]["host_win_rate"] - results[1]["host_win_rate"]
+
+
+def format_result(host, joiner, result):
+    lines = [
+        f"{host.name} (host) vs {joiner.name}: {result['battles']:,} battles",
+        f"  {host.name} wins {result['host_win_rate'] * 100:.2f}% (+/- {result['host_win_stderr'] * 196:.2f}% at 95%), "
+        f"{joiner.name} wins {result['joiner_wins'] / result['battles'] * 100:.2f}%, draws {result['draws']}",
+    ]
+    if result["mean_turns"] is not None:
+        lines.append(f"  Turns: mean {result['mean_turns']:.2f}, median {result['turns_p50']}, p90 {result['turns_p90']}")
+    for name, key in ((host.name, "host"), (joiner.name, "joiner")):
+        attacks = result[f"{key}_attacks_to_ko"]
+        attacks_text = f"{attacks:.2f} attacks to KO when winning" if attacks is not None else "never wins"
+        moves = result[f"{key}_moves"]
+        moves_text = ", ".join(moves) if len(moves) <= 4 else f"{len(moves)} moves at random"
+        lines.append(f"  {name}: {attacks_text} ({moves_text})")
+    return "\n".join(lines)
+
+
+def parse_policy(moves, no_boosts):
+    if moves in ("best", "random"):
+        return MovePolicy(moves, not no_boosts)
+    return MovePolicy([move.strip() for move in moves.split(",") if move.strip()], not no_boosts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo battle simulator: win probability, turns to KO and boost value")
+    parser.add_argument('host', help='Host Pokemon (attacks first)')
+    parser.add_argument('joiner', help='Joiner Pokemon')
+    parser.add_argument('--battles', type=int, default=100000, help='Battles to simulate')
+    parser.add_argument('--host-moves', default='best', help='"best", "random" or comma-separated move names')
+    parser.add_argument('--joiner-moves', default='best', help='"best", "random" or comma-separated move names')
+    parser.add_argument('--host-boosts', type=int, default=0, help='Host Sp. Atk boosts')
+    parser.add_argument('--joiner-boosts', type=int, default=0, help='Joiner Sp. Atk boosts')
+    parser.add_argument('--no-host-boosts', action='store_true', help='Host never spends its boosts')
+    parser.add_argument('--no-joiner-boosts', action='store_true', help='Joiner never spends its boosts')
+    parser.add_argument('--boost-value', action='store_true', help='Also report how much each side\'s boosts change the win rate')
+    parser.add_argument('--max-turns', type=int, default=MAX_TURNS, help='Attacks before a battle counts as a draw')
+    parser.add_argument('--seed', type=int, default=None, help='RNG seed for reproducible runs')
+    parser.add_argument('--csv', default='pokemon.csv', help='Pokemon CSV')
+    args = parser.parse_args()
+    if args.battles < 1:
+        parser.error("--battles must be at least 1")
+
+    if np is None:
+        print("numpy is required for the simulator (pip install numpy)")
+        sys.exit(1)
+
+    poke = PokemonManager(args.csv)
+    sides = []
+    for name, boosts in ((args.host, args.host_boosts), (args.joiner, args.joiner_boosts)):
+        species = poke.get_pokemon(name)
+        if species is None:
+            suggestions = poke.suggest_pokemon(name)
+            print(f"Unknown Pokemon: {name}" + (f". Did you mean: {', '.join(suggestions)}?" if suggestions else ""))
+            sys.exit(1)
+        sides.append(Combatant(species, sp_atk_boosts=boosts))
+    host, joiner = sides
+
+    simulator = BattleSimulator(poke, args.seed)
+    host_policy = parse_policy(args.host_moves, args.no_host_boosts)
+    joiner_policy = parse_policy(args.joiner_moves, args.no_joiner_boosts)
+    try:
+        start = time.perf_counter()
+        result = simulator.simulate(host, joiner, args.battles, host_policy, joiner_policy, args.max_turns)
+        elapsed = time.perf_counter() - start
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(format_result(host, joiner, result))
+    print(f"  ({elapsed:.2f}s, {args.battles / elapsed:,.0f} battles/s)")
+
+    if args.boost_value:
+        for side, combatant in (("host", host), ("joiner", joiner)):
+            if not combatant.sp_atk_boosts:
+                continue
+            _, _, delta = simulator.boost_value(host, joiner, side, args.battles, host_policy, joiner_policy, args.max_turns)
+            print(f"  Boost value ({combatant.name}, {combatant.sp_atk_boosts} boosts): "
+                  f"{host.name}'s win rate {delta * 100:+.2f} points")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+SPECIES_FIELDS = ("name", "type1", "type2", "hp", "attack", "defense", "sp_atk", "sp_def", "speed")
+STAT_FIELDS = SPECIES_FIELDS[3:]
+MAX_NAME_LENGTH = 32
+MAX_STAT = 0xFFFF
+
+
+class Species:
+    """
+    Immutable Pokedex entry. One instance per species is shared by every battle;
+    anything that changes during a battle lives in Combatant.
+    """
+    __slots__ = SPECIES_FIELDS
+
+    def __init__(self, name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed):
+        for field, value in zip(SPECIES_FIELDS, (name, type1, type2, hp, attack, defense, sp_atk, sp_def, speed)):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, field, value):
+        raise AttributeError("Species records are read-only")
+
+    def __delattr__(self, field):
+        raise AttributeError("Species records are read-only")
+
+    def astuple(self):
+        return tuple(getattr(self, field) for field in SPECIES_FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, Species) and self.astuple() == other.astuple()
+
+    def __hash__(self):
+        return hash(self.astuple())
+
+    def __repr__(self):
+        return f"Species({self.name!r}, {self.type1!r}, {self.type2!r}, hp={self.hp})"
+
+    def to_dict(self):
+        """The BATTLE_SETUP "pokemon" blob (RFC 4.4)."""
+        return {field: getattr(self, field) for field in SPECIES_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Builds a record from a received blob. Raises ValueError unless it has a
+        name, string types and integer stats in range; unknown keys are ignored.
+        """
+        if not isinstance(data, dict):
+            raise ValueError("Pokemon data must be an object")
+        name = data.get("name")
+        if not isinstance(name, str) or not name.strip() or len(name) > MAX_NAME_LENGTH:
+            raise ValueError(f"Invalid Pokemon name: {name!r}")
+        type1 = data.get("type1")
+        type2 = data.get("type2") or None
+        if not isinstance(type1, str) or not (type2 is None or isinstance(type2, str)):
+            raise ValueError("Invalid Pokemon types")
+
+        stats = []
+        for field in STAT_FIELDS:
+            value = data.get(field)
+            # bool is an int subclass; reject it along with floats and strings
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 < value <= MAX_STAT:
+                raise ValueError(f"Invalid {field}: {value!r}")
+            stats.append(value)
+        return cls(name.strip(), type1, type2, *stats)
+
+
+class Combatant:
+    """Per-battle state of one side: the shared species plus current HP and boosts left."""
+    __slots__ = ("species", "hp", "sp_atk_boosts", "sp_def_boosts")
+
+    def __init__(self, species, sp_atk_boosts=0, sp_def_boosts=0, hp=None):
+        self.species = species
+        self.hp = species.hp if hp is None else hp
+        self.sp_atk_boosts = sp_atk_boosts
+        self.sp_def_boosts = sp_def_boosts
+
+    @property
+    def name(self):
+        return self.species.name
+
+    @property
+    def max_hp(self):
+        return self.species.hp
+
+    def snapshot(self):
+        """(hp, sp_atk_boosts, sp_def_boosts), enough to restore() this side later."""
+        return (self.hp, self.sp_atk_boosts, self.sp_def_boosts)
+
+    def restore(self, snapshot):
+        self.hp, self.sp_atk_boosts, self.sp_def_boosts = snapshot
+
+    def copy(self):
+        return Combatant(self.species, self.sp_atk_boosts, self.sp_def_boosts, self.hp)
+
+    def __repr__(self):
+        return f"Combatant({self.name!r}, hp={self.hp}/{self.max_hp}, boosts={self.sp_atk_boosts}/{self.sp_def_boosts})"
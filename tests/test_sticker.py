@@ -0,0 +1,49 @@
+import unittest
+
+import constants
+from network_manager import NetworkManager
+from game_engine import GameEngine
+
+
+class StickerSizeTest(unittest.TestCase):
+    """A sticker of MAX_STICKER_BYTES goes through a real socket pair whole."""
+
+    def setUp(self):
+        self.sender = NetworkManager(port=0)
+        self.receiver = NetworkManager(port=0)
+        self.sender.peer_address = ("127.0.0.1", self.receiver.sock.getsockname()[1])
+        self.receiver.peer_address = ("127.0.0.1", self.sender.sock.getsockname()[1])
+
+    def tearDown(self):
+        self.sender.close()
+        self.receiver.close()
+
+    def test_largest_sticker_arrives_whole(self):
+        sticker = "A" * constants.MAX_STICKER_BYTES
+        self.sender.send_reliable(constants.MSG_CHAT_MESSAGE, {
+            constants.KEY_SENDER: "Player",
+            constants.KEY_CONTENT_TYPE: constants.CONTENT_TYPE_STICKER,
+            constants.KEY_STICKER_DATA: sticker
+        })
+        message = self.receiver.incoming_messages.get(timeout=2)
+        self.assertEqual(message[constants.KEY_STICKER_DATA], sticker)
+
+        # Accepted by the engine, not dropped as too large
+        engine = GameEngine(None, self.receiver)
+        shown = []
+        engine.chat_listener = shown.append
+        engine.handle_chat(message)
+        self.assertEqual(shown, [message])
+
+    def test_cap_fits_the_receive_buffer(self):
+        packet = self.sender.construct_message(constants.MSG_CHAT_MESSAGE, {
+            constants.KEY_SENDER: "Player",
+            constants.KEY_CONTENT_TYPE: constants.CONTENT_TYPE_STICKER,
+            constants.KEY_STICKER_DATA: "A" * constants.MAX_STICKER_BYTES
+        })
+        self.assertLessEqual(len(packet), constants.BUFFER_SIZE)
+        self.assertLessEqual(constants.BUFFER_SIZE, constants.MAX_DATAGRAM_BYTES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,307 @@
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import warnings
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import numpy as np
+except ImportError: # Optional: only the batch/analysis tools need numpy
+    np = None
+
+from pokemon_manager import PokemonManager
+from batch_damage import BatchDamageEngine
+from simulator import simulate_battles, HOST, MAX_TURNS
+
+TOURNAMENT_DIR = "tournament"
+CHUNK_ROWS = 8 # Host rows per work unit
+
+# Files in the output directory
+WIN_RATES_FILE = "win_rates.npy" # float32 [host, joiner] = host win rate, NaN until played
+DONE_FILE = "done.npy"           # bool per host row, set once the row is on disk
+META_FILE = "meta.json"          # settings and species names; a resume must match them
+
+# Per-process state, set up once by init_worker()
+_worker = None
+
+
+class RowPlayer:
+    """
+    Plays one host against every species, both sides using their best move
+    (like simulator.MovePolicy("best")). Pre-roll damages for all moves come
+    from one BatchDamageEngine call per side, and all matchups of the row are
+    simulated in a single simulate_battles() batch.
+    """
+    def __init__(self, pokemon_manager, battles, boosts, max_turns, seed):
+        if battles < 1:
+            raise ValueError("Battles must be at least 1")
+        self.poke = pokemon_manager
+        self.battles = battles
+        self.boosts = boosts
+        self.max_turns = max_turns
+        self.seed = seed
+        self.batch = BatchDamageEngine(pokemon_manager)
+
+        # Moves in name order, so ties between equally strong moves break the way simulator.py breaks them
+        self.moves = np.array(sorted(range(len(self.batch.move_names)), key=self.batch.move_names.__getitem__), dtype=np.intp)
+        self.species = np.arange(len(self.batch.species_names), dtype=np.intp)
+        # learnable[species, move] (move axis in self.moves order)
+        move_position = {self.batch.move_names[move]: k for k, move in enumerate(self.moves)}
+        self.learnable = np.zeros((len(self.species), len(self.moves)), dtype=bool)
+        for species, name in enumerate(self.batch.species_names):
+            self.learnable[species, [move_position[move] for move in self.poke.learnset(name)]] = True
+
+    def best_moves(self, attackers, defenders, learnable):
+        """
+        (defenders, 2) pre-roll damage of the attacker's best move against each
+        defender, unboosted and boosted. learnable is (moves, defenders).
+        """
+        unboosted = self.batch.pre_roll_damage(attackers, defenders, self.moves[:, None], False)
+        boosted = self.batch.pre_roll_damage(attackers, defenders, self.moves[:, None], True)
+        best = np.where(learnable, unboosted, -np.inf).argmax(axis=0)
+        columns = np.arange(unboosted.shape[1])
+        return np.stack([unboosted[best, columns], boosted[best, columns]], axis=1)
+
+    def play_row(self, host):
+        count = len(self.species)
+        host_table = self.best_moves(host, self.species[None, :], np.broadcast_to(self.learnable[host][:, None], (len(self.moves), count)))
+        joiner_table = self.best_moves(self.species[None, :], host, self.learnable.T)
+
+        battles = self.battles
+        hp = self.batch.hp
+        rng = np.random.default_rng([self.seed, host]) # Per row, so results don't depend on chunking
+        winner, _ = simulate_battles(
+            np.repeat(host_table, battles, axis=0)[:, None, :],
+            np.repeat(joiner_table, battles, axis=0)[:, None, :],
+            np.full(count * battles, hp[host], dtype=np.int64),
+            np.repeat(hp, battles),
+            np.full(count * battles, self.boosts, dtype=np.int64),
+            np.full(count * battles, self.boosts, dtype=np.int64),
+            rng, self.max_turns)
+        return (winner.reshape(count, battles) == HOST).mean(axis=1).astype(np.float32)
+
+
+def init_worker(pokemon_csv, moves_csv, battles, boosts, max_turns, seed):
+    """
+    Pool initializer. The parent has already compiled the Pokedex, so this
+    maps the shared .pkdex file instead of parsing the CSV again.
+    """
+    global _worker
+    with contextlib.redirect_stdout(io.StringIO()):
+        poke = PokemonManager(pokemon_csv, moves_csv)
+    _worker = RowPlayer(poke, battles, boosts, max_turns, seed)
+
+
+def play_rows(start, stop):
+    return start, np.stack([_worker.play_row(host) for host in range(start, stop)])
+
+
+class Tournament:
+    """
+    Round robin of every species against every other, as host and as joiner.
+    Results live in an output directory: a (species x species) float32
+    win-rate matrix and a per-row done mask, both .npy files written through
+    memory maps as work units finish, so an interrupted run resumes where it
+    stopped.
+    """
+    def __init__(self, path=TOURNAMENT_DIR):
+        self.path = path
+        self.meta = None
+        self.win_rates = None
+        self.done = None
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def create(self, meta):
+        os.makedirs(self.path, exist_ok=True)
+        count = len(meta["names"])
+        self.win_rates = np.lib.format.open_memmap(self.file(WIN_RATES_FILE), mode='w+', dtype=np.float32, shape=(count, count))
+        self.win_rates[:] = np.nan
+        self.done = np.lib.format.open_memmap(self.file(DONE_FILE), mode='w+', dtype=bool, shape=(count,))
+        self.win_rates.flush()
+        self.done.flush()
+        with open(self.file(META_FILE), 'w') as f:
+            json.dump(meta, f)
+        self.meta = meta
+
+    def open(self, mode='r'):
+        """Loads an existing run. Returns False if there is none."""
+        try:
+            with open(self.file(META_FILE)) as f:
+                self.meta = json.load(f)
+            self.win_rates = np.load(self.file(WIN_RATES_FILE), mmap_mode=mode)
+            self.done = np.load(self.file(DONE_FILE), mmap_mode=mode)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def save_rows(self, start, rows):
+        # Rows first, then the done flags: a crash in between only costs a recompute
+        self.win_rates[start:start + len(rows)] = rows
+        self.win_rates.flush()
+        self.done[start:start + len(rows)] = True
+        self.done.flush()
+
+    def run(self, pokemon_csv, moves_csv, workers=None, chunk_rows=CHUNK_ROWS):
+        meta = self.meta
+        pending = [row for row in range(len(meta["names"])) if not self.done[row]]
+        if not pending:
+            print("All matchups already played.")
+            return
+        chunks = []
+        for row in pending:
+            if chunks and chunks[-1][1] == row and chunks[-1][1] - chunks[-1][0] < chunk_rows:
+                chunks[-1][1] = row + 1
+            else:
+                chunks.append([row, row + 1])
+
+        count = len(meta["names"])
+        print(f"Playing {len(pending)} of {count} host rows ({len(pending) * count:,} matchups, "
+              f"{meta['battles']} battles each) in {len(chunks)} chunks on {workers or os.cpu_count()} workers")
+        start_time = time.perf_counter()
+        rows_done = 0
+        init_args = (pokemon_csv, moves_csv, meta["battles"], meta["boosts"], meta["max_turns"], meta["seed"])
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args) as pool:
+            futures = [pool.submit(play_rows, start, stop) for start, stop in chunks]
+            for future in as_completed(futures):
+                start, rows = future.result()
+                self.save_rows(start, rows)
+                rows_done += len(rows)
+                elapsed = time.perf_counter() - start_time
+                rate = rows_done * count / elapsed
+                eta = (len(pending) - rows_done) * count / rate
+                print(f"[{rows_done}/{len(pending)} rows] {rate:,.0f} matchups/s, ETA {eta:.0f}s")
+        print(f"Done in {time.perf_counter() - start_time:.1f}s. Results in {self.path}/")
+
+    # --- Queries ---
+    def index_of(self, name):
+        folded = {n.casefold(): i for i, n in enumerate(self.meta["names"])}
+        index = folded.get(name.strip().casefold())
+        if index is None:
+            raise KeyError(name)
+        return index
+
+    def scores(self):
+        """Per species: mean win rate over all opponents, half as host and half as joiner."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning) # All-NaN rows/columns of a partial run
+            as_host = np.nanmean(self.win_rates, axis=1)
+            as_joiner = 1 - np.nanmean(self.win_rates, axis=0)
+        return (as_host + as_joiner) / 2
+
+    def matchup(self, host, joiner):
+        """Win rate of host against joiner, or None if that row was not played."""
+        rate = self.win_rates[self.index_of(host), self.index_of(joiner)]
+        return None if np.isnan(rate) else float(rate)
+
+    def opponents(self, name, limit=10):
+        """(best matchups, worst matchups) as host: lists of (opponent, win rate)."""
+        row = np.asarray(self.win_rates[self.index_of(name)])
+        played = np.flatnonzero(~np.isnan(row))
+        order = played[np.argsort(-row[played], kind='stable')]
+        names = self.meta["names"]
+        best = [(names[j], float(row[j])) for j in order[:limit]]
+        worst = [(names[j], float(row[j])) for j in order[::-1][:limit]]
+        return best, worst
+
+    def ranking(self, limit=20):
+        """(name, score) of the strongest species, best first."""
+        scores = self.scores()
+        order = np.argsort(-np.nan_to_num(scores, nan=-1.0), kind='stable')[:limit]
+        return [(self.meta["names"][i], float(scores[i])) for i in order]
+
+
+def run_command(args):
+    if np is None:
+        print("numpy is required for tournaments (pip install numpy)")
+        sys.exit(1)
+    poke = PokemonManager(args.csv, args.moves) # Compiles the shared Pokedex/move caches for the workers
+    meta = {
+        "data_hash": poke.data_hash(),
+        "battles": args.battles,
+        "boosts": args.boosts,
+        "max_turns": args.max_turns,
+        "seed": args.seed,
+        "names": list(poke.pokedex),
+    }
+
+    tournament = Tournament(args.out)
+    if not args.fresh and tournament.open('r+'):
+        if tournament.meta != meta:
+            print(f"{args.out}/ holds a tournament with different data or settings. Use --fresh to start over.")
+            sys.exit(1)
+        print(f"Resuming: {int(np.count_nonzero(tournament.done))} of {len(meta['names'])} rows already played.")
+    else:
+        tournament.create(meta)
+    tournament.run(args.csv, args.moves, args.workers, args.chunk_rows)
+
+
+def query_command(args):
+    tournament = Tournament(args.out)
+    if np is None or not tournament.open():
+        print(f"No tournament results in {args.out}/ (run: python tournament.py run)")
+        sys.exit(1)
+    played = int(np.count_nonzero(tournament.done))
+    if played < len(tournament.done):
+        print(f"Note: only {played} of {len(tournament.done)} host rows played so far.")
+
+    try:
+        names = tournament.meta["names"]
+        args.host = args.host and names[tournament.index_of(args.host)]
+        args.joiner = args.joiner and names[tournament.index_of(args.joiner)]
+        if args.host and args.joiner:
+            for host, joiner in ((args.host, args.joiner), (args.joiner, args.host)):
+                rate = tournament.matchup(host, joiner)
+                print(f"{host} (host) vs {joiner}: " + ("not played yet" if rate is None else f"{rate * 100:.1f}% win rate"))
+        elif args.host:
+            best, worst = tournament.opponents(args.host, args.top)
+            print(f"{args.host} as host. Best matchups:")
+            for name, rate in best:
+                print(f"  {name:20} {rate * 100:5.1f}%")
+            print("Worst matchups:")
+            for name, rate in worst:
+                print(f"  {name:20} {rate * 100:5.1f}%")
+        else:
+            for rank, (name, score) in enumerate(tournament.ranking(args.top), 1):
+                print(f"{rank:3}. {name:20} {score * 100:5.1f}%")
+    except KeyError as e:
+        print(f"Unknown Pokemon: {e.args[0]}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-robin tournament over the whole Pokedex")
+    parser.add_argument('--out', default=TOURNAMENT_DIR, help='Results directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help='Play (or resume) the tournament')
+    run.add_argument('--battles', type=int, default=100, help='Battles per matchup')
+    run.add_argument('--boosts', type=int, default=0, help='Sp. Atk boosts for both sides')
+    run.add_argument('--max-turns', type=int, default=MAX_TURNS, help='Attacks before a battle counts as a draw')
+    run.add_argument('--seed', type=int, default=0, help='RNG seed (results are reproducible per seed)')
+    run.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    run.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Host rows per work unit')
+    run.add_argument('--fresh', action='store_true', help='Discard existing results instead of resuming')
+    run.add_argument('--csv', default='pokemon.csv', help='Pokemon CSV')
+    run.add_argument('--moves', default='moves.csv', help='Move CSV')
+    run.set_defaults(handler=run_command)
+
+    query = commands.add_parser('query', help='Overall ranking, one species\' matchups, or one matchup')
+    query.add_argument('host', nargs='?', help='Pokemon (as host)')
+    query.add_argument('joiner', nargs='?', help='Opponent')
+    query.add_argument('--top', type=int, default=20, help='Entries to list')
+    query.set_defaults(handler=query_command)
+
+    args = parser.parse_args()
+    if args.command == 'run' and args.battles < 1:
+        run.error("--battles must be at least 1")
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import time
+import constants
+
+ANY_STATE = "*" # Row applies in every state (unless a state-specific row exists)
+
+
+class TransitionTable:
+    """
+    Declarative (state, message type) -> handler table.
+
+    Dispatch is a dict lookup. Messages with no row for the current state
+    are rejected instead of silently falling through. Every transition
+    keeps a count and the total time spent in its handler.
+    """
+    def __init__(self):
+        self.handlers = {}  # (state, msg_type) -> handler(message)
+        self.stats = {}     # (state, msg_type) -> [count, total_seconds]
+        self.rejected = {}  # (state, msg_type) -> count
+
+    def add(self, states, msg_type, handler):
+        """Registers handler for msg_type in each of the given states (or ANY_STATE)."""
+        if isinstance(states, str):
+            states = [states]
+        for state in states:
+            self.handlers[(state, msg_type)] = handler
+            self.stats.setdefault((state, msg_type), [0, 0.0])
+
+    def dispatch(self, state, message):
+        """
+        Runs the handler for (state, message type).
+        Returns False if the message is not allowed in this state.
+        """
+        msg_type = message.get(constants.KEY_MSG_TYPE)
+        key = (state, msg_type)
+        handler = self.handlers.get(key)
+        if handler is None:
+            key = (ANY_STATE, msg_type)
+            handler = self.handlers.get(key)
+
+        if handler is None:
+            rejected_key = (state, msg_type)
+            self.rejected[rejected_key] = self.rejected.get(rejected_key, 0) + 1
+            print(f"[Engine] Rejected {msg_type} in state {state}.")
+            return False
+
+        start = time.perf_counter()
+        try:
+            handler(message)
+        finally:
+            entry = self.stats[key]
+            entry[0] += 1
+            entry[1] += time.perf_counter() - start
+        return True
+
+    def snapshot(self):
+        """Per-transition counters and timings, e.g. for logging or a metrics page."""
+        rows = []
+        for (state, msg_type), (count, total) in sorted(self.stats.items()):
+            if count:
+                rows.append({
+                    "state": state,
+                    "message_type": msg_type,
+                    "count": count,
+                    "total_seconds": total,
+                    "avg_seconds": total / count
+                })
+        for (state, msg_type), count in sorted(self.rejected.items()):
+            rows.append({"state": state, "message_type": msg_type, "rejected": count})
+        return rows
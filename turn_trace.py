@@ -0,0 +1,118 @@
+import json
+import collections
+
+import constants
+from clock import SystemClock
+
+TRACE_CAPACITY = 256 # Turns kept in the ring buffer
+
+ATTACKER, DEFENDER = "attacker", "defender"
+
+
+class TurnTracer:
+    """
+    Per-turn timing spans.
+
+    A span opens when we announce an attack (attacker) or receive one
+    (defender) and closes when the turn ends. In between it records a
+    monotonic timestamp for every reliable message sent and every message
+    received, the time the engine spent handling them, and how many
+    retransmits and RESOLUTION_REQUEST rounds the turn needed. Finished
+    spans go into a ring buffer of the last `capacity` turns.
+
+    Tracing is off unless a tracer is attached: the engine and the
+    NetworkManager only test `self.tracer` at each hook.
+    """
+    def __init__(self, capacity=TRACE_CAPACITY, clock=None):
+        self.clock = clock if clock is not None else SystemClock()
+        self.spans = collections.deque(maxlen=capacity)
+        self.current = None  # Open span, or None between turns
+        self.handling = None # (span, start) of the message being handled
+
+    def attach(self, engine):
+        """Turns tracing on for an engine and its NetworkManager."""
+        engine.tracer = self
+        engine.network_manager.tracer = self
+
+    def begin(self, turn, role, move=None, fast=False):
+        if self.current is not None:
+            self.end("unfinished")
+        self.current = {"turn": turn, "role": role, "move": move, "fast": fast, "start": self.clock.monotonic(),
+                        "events": [], "engine": 0.0, "retransmits": 0, "resolutions": 0, "end": None, "outcome": None}
+
+    def end(self, outcome="confirmed"):
+        span = self.current
+        if span is None:
+            return
+        span["end"] = self.clock.monotonic()
+        span["outcome"] = outcome
+        self.spans.append(span)
+        self.current = None
+
+    def sent(self, message_type):
+        span = self.current
+        if span is not None:
+            span["events"].append((self.clock.monotonic(), "sent", message_type))
+            if message_type == constants.MSG_RESOLUTION_REQUEST:
+                span["resolutions"] += 1
+
+    def received(self, message_type, turn):
+        """Called before the engine handles a message; an ATTACK_ANNOUNCE opens the defender's span."""
+        now = self.clock.monotonic()
+        if message_type == constants.MSG_ATTACK_ANNOUNCE: # A spectator's previous span never ends, so always start anew
+            self.begin(turn, DEFENDER)
+        span = self.current
+        if span is not None:
+            span["events"].append((now, "received", message_type))
+            if message_type == constants.MSG_RESOLUTION_REQUEST:
+                span["resolutions"] += 1
+        self.handling = (span, now)
+
+    def handled(self):
+        """Called after the engine handled a message. The span may have closed meanwhile, it still gets the time."""
+        span, start = self.handling
+        if span is not None:
+            span["engine"] += self.clock.monotonic() - start
+        self.handling = None
+
+    def retransmit(self):
+        if self.current is not None:
+            self.current["retransmits"] += 1
+
+    def export(self):
+        """Finished spans, oldest first, with times in milliseconds from the start of the turn."""
+        traces = []
+        for span in self.spans:
+            start = span["start"]
+            traces.append({
+                "turn": span["turn"],
+                "role": span["role"],
+                "move": span["move"],
+                "fast": span["fast"],
+                "outcome": span["outcome"],
+                "duration_ms": (span["end"] - start) * 1000,
+                "engine_ms": span["engine"] * 1000,
+                "retransmits": span["retransmits"],
+                "resolutions": span["resolutions"],
+                "events": [{"t_ms": (t - start) * 1000, "event": event, "message_type": message_type}
+                           for t, event, message_type in span["events"]],
+            })
+        return traces
+
+    def dump(self, path):
+        """Writes export() as JSON. Returns the number of turns written."""
+        traces = self.export()
+        with open(path, "w") as f:
+            json.dump({"turns": traces}, f, indent=2)
+        return len(traces)
+
+    def summary(self):
+        """One line per finished turn, for the CLI."""
+        lines = []
+        for trace in self.export():
+            stages = " -> ".join(f"{'>' if e['event'] == 'sent' else '<'}{e['message_type']} {e['t_ms']:.1f}"
+                                 for e in trace["events"])
+            lines.append(f"Turn {trace['turn']} ({trace['role']}, {trace['outcome']}): {trace['duration_ms']:.1f} ms, "
+                         f"engine {trace['engine_ms']:.2f} ms, {trace['retransmits']} retransmits, "
+                         f"{trace['resolutions']} resolutions | {stages}")
+        return lines
@@ -1,11 +1,11 @@
 import sys
 import io
 import json
-import time
 import threading
 import socket
 import argparse
-from flask import Flask, jsonify, request
+import collections
+from flask import Flask, Response, jsonify, request
 from flask_socketio import SocketIO, emit
 
 # Import existing modules
@@ -13,6 +13,25 @@ import constants
 from network_manager import NetworkManager
 from pokemon_manager import PokemonManager
 from game_engine import GameEngine
+from clock import SystemClock
+from recommender import MoveRecommender, COUNTER_PICKS_CACHE_SIZE
+from bot import BotPlayer, BOT_BOOSTS
+from pokedex_query import QUERY_COLUMNS
+from turn_trace import TurnTracer
+from metrics import ProtocolMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from profiler import SamplingProfiler, parse_seconds
+import memory
+
+# Picker page size for /pokemon_query
+QUERY_PAGE_SIZE = 50
+QUERY_MAX_PAGE_SIZE = 200
+
+# Admin requests (profiling, memory) are only accepted from these addresses unless --admin-remote
+ADMIN_ADDRESSES = ('127.0.0.1', '::1')
+
+# Log lines waiting for the game loop to emit them; past this the oldest are dropped
+LOG_BACKLOG = 1000
+LOG_LINE_MAX = 2000 # Characters of one log line sent to the browser
 
 # ===================== HTML Template =====================
 # Embedded HTML/CSS/JS as requested (Single file style)
@@ -108,7 +127,24 @@ HTML_TEMPLATE = """<!doctype html>
       <div class="card grow" id="card-pokemon">
         <h2>Pokemon</h2>
         <input id="search" placeholder="Search..." oninput="filterPokemon()">
+        <div style="display:flex; gap:5px;">
+            <select id="filter-type" onchange="filterPokemon()"><option value="">Any type</option></select>
+            <select id="filter-gen" onchange="filterPokemon()"><option value="">Any gen</option></select>
+            <select id="filter-legendary" onchange="filterPokemon()">
+                <option value="">All</option><option value="1">Legendary</option><option value="0">Non-legendary</option>
+            </select>
+        </div>
+        <div style="display:flex; gap:5px;">
+            <select id="sort" onchange="filterPokemon()">
+                <option value="number">No.</option><option value="name">Name</option><option value="base_total">Total</option>
+                <option value="hp">HP</option><option value="attack">Attack</option><option value="defense">Defense</option>
+                <option value="sp_atk">Sp.Atk</option><option value="sp_def">Sp.Def</option><option value="speed">Speed</option>
+            </select>
+            <select id="order" onchange="filterPokemon()"><option value="asc">Asc</option><option value="desc">Desc</option></select>
+        </div>
         <div class="pokemon-list" id="pokemon-list"></div>
+        <div id="counter-picks" class="hidden" style="font-size: 12px; margin-top: 5px;"></div>
+        <button onclick="loadMorePokemon()" class="secondary hidden" id="btn-more">Load more</button>
         <div style="margin-top: 5px;">
             <label><small>Sp.Atk Boosts:</small> <input type="number" id="boost-atk" value="0" min="0" max="10" style="width: 40px;"></label>
             <label><small>Sp.Def Boosts:</small> <input type="number" id="boost-def" value="0" min="0" max="10" style="width: 40px;"></label>
@@ -145,7 +181,7 @@ HTML_TEMPLATE = """<!doctype html>
 
       <div class="card">
         <h2>Actions</h2>
-        <div class="controls-grid">
+        <div class="controls-grid" id="move-buttons">
             <button onclick="attack('Thunderbolt')">Thunderbolt</button>
             <button onclick="attack('Flamethrower')">Flamethrower</button>
             <button onclick="attack('Surf')">Surf</button>
@@ -155,7 +191,7 @@ HTML_TEMPLATE = """<!doctype html>
             <button onclick="attack('Ice Beam')">Ice Beam</button>
             <button onclick="attack('Psychic')">Psychic</button>
         </div>
-        <label style="margin-top: 5px;"><input type="checkbox" id="use-boost"> Use Boost</label>
+        <label style="margin-top: 5px;"><input type="checkbox" id="use-boost" onchange="refreshMoves()"> Use Boost</label>
       </div>
     </div>
 
@@ -182,7 +218,11 @@ HTML_TEMPLATE = """<!doctype html>
 
   <script>
     const socket = io();
-    let pokemonList = [];
+    const TYPES = ['Bug', 'Dark', 'Dragon', 'Electric', 'Fairy', 'Fighting', 'Fire', 'Flying', 'Ghost',
+                   'Grass', 'Ground', 'Ice', 'Normal', 'Poison', 'Psychic', 'Rock', 'Steel', 'Water'];
+    let pokemonPage = { total: 0, loaded: 0 };
+    let queryId = 0; // Ignore responses to superseded queries
+    let recommendKey = null; // Battle state the move buttons were last ranked for
     let selectedPokemon = null;
 
     // --- Socket Events ---
@@ -214,7 +254,14 @@ HTML_TEMPLATE = """<!doctype html>
         
         updateHp('my-hp', 'my-hp-text', data.my_hp, data.my_max_hp);
         updateHp('opp-hp', 'opp-hp-text', data.opp_hp, data.opp_max_hp);
-        
+
+        // Re-rank moves / counter-picks only when the matchup or HP changed
+        const key = [data.my_name, data.opp_name, data.my_hp, data.opp_hp].join('|');
+        if (key !== recommendKey && data.state !== 'GAME_OVER') {
+            recommendKey = key;
+            refreshMoves();
+        }
+
         if (data.state === 'GAME_OVER') {
             document.getElementById('game-over-modal').classList.add('show');
             document.getElementById('winner-text').innerText = `Game Over! Winner: ${data.winner || 'Unknown'}`;
@@ -274,17 +321,59 @@ HTML_TEMPLATE = """<!doctype html>
     }
 
     function loadPokemon() {
-        fetch('/pokemon_list').then(r => r.json()).then(data => {
-            pokemonList = data;
-            filterPokemon();
-        });
+        const typeSelect = document.getElementById('filter-type');
+        if (typeSelect.options.length === 1) {
+            TYPES.forEach(t => typeSelect.add(new Option(t, t)));
+            for (let g = 1; g <= 7; g++) document.getElementById('filter-gen').add(new Option('Gen ' + g, g));
+        }
+        filterPokemon();
+    }
+
+    function pokemonQuery(offset) {
+        const params = new URLSearchParams({ offset, sort: document.getElementById('sort').value,
+                                             order: document.getElementById('order').value });
+        const fields = { q: 'search', type: 'filter-type', generation: 'filter-gen', legendary: 'filter-legendary' };
+        for (const [param, id] of Object.entries(fields)) {
+            const value = document.getElementById(id).value.trim();
+            if (value) params.set(param, value);
+        }
+        return '/pokemon_query?' + params;
     }
 
     function filterPokemon() {
-        const q = document.getElementById('search').value.toLowerCase();
+        const id = ++queryId;
+        const q = document.getElementById('search').value.trim();
+        fetch(pokemonQuery(0)).then(r => r.json()).then(data => {
+            if (id !== queryId) return;
+            if (data.total === 0 && q) {
+                // No prefix match: fall back to typo-tolerant suggestions
+                fetch('/pokemon_search?q=' + encodeURIComponent(q)).then(r => r.json()).then(names => {
+                    if (id === queryId) showPokemonPage({ total: names.length, results: names.map(name => ({ name })) }, false);
+                });
+                return;
+            }
+            showPokemonPage(data, false);
+        });
+    }
+
+    function loadMorePokemon() {
+        const id = queryId;
+        fetch(pokemonQuery(pokemonPage.loaded)).then(r => r.json()).then(data => {
+            if (id === queryId) showPokemonPage(data, true);
+        });
+    }
+
+    function showPokemonPage(data, append) {
+        pokemonPage.total = data.total;
+        pokemonPage.loaded = (append ? pokemonPage.loaded : 0) + data.results.length;
+        renderPokemon(data.results.map(p => p.name), append);
+        document.getElementById('btn-more').classList.toggle('hidden', pokemonPage.loaded >= pokemonPage.total);
+    }
+
+    function renderPokemon(names, append=false) {
         const list = document.getElementById('pokemon-list');
-        list.innerHTML = '';
-        pokemonList.filter(p => p.toLowerCase().includes(q)).forEach(p => {
+        if (!append) list.innerHTML = '';
+        names.forEach(p => {
             const div = document.createElement('div');
             div.className = 'pokemon-item';
             div.innerText = p;
@@ -306,10 +395,51 @@ HTML_TEMPLATE = """<!doctype html>
         socket.emit('select_pokemon', { name: selectedPokemon, sp_atk: atk, sp_def: def });
     }
 
+    function refreshMoves() {
+        const boost = document.getElementById('use-boost').checked ? 1 : 0;
+        fetch('/recommend?boost=' + boost).then(r => r.json()).then(data => {
+            if (data.moves) renderMoves(data.moves);
+            renderCounterPicks(data.opponent, data.counter_picks || []);
+        });
+    }
+
+    function renderMoves(moves) {
+        const grid = document.getElementById('move-buttons');
+        grid.innerHTML = '';
+        moves.forEach((m, i) => {
+            const button = document.createElement('button');
+            if (i === 0) button.className = 'primary';
+            button.innerHTML = `${m.move}<br><small>${m.min}-${m.max} dmg, KO ${Math.round(m.ko_chance * 100)}%</small>`;
+            button.title = `${m.type} ${m.category}, power ${m.power}, avg ${m.expected.toFixed(1)}`;
+            button.onclick = () => attack(m.move);
+            grid.appendChild(button);
+        });
+    }
+
+    function renderCounterPicks(opponent, picks) {
+        const box = document.getElementById('counter-picks');
+        box.classList.toggle('hidden', picks.length === 0);
+        box.innerHTML = '';
+        if (!picks.length) return;
+        box.appendChild(document.createTextNode(`Counters vs ${opponent}:`));
+        picks.forEach(p => {
+            const div = document.createElement('div');
+            div.className = 'pokemon-item';
+            div.innerText = `${p.pokemon} (${p.move}, KO in ${p.hits_to_ko})`;
+            div.onclick = () => {
+                selectedPokemon = p.pokemon;
+                document.getElementById('btn-select').disabled = false;
+                document.getElementById('btn-select').innerText = `Select ${p.pokemon}`;
+            };
+            box.appendChild(div);
+        });
+    }
+
     function attack(move) {
         const boost = document.getElementById('use-boost').checked;
         socket.emit('attack', { move, boost });
         document.getElementById('use-boost').checked = false;
+        refreshMoves();
     }
 
     function sendChat() {
@@ -363,16 +493,28 @@ class StreamLogger(io.StringIO):
         self.original_stdout.flush()
 
 class WebGameClient:
-    def __init__(self, socketio):
+    def __init__(self, socketio, clock=None):
         self.socketio = socketio
+        self.clock = clock if clock is not None else SystemClock()
         self.net = None
         self.poke = PokemonManager("pokemon.csv")
+        self.recommender = MoveRecommender(self.poke)
         self.engine = None
         self.running = False
         self.player_name = "Player"
         self.is_spectator = False
         
         self.port = 0
+        self.capture_path = None # Set before initialize() to record datagrams
+        self.fast_turn = False # Offer/accept fast-turn mode in the handshake
+        self.bot = None # BotPlayer for the headless bot roles
+        self.tracer = None # TurnTracer when started with --trace, kept across games
+        self.metrics = ProtocolMetrics(self.clock) # Served at /metrics; None (--no-metrics) turns counting off
+        self.profiler = SamplingProfiler() # On-demand, see /admin/profile
+        self.last_profile = None # {'files': [...], 'summary': str} of the last finished profile
+        self.admin_remote = False # Accept admin requests from any address
+        self.log_backlog = collections.deque(maxlen=LOG_BACKLOG) # Printed lines the game loop emits
+        self.logs_dropped = 0
         
         # Capture stdout
         sys.stdout = StreamLogger(self.log_emit, sys.stdout)
@@ -382,7 +524,20 @@ class WebGameClient:
         self.bg_thread.start()
 
     def log_emit(self, msg):
-        self.socketio.emit('game_log', {'message': msg})
+        # Queued, not emitted here: printing from the listener thread must not wait
+        # on the browsers, and a burst of prints can only hold LOG_BACKLOG lines
+        if len(self.log_backlog) == LOG_BACKLOG:
+            self.logs_dropped += 1
+        if len(msg) > LOG_LINE_MAX:
+            msg = msg[:LOG_LINE_MAX] + f"... ({len(msg) - LOG_LINE_MAX} more characters)"
+        self.log_backlog.append(msg)
+
+    def emit_logs(self):
+        if self.logs_dropped:
+            dropped, self.logs_dropped = self.logs_dropped, 0
+            self.socketio.emit('game_log', {'message': f"[LOG] {dropped} lines dropped (backlog full)"})
+        while self.log_backlog:
+            self.socketio.emit('game_log', {'message': self.log_backlog.popleft()})
 
     def initialize(self, name, port):
         port = int(port)
@@ -393,18 +548,14 @@ class WebGameClient:
                 return
             else:
                 print(f"Re-initializing on new port {port} (Old: {self.port})...")
-                # Ideally we should close the old socket, but NetworkManager doesn't have a close method exposed cleanly.
-                # We will just overwrite self.net, the old thread might persist but won't be referenced.
-                # This is a hack for the prototype.
-                try:
-                    self.net.sock.close()
-                except: pass
+                # Closing the socket also ends the old listener thread.
+                self.net.close()
 
         self.player_name = name
         self.port = port
         try:
-            self.net = NetworkManager(port=self.port)
-            self.engine = GameEngine(self.poke, self.net)
+            self.net = NetworkManager(port=self.port, clock=self.clock, capture_path=self.capture_path)
+            self.engine = self.new_engine()
             self.running = True
             print(f"Initialized {name} on port {port}")
         except OSError as e:
@@ -412,10 +563,20 @@ class WebGameClient:
             self.running = False
             self.net = None
 
+    def new_engine(self):
+        engine = GameEngine(self.poke, self.net)
+        engine.offer_fast_turn = self.fast_turn
+        engine.chat_listener = self.on_chat
+        if self.tracer:
+            self.tracer.attach(engine)
+        if self.metrics:
+            self.metrics.attach(engine)
+        return engine
+
     def host_game(self):
         print("Hosting game... Waiting for connections.")
         self.net.reset_connection()
-        self.engine = GameEngine(self.poke, self.net)
+        self.engine = self.new_engine()
         self.net.send_broadcast(constants.MSG_BATTLE_SETUP, {
             "communication_mode": "BROADCAST",
             "status": "OPEN",
@@ -429,13 +590,19 @@ class WebGameClient:
         print(f"Connecting to {ip}:{port} as {role}...")
         
         self.net.reset_connection()
-        self.engine = GameEngine(self.poke, self.net)
+        self.engine = self.new_engine()
+        
+        if spectator:
+            self.engine.start_spectating()
         
         self.net.set_peer(ip)
         self.net.peer_address = (ip, int(port))
         
         msg_type = constants.MSG_SPECTATOR_REQUEST if spectator else constants.MSG_HANDSHAKE_REQUEST
-        self.net.send_reliable(msg_type, {constants.KEY_SENDER: self.player_name})
+        payload = {constants.KEY_SENDER: self.player_name}
+        if self.fast_turn and not spectator:
+            payload[constants.KEY_FAST_TURN] = 1
+        self.net.send_reliable(msg_type, payload)
 
     def select_pokemon(self, name, sp_atk, sp_def):
         if self.is_spectator: return
@@ -450,12 +617,42 @@ class WebGameClient:
         self.net.send_reliable(constants.MSG_BATTLE_SETUP, {
             constants.KEY_POKEMON_NAME: name,
             constants.KEY_STAT_BOOSTS: json.dumps(boosts),
-            constants.KEY_POKEMON_DATA: json.dumps(data),
+            constants.KEY_POKEMON_DATA: json.dumps(data.to_dict()),
             constants.KEY_COMM_MODE: constants.MODE_P2P
         })
         
         self.check_start()
 
+    def bot_step(self):
+        """Headless roles: pick once the handshake is done, then play every turn."""
+        if self.engine.seed is not None and self.engine.my_pokemon is None:
+            name = self.bot.choose_pokemon(self.engine.opponent_pokemon, self.engine.is_host)
+            self.select_pokemon(name, *self.bot.boosts)
+        else:
+            self.bot.step(self.engine)
+
+    def start_profile(self, seconds):
+        """Profiles every thread for `seconds` in the background. False if one is already running."""
+        return self.profiler.start(seconds, self.finish_profile)
+
+    def finish_profile(self, profiler):
+        files = profiler.write()
+        self.last_profile = {'files': list(files), 'samples': profiler.samples, 'summary': profiler.summary()}
+        print(f"[PROFILE] {profiler.samples} samples written to {', '.join(files)}")
+        self.socketio.emit('profile_done', self.last_profile)
+
+    def memory_report(self):
+        """Structure sizes (the network's plus the client's own caches) and tracemalloc, see memory.py."""
+        extra = {
+            'log_backlog': (self.log_backlog, LOG_BACKLOG),
+            'counter_picks_cache': (self.recommender.counter_picks_cache, COUNTER_PICKS_CACHE_SIZE),
+            'pre_roll_damage': (self.poke.pre_roll_damage, None),
+            'profile_stacks': (self.profiler.stacks, None),
+        }
+        if self.tracer:
+            extra['trace_spans'] = (self.tracer.spans, self.tracer.spans.maxlen)
+        return memory.memory_report(self.net, extra)
+
     def attack(self, move, boost):
         if self.is_spectator: return
         self.engine.select_move(move, boost)
@@ -469,6 +666,9 @@ class WebGameClient:
         print(f"[YOU]: {msg}")
 
     def send_sticker(self, b64_data):
+        if len(b64_data) > constants.MAX_STICKER_BYTES:
+            print(f"Sticker too large to send ({len(b64_data)} bytes, at most {constants.MAX_STICKER_BYTES}).")
+            return
         self.net.send_reliable(constants.MSG_CHAT_MESSAGE, {
             constants.KEY_SENDER: self.player_name,
             constants.KEY_CONTENT_TYPE: constants.CONTENT_TYPE_STICKER,
@@ -495,47 +695,20 @@ class WebGameClient:
                 # 2. Resend
                 self.net.check_resend()
                 
-                # 3. Emit State Update
+                # 3. Let the bot pick/move
+                if self.bot and self.engine:
+                    self.bot_step()
+
+                # 4. Emit State Update
                 self.emit_state()
-                
-            time.sleep(0.05)
+
+            self.emit_logs()
+            self.clock.sleep(0.05)
 
     def handle_message(self, msg):
         msg_type = msg.get(constants.KEY_MSG_TYPE)
-        
-        # Handshake Logic (Simplified from main.py)
-        if msg_type == constants.MSG_HANDSHAKE_REQUEST:
-            if self.engine.is_host:
-                self.net.peer_address = msg.get('source_addr')
-                seed = 12345 # Fixed seed for simplicity or random
-                self.engine.seed = seed
-                self.net.send_reliable(constants.MSG_HANDSHAKE_RESPONSE, {
-                    constants.KEY_SEED: seed, "status": "OK"
-                })
-                print(f"Client connected from {self.net.peer_address}")
-
-        elif msg_type == constants.MSG_HANDSHAKE_RESPONSE:
-            self.engine.seed = int(msg.get(constants.KEY_SEED))
-            print("Connected to Host!")
-
-        elif msg_type == constants.MSG_SPECTATOR_REQUEST:
-            self.net.add_spectator(msg.get('source_addr'))
-            print(f"Spectator added: {msg.get('source_addr')}")
-
-        elif msg_type == constants.MSG_CHAT_MESSAGE:
-            sender = msg.get(constants.KEY_SENDER)
-            ctype = msg.get(constants.KEY_CONTENT_TYPE)
-            
-            if ctype == constants.CONTENT_TYPE_STICKER:
-                print(f"[{sender}]: [Sticker]")
-                self.socketio.emit('chat_sticker', {'sender': sender, 'data': msg.get('sticker_data')})
-            else:
-                print(f"[{sender}]: {msg.get(constants.KEY_MSG_TEXT)}")
-            
-            if self.engine.is_host: # Relay
-                self.relay_chat(msg)
 
-        # Relay Game Messages if Host
+        # Relay Game Messages if Host (chat is relayed by the engine)
         if self.engine.is_host and msg_type in [
             constants.MSG_BATTLE_SETUP,
             constants.MSG_ATTACK_ANNOUNCE,
@@ -545,43 +718,51 @@ class WebGameClient:
             constants.MSG_GAME_OVER,
             constants.MSG_RESOLUTION_REQUEST
         ]:
-            self.relay_chat(msg)
+            self.relay_game_message(msg)
 
-        # Engine Logic
+        # Engine Logic (handshake, chat and battle share one transition table)
         self.engine.process_message(msg)
         
         # Check start after setup
         if msg_type == constants.MSG_BATTLE_SETUP:
             self.check_start()
 
-    def relay_chat(self, msg):
-        # Simplified relay
+    def on_chat(self, msg):
+        """Chat hook from the engine: stickers are shown in the GUI."""
+        if msg.get(constants.KEY_CONTENT_TYPE) == constants.CONTENT_TYPE_STICKER:
+            self.socketio.emit('chat_sticker', {
+                'sender': msg.get(constants.KEY_SENDER),
+                'data': msg.get(constants.KEY_STICKER_DATA)
+            })
+
+    def relay_game_message(self, msg):
+        # Simplified relay to spectators
         source = msg.get('source_addr')
         data = {k:v for k,v in msg.items() if k not in ['source_addr', constants.KEY_SEQ_NUM]}
         packet = self.net.construct_message(constants.MSG_CHAT_MESSAGE, data)
         
         # Send to peer if not source
         if self.net.peer_address and source != self.net.peer_address:
-            self.net.sock.sendto(packet, self.net.peer_address)
+            self.net.send_packet(packet, self.net.peer_address)
         
         # Send to spectators
         for spec in self.net.spectators:
             if spec != source:
-                self.net.sock.sendto(packet, spec)
+                self.net.send_packet(packet, spec)
 
     def emit_state(self):
         # Send vital stats to UI
         if self.engine and self.engine.my_pokemon:
-            my_hp = self.engine.my_pokemon.get('hp', 0)
-            my_max = self.engine.my_pokemon.get('max_hp', my_hp)
-            my_name = self.engine.my_pokemon.get('name', '???')
+            my_hp = self.engine.my_pokemon.hp
+            my_max = self.engine.my_pokemon.max_hp
+            my_name = self.engine.my_pokemon.name
         else:
             my_hp, my_max, my_name = 0, 0, '???'
             
         if self.engine and self.engine.opponent_pokemon:
-            opp_hp = self.engine.opponent_pokemon.get('hp', 0)
-            opp_max = self.engine.opponent_pokemon.get('max_hp', opp_hp)
-            opp_name = self.engine.opponent_pokemon.get('name', '???')
+            opp_hp = self.engine.opponent_pokemon.hp
+            opp_max = self.engine.opponent_pokemon.max_hp
+            opp_name = self.engine.opponent_pokemon.name
         else:
             opp_hp, opp_max, opp_name = 0, 0, '???'
 
@@ -618,6 +799,149 @@ def index():
 def get_pokemon():
     return jsonify(sorted(list(client.poke.pokedex.keys())))
 
+@app.route('/pokemon_search')
+def search_pokemon():
+    query = request.args.get('q', '')
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(client.poke.suggest_pokemon(query, limit))
+
+@app.route('/pokemon_query')
+def query_pokemon():
+    """
+    One page of the Pokedex, filtered and sorted. Parameters (all optional):
+    type (repeatable, all must match), generation (repeatable, any), legendary=1/0,
+    min_<column>/max_<column>, q (name prefix), sort, order=asc/desc, offset, limit.
+    """
+    args = request.args
+    try:
+        ranges = {}
+        for column in QUERY_COLUMNS:
+            low, high = args.get('min_' + column), args.get('max_' + column)
+            if low or high:
+                ranges[column] = (int(low) if low else None, int(high) if high else None)
+        legendary = args.get('legendary', '')
+        offset = max(int(args.get('offset', 0)), 0)
+        limit = min(max(int(args.get('limit', QUERY_PAGE_SIZE)), 1), QUERY_MAX_PAGE_SIZE)
+        total, names = client.poke.query(
+            types=[t for t in args.getlist('type') if t],
+            generations=[int(g) for g in args.getlist('generation') if g],
+            legendary=None if legendary == '' else legendary == '1',
+            ranges=ranges,
+            name_prefix=args.get('q'),
+            sort=args.get('sort', 'number'),
+            descending=args.get('order') == 'desc',
+            offset=offset, limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = []
+    for name in names:
+        data = client.poke.get_pokemon(name)
+        generation, is_legendary, base_total = client.poke.profiles[name]
+        results.append({'name': name, 'type1': data.type1, 'type2': data.type2, 'generation': generation,
+                        'legendary': is_legendary, 'base_total': base_total})
+    return jsonify({'total': total, 'offset': offset, 'limit': limit, 'results': results})
+
+@app.route('/recommend')
+def recommend():
+    """
+    Move ranking against the current opponent (boost=1 ranks boosted damage if
+    boosts are left), or counter-picks while we haven't picked yet. opponent=Name
+    asks for counter-picks against any Pokemon.
+    """
+    engine = client.engine
+    try:
+        limit = min(max(int(request.args.get('limit', 8)), 1), 50)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    me = engine.my_pokemon if engine else None
+    opponent = engine.opponent_pokemon if engine else None
+    if request.args.get('opponent'):
+        name = client.poke.resolve_name(request.args['opponent'])
+        if name is None:
+            return jsonify({'error': f"Unknown Pokemon: {request.args['opponent']}"}), 404
+        return jsonify({'opponent': name, 'counter_picks': client.recommender.counter_picks(name, limit, engine.is_host if engine else False)})
+    if me and opponent:
+        use_boost = request.args.get('boost') == '1' and me.sp_atk_boosts > 0
+        return jsonify({'opponent': opponent.name, 'boosts_left': me.sp_atk_boosts,
+                        'moves': client.recommender.rank_moves(me.name, opponent.name, opponent.hp, use_boost, limit)})
+    if opponent:
+        return jsonify({'opponent': opponent.name, 'counter_picks': client.recommender.counter_picks(opponent.name, 5, engine.is_host)})
+    return jsonify({})
+
+@app.route('/damage_preview')
+def damage_preview():
+    """Min/max damage of each learnable move against the current opponent."""
+    engine = client.engine
+    if not engine or not engine.my_pokemon or not engine.opponent_pokemon:
+        return jsonify({})
+    attacker = engine.my_pokemon.name
+    defender = engine.opponent_pokemon.name
+    preview = {}
+    for move in client.poke.learnset(attacker):
+        normal = client.poke.damage_range(attacker, defender, move)
+        boosted = client.poke.damage_range(attacker, defender, move, use_atk_boost=True)
+        if normal:
+            preview[move] = {'min': normal[0], 'max': normal[1], 'boosted_min': boosted[0], 'boosted_max': boosted[1]}
+    return jsonify(preview)
+
+@app.route('/metrics')
+def metrics():
+    """Protocol counters and histograms in the Prometheus text format."""
+    if client.metrics is None:
+        return Response("# metrics disabled (--no-metrics)\n", mimetype='text/plain')
+    return Response(client.metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+def is_admin_request():
+    return client.admin_remote or request.remote_addr in ADMIN_ADDRESSES
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """
+    POST ?seconds=N starts profiling all threads (answer 202, the battle keeps
+    running); GET reports whether one is running and the last result.
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Admin requests are only accepted from localhost'}), 403
+    if request.method == 'GET':
+        return jsonify({'running': client.profiler.running(), 'last': client.last_profile})
+    try:
+        seconds = parse_seconds(request.args.get('seconds', 10))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not client.start_profile(seconds):
+        return jsonify({'error': 'A profile is already running'}), 409
+    return jsonify({'started': True, 'seconds': seconds}), 202
+
+@app.route('/admin/memory', methods=['GET', 'POST'])
+def admin_memory():
+    """
+    GET reports process memory and the sizes of the structures that grow with
+    uptime; POST ?tracemalloc=start|stop turns allocation tracing on or off
+    first (while on, the report lists the top allocation sites).
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Admin requests are only accepted from localhost'}), 403
+    if request.method == 'POST':
+        action = request.args.get('tracemalloc')
+        if action == 'start':
+            memory.start_tracing()
+        elif action == 'stop':
+            memory.stop_tracing()
+        else:
+            return jsonify({'error': 'tracemalloc must be start or stop'}), 400
+    return jsonify(client.memory_report())
+
+@app.route('/trace')
+def trace():
+    """Per-turn timing spans of the last turns (start with --trace to record them)."""
+    if client.tracer is None:
+        return jsonify({'enabled': False, 'turns': []})
+    return jsonify({'enabled': True, 'turns': client.tracer.export()})
+
 @socketio.on('init_game')
 def on_init(data):
     client.initialize(data['name'], data['port'])
@@ -648,20 +972,50 @@ def on_attack(data):
 def on_chat(data):
     client.send_chat(data['message'])
 
+@socketio.on('admin_profile')
+def on_admin_profile(data):
+    if not is_admin_request():
+        emit('profile_error', {'error': 'Admin requests are only accepted from localhost'})
+        return
+    try:
+        seconds = parse_seconds((data or {}).get('seconds', 10))
+    except ValueError as e:
+        emit('profile_error', {'error': str(e)})
+        return
+    if client.start_profile(seconds):
+        emit('profile_started', {'seconds': seconds})
+    else:
+        emit('profile_error', {'error': 'A profile is already running'})
+
 @socketio.on('sticker')
 def on_sticker(data):
     client.send_sticker(data['data'])
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Pokemon P2P Web GUI")
-    parser.add_argument('--role', choices=['host', 'joiner', 'spectator'], help='Role to start as')
+    parser.add_argument('--role', choices=['host', 'joiner', 'spectator', 'bot-host', 'bot-joiner'],
+                        help='Role to start as (bot-* play one battle headless, without the web server)')
     parser.add_argument('--udp-port', type=int, default=5000, help='Local UDP port')
     parser.add_argument('--http-port', type=int, default=5000, help='Web GUI port')
     parser.add_argument('--host-ip', type=str, default='127.0.0.1', help='Target Host IP')
     parser.add_argument('--host-port', type=int, default=5000, help='Target Host UDP Port')
     parser.add_argument('--name', type=str, default='Player', help='Player Name')
+    parser.add_argument('--capture', type=str, default=None, help='Append every datagram to this capture file (see replay.py)')
+    parser.add_argument('--fast-turn', action='store_true', help='Offer fast-turn mode (state-hash lockstep, one round trip per turn)')
+    parser.add_argument('--bot-pokemon', type=str, default=None, help='Pokemon for the bot roles (default: a counter-pick or random)')
+    parser.add_argument('--bot-timeout', type=float, default=300, help='Seconds before a bot role gives up')
+    parser.add_argument('--trace', action='store_true', help='Record per-turn timing spans (served at /trace)')
+    parser.add_argument('--no-metrics', action='store_true', help='Do not count protocol metrics (/metrics)')
+    parser.add_argument('--admin-remote', action='store_true', help='Accept admin requests (profiling, memory) from any address')
     
     args = parser.parse_args()
+    client.capture_path = args.capture
+    client.fast_turn = args.fast_turn
+    if args.trace:
+        client.tracer = TurnTracer(clock=client.clock)
+    if args.no_metrics:
+        client.metrics = None
+    client.admin_remote = args.admin_remote
     
     # Auto-initialize if role is set
     if args.role:
@@ -674,5 +1028,21 @@ if __name__ == '__main__':
             client.join_game(args.host_ip, args.host_port, spectator=False)
         elif args.role == 'spectator':
             client.join_game(args.host_ip, args.host_port, spectator=True)
+        elif args.role.startswith('bot-'):
+            client.bot = BotPlayer(client.poke, args.bot_pokemon, BOT_BOOSTS)
+            error = client.bot.pokemon_error()
+            if error:
+                print(error)
+                sys.exit(1)
+            if args.role == 'bot-host':
+                client.host_game()
+            else:
+                client.join_game(args.host_ip, args.host_port, spectator=False)
+            # Headless: the background game loop plays; no web server
+            deadline = client.clock.monotonic() + args.bot_timeout
+            while client.engine.state != constants.STATE_GAME_OVER and client.clock.monotonic() < deadline:
+                client.clock.sleep(0.05)
+            client.clock.sleep(1.0) # Let the last reports/ACKs go out
+            sys.exit(0 if client.engine.state == constants.STATE_GAME_OVER else 1)
             
     socketio.run(app, host='0.0.0.0', port=args.http_port)